@@ -19,7 +19,7 @@ Main Components:
    - Calculates and displays the maximum and minimum angles for hip, knee, and ankle joints.
 
 5. Gait Phases Visualization:
-   - `gait_phase_line` method adds vertical lines indicating gait phases.
+   - `gait_phase_line` method moves the reusable vertical lines indicating gait phases.
    - `normalize_gait_phases` method normalizes gait data and updates the plot accordingly.
 
 6. `gait_duration` Method:
@@ -27,7 +27,10 @@ Main Components:
    - Identifies gait deviations and suggests corrective actions.
 
 7. Real-time Angle Updates:
-   - `update_angle_values` method continuously updates hip, knee, and ankle angles.
+   - The analysis runs in a worker thread (see gui.AnalysisWorker), which sends one result record per frame.
+   - `record_angle_values` method stores the hip, knee, and ankle angles of every processed frame.
+   - `update_plots` method redraws all the angle plots from one display-rate timer, blitting the changed lines
+     (see gui.BlitPlotter).
 
 8. User Actions:
    - Actions triggered by user interaction, such as toggling display options and saving reports.
@@ -69,16 +72,20 @@ Usage:
 Note: For detailed information on individual methods and functionalities, refer to the respective function and class docstrings in the code.
 """
 
-import copy
 import sys
 
 import cv2
+import numpy as np
 from backend.backend import MotionAnalysis
+from backend.extrema import RunningExtrema
 from backend.pdf_report import PdfGen
+from backend.timeseries import GrowableArray
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter, QPixmap
+from gui.AnalysisWorker import DISPLAY_RATE, AnalysisWorker
+from gui.BlitPlotter import BlitPlotter, PhaseMarkerPool, plot_points
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QLinearGradient, QPainter
 from PyQt5.QtWidgets import (
     QAction,
     QApplication,
@@ -94,26 +101,51 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
+# Line color and y range of each joint's plots
+PLOT_STYLES = {"Hip": ("red", [-20, 30]), "Knee": ("blue", [-5, 70]), "Ankle": ("black", [-20, 25])}
+JOINT_SUFFIXES = {"Hip": "", "Knee": "2", "Ankle": "3"}
+DIRECTION_SUFFIXES = {"right_to_left": "", "left_to_right": "_2"}
+
+# Redraws per second of the angle plots, independent of the video frame rate
+PLOT_RATE = 30
+
 
 class VideoData(QLabel):
     """
     VideoData class handles video processing and visualization for gait analysis.
 
+    The analysis runs in an AnalysisWorker thread, which also renders the presented frames (overlays, scaling and
+    RGB conversion) at the display refresh rate; this widget paints the latest rendered QImage, forwards the
+    per-frame result records to the rest of the GUI and turns clicks on the video into calibration points.
+
     Attributes:
         - window_name (str): The name of the GUI window.
-        - init_video (MotionAnalysis): Instance of MotionAnalysis for video analysis.
-        - timer (QTimer): Timer to trigger periodic frame updates.
+        - init_video (MotionAnalysis): Instance of MotionAnalysis for video analysis, owned by the worker.
+        - worker (AnalysisWorker): Thread running the analysis.
+        - image (QImage): Latest rendered frame.
+        - last_record (dict): Result record of the latest processed frame.
         - knee_angle (float): Current knee angle value.
 
     Methods:
-        - __init__: Initializes VideoData, sets up video analysis, and starts the update timer.
-        - update_frame: Updates the video frame, processes gait analysis, and displays the video.
+        - __init__: Initializes VideoData, sets up video analysis, and starts the analysis worker.
+        - update_frame: Takes the records processed by the worker and the latest rendered frame.
+        - finish_video: Takes the last records when the video ends.
+        - paintEvent: Paints the latest rendered frame.
+        - mousePressEvent: Sets the calibration lines from clicks on the video.
         - angle_value(joint: str): Retrieves the current angle value for the specified joint.
         - toggle_show_lines(value: bool): Toggles the display of lines in the video.
         - toggle_show_labels(value: bool): Toggles the display of labels in the video.
         - toggle_show_bbox(value: bool): Toggles the display of bounding boxes in the video.
+        - stop: Stops the analysis worker.
+
+    Signals:
+        - frame_processed(dict): Emitted with the result record of every processed video frame, in order.
+        - video_finished: Emitted once the records of the last frame have been forwarded.
     """
 
+    frame_processed = pyqtSignal(dict)
+    video_finished = pyqtSignal()
+
     def __init__(self):
         super(VideoData, self).__init__()
         self.window_name = "Gait Analysis"
@@ -122,62 +154,70 @@ class VideoData(QLabel):
         )
 
         self.init_video.open_camera()
-        self.init_video.init_time()
-        self.init_video.get_video_frame()
-        self.init_video.init_tracker()
         video_scaling_factor = 2.5
-        self.setMaximumSize(
+        self.setFixedSize(
             int(1920 / video_scaling_factor), int(1080 / video_scaling_factor)
         )
 
-        self.timer = QTimer()
-
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(1)
-
         self.knee_angle = 0
+        self.current_frame = 0
+        self.last_record = None
+        self.image = None
+
+        # Frames are rendered no faster than the screen refreshes
+        display_rate = QApplication.primaryScreen().refreshRate() or DISPLAY_RATE
+        self.worker = AnalysisWorker(
+            self.init_video, (self.width(), self.height()), display_rate=display_rate
+        )
+        # Results come back through a queued signal, batched when the GUI falls behind
+        self.worker.results_ready.connect(self.update_frame)
+        self.worker.analysis_finished.connect(self.finish_video)
+        self.worker.start()
 
     def update_frame(self):
-        self.init_video.get_video_frame()
-        self.current_frame = int(self.init_video.camera.get(cv2.CAP_PROP_POS_FRAMES))
-        self.init_video.remove_empty_boxes()
-        self.init_video.check_markers()
-        self.init_video.markers_centers()
-        self.init_video.gait_direction()
-        self.init_video.get_filtered_angles()
-
-        self.init_video.lines()
-        self.init_video.labels()
-        self.init_video.end_time()
-        self.video_frame = self.init_video.new_frame
-
-        self.init_video.display_window()  # * Display Window <-- <-- <-- <-- <--
-
-        self.video_frame = cv2.cvtColor(self.video_frame, cv2.COLOR_BGR2RGB)
-        self.video_frame = cv2.resize(
-            self.video_frame, (self.maximumWidth(), self.maximumHeight())
-        )
-        height, width, channels = self.video_frame.shape
-        q_image = QImage(
-            self.video_frame.data, width, height, channels * width, QImage.Format_RGB888
-        )
-        self.setPixmap(QPixmap.fromImage(q_image))
+        records, image = self.worker.take_results()
+        for record in records:
+            self.last_record = record
+            self.current_frame = record["frame"]
+            self.frame_processed.emit(record)
+
+        if image is not None:
+            self.image = image
+            self.update()
+
+    def finish_video(self):
+        # Records published after the last results_ready notification are taken here
+        self.update_frame()
+        self.video_finished.emit()
+
+    def paintEvent(self, event):
+        if self.image is None:
+            return
+        # The QImage wraps the worker's RGB buffer: painted directly, without a QPixmap copy
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self.image)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        frame_size = self.worker.frame_size
+        if frame_size is None:
+            return
+        buttons = {Qt.LeftButton: cv2.EVENT_LBUTTONDOWN, Qt.RightButton: cv2.EVENT_RBUTTONDOWN}
+        if event.button() not in buttons:
+            return
+
+        # Widget coordinates -> frame coordinates
+        x = int(event.x() * frame_size[0] / self.width())
+        y = int(event.y() * frame_size[1] / self.height())
+        self.init_video.handle_mouse_event(buttons[event.button()], x, y, 0, None)
 
     def angle_value(self, joint: str):
-        angles = None
-        if joint == "Hip":
-            angles = self.init_video.hip_angles
-        elif joint == "Knee":
-            angles = self.init_video.knee_angles
-        elif joint == "Ankle":
-            angles = self.init_video.ankle_angles
-        else:
+        if joint not in JOINT_SUFFIXES:
             raise ValueError("Invalid angle")
+        if self.last_record is None:
+            return 0
 
-        final_angle = 0
-        for angle in angles:
-            final_angle = angle
-        return final_angle
+        return self.last_record["angles"][list(JOINT_SUFFIXES).index(joint)]
 
     def toggle_show_lines(self, value):
         self.init_video.showLines = value
@@ -188,6 +228,9 @@ class VideoData(QLabel):
     def toggle_show_bbox(self, value):
         self.init_video.showbbox = value
 
+    def stop(self):
+        self.worker.stop()
+
 
 class GradientFrame(QFrame):
     """
@@ -215,15 +258,18 @@ class MainWindow(QMainWindow):
 
     Attributes:
     - patient_info (list): Information about the patient.
-    - x_history, y_history, x_history_2, y_history_2 (list): Lists to store angle data for plotting.
-    - x_history2, y_history2, x_history2_2, y_history2_2 (list): Lists to store knee angle data for plotting.
-    - x_history3, y_history3, x_history3_2, y_history3_2 (list): Lists to store ankle angle data for plotting.
-    - gait_phase_duration_RTL (bool): Flag indicating if the right-to-left gait phase duration has been calculated.
-    - gait_phase_duration_LTR (bool): Flag indicating if the left-to-right gait phase duration has been calculated.
-    - min_value_x_RTL, min_value_x_LTR (float): Minimum values of x for right-to-left and left-to-right gait.
+    - x_history, y_history, x_history_2, y_history_2 (GrowableArray): Hip angle data for plotting.
+    - x_history2, y_history2, x_history2_2, y_history2_2 (GrowableArray): Knee angle data for plotting.
+    - x_history3, y_history3, x_history3_2, y_history3_2 (GrowableArray): Ankle angle data for plotting.
+    - y_extrema (dict): RunningExtrema of every y_history series, for the max/min labels.
+    - min_value_x (dict): Minimum value of x of the plotted range, for each walking direction.
     - time_difference_difference (float): Difference between right-to-left and left-to-right gait phase durations.
-    - time_difference_RTL, time_difference_LTR (float): Gait phase durations for right-to-left and left-to-right.
+    - time_difference_RTL, time_difference_LTR (float): Mean stance durations of the right-to-left and left-to-right
+      passes.
     - percent_diff (float): Percentage difference between gait phase durations.
+    - plotter (BlitPlotter): Redraws the angle lines of both figures with blitting, at PLOT_RATE per second.
+    - phase_markers (dict): PhaseMarkerPool of the stance and swing lines of every plot, keyed by Axes.
+    - plot_timer (QTimer): Single display-rate timer of the angle plots, stopped when the video ends.
     """
 
     def __init__(self, patient_info):
@@ -238,28 +284,43 @@ class MainWindow(QMainWindow):
         self.patient_info = patient_info
 
         # Hip angle
-        self.x_history = []
-        self.y_history = []
-        self.x_history_2 = []
-        self.y_history_2 = []
+        self.x_history = GrowableArray(np.float32)
+        self.y_history = GrowableArray(np.float32)
+        self.x_history_2 = GrowableArray(np.float32)
+        self.y_history_2 = GrowableArray(np.float32)
 
         # Knee angle
-        self.x_history2 = []
-        self.y_history2 = []
-        self.x_history2_2 = []
-        self.y_history2_2 = []
+        self.x_history2 = GrowableArray(np.float32)
+        self.y_history2 = GrowableArray(np.float32)
+        self.x_history2_2 = GrowableArray(np.float32)
+        self.y_history2_2 = GrowableArray(np.float32)
 
         # Ankle angle
-        self.x_history3 = []
-        self.y_history3 = []
-        self.x_history3_2 = []
-        self.y_history3_2 = []
+        self.x_history3 = GrowableArray(np.float32)
+        self.y_history3 = GrowableArray(np.float32)
+        self.x_history3_2 = GrowableArray(np.float32)
+        self.y_history3_2 = GrowableArray(np.float32)
+
+        # Running min/max of every plotted angle series, updated as the samples are appended
+        self.y_extrema = {
+            name: RunningExtrema()
+            for name in (
+                "y_history",
+                "y_history_2",
+                "y_history2",
+                "y_history2_2",
+                "y_history3",
+                "y_history3_2",
+            )
+        }
 
-        self.gait_phase_duration_RTL = False
-        self.gait_phase_duration_LTR = False
+        # First time of the plotted range of each direction
+        self.min_value_x = {"right_to_left": None, "left_to_right": None}
 
-        self.min_value_x_RTL = None
-        self.min_value_x_LTR = None
+        # Redraws the angle lines with blitting; plotted_sizes is the number of samples of each history last drawn
+        self.plotter = BlitPlotter()
+        self.plotted_sizes = {}
+        self.phase_markers = {}
 
         self.time_difference_difference = None
 
@@ -279,6 +340,14 @@ class MainWindow(QMainWindow):
         self.init_ui()
         self.show()
 
+    def closeEvent(self, event):
+        """
+        Stop the analysis worker before the window closes.
+        """
+        if hasattr(self, "video_widget"):
+            self.video_widget.stop()
+        super(MainWindow, self).closeEvent(event)
+
     def init_ui(self):
         """
         Initialize the user interface of the main window.
@@ -582,28 +651,37 @@ class MainWindow(QMainWindow):
 
         main_layout.addWidget(video_frame)
 
-        self.timer = QTimer()
-        self.timer.timeout.connect(lambda: self.update_angle_values("Hip"))
-        self.timer.start(int(1000 / 120))
-
-        self.timer2 = QTimer()
-        self.timer2.timeout.connect(lambda: self.update_angle_values("Knee"))
-        self.timer2.start(int(1000 / 120))
+        # Every angle line is blitted over the cached figure background; styles and y ranges are set once
+        for angle, (color, y_limits) in PLOT_STYLES.items():
+            for side in DIRECTION_SUFFIXES.values():
+                ax = getattr(self, f"ax{JOINT_SUFFIXES[angle]}{side}")
+                line = getattr(self, f"line{JOINT_SUFFIXES[angle]}{side}")
+                line.set_color(color)
+                line.set_linewidth(2)
+                ax.set_ylim(y_limits)
+                self.plotter.add_line(line)
+                # Stance and swing markers, created once and moved in place
+                self.phase_markers[ax] = PhaseMarkerPool(
+                    ax, self.plotter, size=2, linestyle="--", linewidth=2
+                )
 
-        self.timer3 = QTimer()
-        self.timer3.timeout.connect(lambda: self.update_angle_values("Ankle"))
-        self.timer3.start(int(1000 / 120))
+        # Samples are recorded once per video frame; the plots are redrawn by a single display-rate timer
+        self.video_widget.frame_processed.connect(self.record_angle_values)
+        self.plot_timer = QTimer()
+        self.plot_timer.timeout.connect(self.update_plots)
+        self.plot_timer.start(int(1000 / PLOT_RATE))
+        self.video_widget.video_finished.connect(self.finish_plots)
 
-    def angle_max_min(self, joint: str, y_history):
+    def angle_max_min(self, joint: str, y_extrema):
         """
         Update and display the maximum and minimum angle values for a specific joint.
 
         Parameters:
         - joint (str): The joint for which to calculate and display angle statistics (e.g., "Hip", "Knee", "Ankle").
-        - y_history (list): A list of angle values representing the historical data for the specified joint.
+        - y_extrema (RunningExtrema): Running min/max of the angle values of the specified joint.
 
-        This method calculates the maximum and minimum angle values from the provided historical data
-        and updates the corresponding QLabel elements to display these values in the user interface.
+        This method reads the maximum and minimum angle values kept up to date as the samples are appended
+        (no scan of the history) and updates the corresponding QLabel elements to display these values.
 
         Note: The method assumes the existence of QLabel elements for displaying max and min values
         for each joint (e.g., self.max_hip, self.min_hip for the hip joint).
@@ -611,18 +689,9 @@ class MainWindow(QMainWindow):
         max_y = float("-inf")
         min_y = float("inf")
 
-        if joint == "Hip":
-            y_history = y_history
-        elif joint == "Knee":
-            y_history = y_history
-        elif joint == "Ankle":
-            y_history = y_history
-
-        for y in y_history:
-            if y > max_y:
-                max_y = y
-            if y < min_y:
-                min_y = y
+        if y_extrema.count:
+            max_y = float(y_extrema.max)
+            min_y = float(y_extrema.min)
 
         if joint == "Hip":
             self.max_hip.setText(f"Max: {round(max_y, 2)}°")
@@ -634,24 +703,27 @@ class MainWindow(QMainWindow):
             self.max_ankle.setText(f"Max: {round(max_y, 2)}°")
             self.min_ankle.setText(f"Min: {round(min_y, 2)}°")
 
-    def gait_phase_line(self, ax, frame):
+    def gait_phase_line(self, ax, frames, limits=None):
         """
-        Draw a dashed vertical line on the specified Axes to indicate a gait phase.
+        Show dashed vertical lines on the specified Axes to indicate the gait phases.
 
         Parameters:
-        - ax (matplotlib.axes._subplots.AxesSubplot): The Axes on which to draw the gait phase line.
-        - frame (float or None): The frame (time point) where the gait phase occurs. If None, no line is drawn.
+        - ax (matplotlib.axes._subplots.AxesSubplot): The Axes on which to show the gait phase lines.
+        - frames (list): The frames (time points) where the gait phases occur; None entries are skipped.
+        - limits (tuple): (left, right) range of the plotted samples; phases outside of it are hidden (default is
+          None).
 
-        This method adds a vertical dashed line to the specified Axes at the given frame to visually represent a gait phase.
-        The line is drawn using a dashed linestyle with a linewidth of 2.
+        The lines come from the PhaseMarkerPool of the Axes: they are created once, moved in place and drawn
+        through the blitting path, so the Axes never accumulate artists over the session.
 
         Note: Ensure that the provided Axes (ax) is part of the matplotlib Figure where you want to display the line.
         """
-        if frame is not None:
-            ax.axvline(frame, linestyle="--", linewidth=2)
+        self.phase_markers[ax].set_positions(
+            [frame for frame in frames if frame is not None], limits=limits
+        )
 
     def normalize_gait_phases(
-        self, ax, line, list_x, list_y, lower_threshold: int, upper_threshold: int
+        self, ax, line, list_x, list_y, lower_threshold: int, upper_threshold: int, direction: str
     ):
         """
         Normalize gait phases and update the plot with the normalized data.
@@ -659,100 +731,46 @@ class MainWindow(QMainWindow):
         Parameters:
         - ax (matplotlib.axes._subplots.AxesSubplot): The Axes on which to plot the normalized gait phases.
         - line (matplotlib.lines.Line2D): The Line2D object representing the gait data plot.
-        - list_x (list): List of x-axis values (time points).
-        - list_y (list): List of y-axis values (angle data).
+        - list_x (GrowableArray): x-axis values (time points).
+        - list_y (GrowableArray): y-axis values (angle data).
         - lower_threshold (int): The lower index for the range of data to be considered.
         - upper_threshold (int): The upper index for the range of data to be considered.
+        - direction (str): Walking direction of the plotted samples.
 
         This method normalizes the gait phases based on the specified range and updates the plot with the normalized data.
-        It calculates the minimum x-value within the specified range and adjusts all x-values accordingly.
+        The whole range is plotted, decimated to a bounded number of points (see plot_points).
+        It calculates the minimum x-value within the plotted range and adjusts all x-values accordingly.
         Additionally, it draws dashed vertical lines on the plot to indicate the start and end of gait phases.
 
         Note: The provided Axes (ax) and Line2D object (line) should be part of the matplotlib Figure where you want to display the plot.
         """
-        original_list_x = list_x
-        original_list_y = list_y
-        copied_list_x = copy.deepcopy(original_list_x)
-        copied_list_y = copy.deepcopy(original_list_y)
-
-        if len(copied_list_x) >= lower_threshold:
-            copied_list_x = copied_list_x[lower_threshold:upper_threshold]
-            copied_list_y = copied_list_y[lower_threshold:upper_threshold]
-
-            if self.video_widget.init_video.direction == "right_to_left":
-                (
-                    stance_frame_RTL,
-                    swing_frame_RTL,
-                ) = self.video_widget.init_video.gait_phases_RTL()
-
-                if len(copied_list_x) > 0:
-                    self.min_value_x_RTL = min(copied_list_x)
-                    normalized_values = [
-                        x - self.min_value_x_RTL for x in copied_list_x
-                    ]
-
-                    if stance_frame_RTL is not None:
-                        self.gait_phase_line(
-                            ax,
-                            stance_frame_RTL
-                            - self.min_value_x_RTL
-                            + lower_threshold / self.video_widget.init_video.fps_rate,
-                        )
-
-                    if swing_frame_RTL is not None:
-                        self.gait_phase_line(
-                            ax,
-                            swing_frame_RTL
-                            - self.min_value_x_RTL
-                            + lower_threshold / self.video_widget.init_video.fps_rate,
-                        )
-
-                    if (
-                        self.gait_phase_duration_RTL == False
-                        and stance_frame_RTL is not None
-                        and swing_frame_RTL is not None
-                    ):
-                        self.time_difference_RTL = swing_frame_RTL - stance_frame_RTL
-                        self.gait_phase_duration_RTL = True
-
-                    line.set_data(normalized_values, copied_list_y)
-            else:
-                (
-                    stance_frame_LTR,
-                    swing_frame_LTR,
-                ) = self.video_widget.init_video.gait_phase_LTR()
-
-                if len(copied_list_x) > 0:
-                    self.min_value_x_LTR = min(copied_list_x)
-                    normalized_values_x = [
-                        x - self.min_value_x_LTR for x in copied_list_x
-                    ]
-
-                    if stance_frame_LTR is not None:
-                        self.gait_phase_line(
-                            ax,
-                            stance_frame_LTR
-                            - self.min_value_x_LTR
-                            + lower_threshold / self.video_widget.init_video.fps_rate,
-                        )
-
-                    if swing_frame_LTR is not None:
-                        self.gait_phase_line(
-                            ax,
-                            swing_frame_LTR
-                            - self.min_value_x_LTR
-                            + lower_threshold / self.video_widget.init_video.fps_rate,
-                        )
+        if len(list_x) >= lower_threshold:
+            record = self.video_widget.last_record
+            phases = record["phases"][direction]
+            fps_rate = self.video_widget.init_video.fps_rate
+
+            # The points drawn per tick stay bounded however long the session is
+            copied_list_x, copied_list_y = plot_points(
+                list_x, list_y, lower_threshold, upper_threshold
+            )
 
-                    if (
-                        self.gait_phase_duration_LTR == False
-                        and stance_frame_LTR is not None
-                        and swing_frame_LTR is not None
-                    ):
-                        self.time_difference_LTR = swing_frame_LTR - stance_frame_LTR
-                        self.gait_phase_duration_LTR = True
+            if len(copied_list_x) > 0:
+                # Times are appended in frame order, so the first one of the range is the smallest
+                min_value_x = float(copied_list_x[0])
+                self.min_value_x[direction] = min_value_x
+                normalized_values = copied_list_x - min_value_x
+
+                self.gait_phase_line(
+                    ax,
+                    [
+                        phase_time - min_value_x + lower_threshold / fps_rate
+                        for phase_time in phases
+                        if phase_time is not None
+                    ],
+                    limits=(0.0, float(normalized_values[-1])),
+                )
 
-                    line.set_data(normalized_values_x, copied_list_y)
+                self.plotter.set_data(line, normalized_values, copied_list_y)
 
     def gait_duration(self):
         """
@@ -765,6 +783,10 @@ class MainWindow(QMainWindow):
 
         Note: The corrective actions mentioned in the UI are placeholders and may need to be adjusted based on actual corrections.
         """
+        stance_durations = self.video_widget.last_record["stance_durations"]
+        self.time_difference_RTL = stance_durations["right_to_left"]
+        self.time_difference_LTR = stance_durations["left_to_right"]
+
         if self.time_difference_RTL is None or self.time_difference_LTR is None:
             self.gait_phases_time.setText(f"Analyzing gait deviations...")
 
@@ -866,17 +888,36 @@ class MainWindow(QMainWindow):
                 self.vaulting_dev.setText(f"Same stance phase in both legs")
                 self.vaulting_dev_button.setVisible(False)
 
-    def update_angle_values(self, angle: str):
+    def record_angle_values(self, record):
         """
-        Update the real-time display of joint angles during video playback.
+        Append the hip, knee and ankle angles of a processed frame to the histories of its walking direction.
+        Called once per video frame, in frame order; nothing is drawn here.
 
         Parameters:
-        - angle (str): The joint angle to be updated (e.g., "Hip", "Knee", "Ankle").
+        - record (dict): Result record of the frame (see gui.AnalysisWorker).
+        """
+        x = record["time"]
+        side = DIRECTION_SUFFIXES[record["direction"]]
 
-        This method is responsible for updating the real-time display of joint angles during video playback.
-        It retrieves the current frame and corresponding joint angle from the video widget, records historical data,
-        normalizes gait phases, and updates the UI with the current joint angle. The visualization is handled separately
-        for different joint angles and directions of movement.
+        for y, joint in zip(record["angles"], JOINT_SUFFIXES.values()):
+            getattr(self, f"x_history{joint}{side}").append(x)
+            getattr(self, f"y_history{joint}{side}").append(y)
+            self.y_extrema[f"y_history{joint}{side}"].update(y)
+
+    def finish_plots(self):
+        """
+        Stop the plot timer at the end of the video, after a last refresh with every recorded sample.
+        """
+        self.plot_timer.stop()
+        self.update_plots()
+
+    def update_plots(self):
+        """
+        Refresh the angle plots and labels once per display tick.
+
+        Only the histories that received samples since the previous tick are normalized again, and every changed
+        line is drawn by the BlitPlotter in one pass over both figures (a full figure draw only happens when an
+        x axis has to grow).
 
         Note: The method assumes the existence of specific UI elements such as labels, axes, lines, and canvases,
         which need to be present in the class for proper execution.
@@ -896,145 +937,39 @@ class MainWindow(QMainWindow):
         """
         lower_threshold = 5
         upper_threshold = -5
-        x = self.video_widget.current_frame / self.video_widget.init_video.fps_rate
+        record = self.video_widget.last_record
+        if record is None:
+            # The worker has not processed the first frame yet
+            return
         self.gait_duration()
 
-        if angle == "Hip":
-            y = self.video_widget.angle_value("Hip")
-            if self.video_widget.init_video.direction == "right_to_left":
-                self.x_history.append(x)
-                self.y_history.append(y)
-
-                self.normalize_gait_phases(
-                    self.ax,
-                    self.line,
-                    self.x_history,
-                    self.y_history,
-                    lower_threshold,
-                    upper_threshold,
-                )
-
-                self.line.set_color("red")
-                self.line.set_linewidth(2)
-                self.ax.relim()
-                self.ax.autoscale_view()
-                self.ax.set_ylim([-20, 30])
-                self.canvas.draw()
-                self.angle_max_min("Hip", self.y_history)
-
-            else:
-                self.x_history_2.append(x)
-                self.y_history_2.append(y)
-
-                self.normalize_gait_phases(
-                    self.ax_2,
-                    self.line_2,
-                    self.x_history_2,
-                    self.y_history_2,
-                    lower_threshold,
-                    upper_threshold,
-                )
-
-                self.line_2.set_color("red")
-                self.line_2.set_linewidth(2)
-                self.ax_2.relim()
-                self.ax_2.autoscale_view()
-                self.ax_2.set_ylim([-20, 30])
-                self.canvas_2.draw()
-                self.angle_max_min("Hip", self.y_history_2)
-
-            self.hip_angle_label.setText(f"Current hip angle: {round(y, 2)}°")
-
-        elif angle == "Knee":
-            y = self.video_widget.angle_value("Knee")
-            if self.video_widget.init_video.direction == "right_to_left":
-                self.x_history2.append(x)
-                self.y_history2.append(y)
-
-                self.normalize_gait_phases(
-                    self.ax2,
-                    self.line2,
-                    self.x_history2,
-                    self.y_history2,
-                    lower_threshold,
-                    upper_threshold,
-                )
-
-                self.line2.set_color("blue")
-                self.line2.set_linewidth(2)
-                self.ax2.relim()
-                self.ax2.autoscale_view()
-                self.ax2.set_ylim([-5, 70])
-                self.canvas.draw()
-                self.angle_max_min("Knee", self.y_history2)
-
-            else:
-                self.x_history2_2.append(x)
-                self.y_history2_2.append(y)
-
-                self.normalize_gait_phases(
-                    self.ax2_2,
-                    self.line2_2,
-                    self.x_history2_2,
-                    self.y_history2_2,
-                    lower_threshold,
-                    upper_threshold,
-                )
-
-                self.line2_2.set_color("blue")
-                self.line2_2.set_linewidth(2)
-                self.ax2_2.relim()
-                self.ax2_2.autoscale_view()
-                self.ax2_2.set_ylim([-5, 70])
-                self.canvas_2.draw()
-                self.angle_max_min("Knee", self.y_history2_2)
-
-            self.knee_angle_label.setText(f"Current knee angle: {round(y, 2)}°")
-
-        elif angle == "Ankle":
-            y = self.video_widget.angle_value("Ankle")
-            if self.video_widget.init_video.direction == "right_to_left":
-                self.x_history3.append(x)
-                self.y_history3.append(y)
+        for angle, joint in JOINT_SUFFIXES.items():
+            for direction, side in DIRECTION_SUFFIXES.items():
+                # Attribute suffixes: x_history2_2, ax2_2 and line2_2 are the left-to-right knee plot
+                name = f"y_history{joint}{side}"
+                x_history = getattr(self, f"x_history{joint}{side}")
+                if self.plotted_sizes.get(name) == len(x_history):
+                    continue
+                self.plotted_sizes[name] = len(x_history)
 
                 self.normalize_gait_phases(
-                    self.ax3,
-                    self.line3,
-                    self.x_history3,
-                    self.y_history3,
+                    getattr(self, f"ax{joint}{side}"),
+                    getattr(self, f"line{joint}{side}"),
+                    x_history,
+                    getattr(self, name),
                     lower_threshold,
                     upper_threshold,
+                    direction,
                 )
+                if direction == record["direction"]:
+                    self.angle_max_min(angle, self.y_extrema[name])
 
-                self.line3.set_color("black")
-                self.line3.set_linewidth(2)
-                self.ax3.relim()
-                self.ax3.autoscale_view()
-                self.ax3.set_ylim([-20, 25])
-                self.canvas.draw()
-                self.angle_max_min("Ankle", self.y_history3)
-            else:
-                self.x_history3_2.append(x)
-                self.y_history3_2.append(y)
-
-                self.normalize_gait_phases(
-                    self.ax3_2,
-                    self.line3_2,
-                    self.x_history3_2,
-                    self.y_history3_2,
-                    lower_threshold,
-                    upper_threshold,
-                )
-
-                self.line3_2.set_color("black")
-                self.line3_2.set_linewidth(2)
-                self.ax3_2.relim()
-                self.ax3_2.autoscale_view()
-                self.ax3_2.set_ylim([-20, 25])
-                self.canvas_2.draw()
-                self.angle_max_min("Ankle", self.y_history3_2)
+            y = self.video_widget.angle_value(angle)
+            getattr(self, f"{angle.lower()}_angle_label").setText(
+                f"Current {angle.lower()} angle: {round(y, 2)}°"
+            )
 
-            self.ankle_angle_label.setText(f"Current ankle angle: {round(y, 2)}°")
+        self.plotter.draw()
 
     def view_lines_action_triggered(self, checked):
         """
@@ -0,0 +1,177 @@
+"""
+Angle Engine Module
+
+This module computes the hip, knee and ankle angles of whole marker trajectories in one vectorized NumPy call.
+It is used frame by frame by MotionAnalysis and over complete sessions when the angles are recomputed from stored
+marker centers (replay, batch analysis), where a full session takes milliseconds.
+
+The markers follow the IDs of MotionAnalysis.names: 0 Shoulder, 1 Trochanter, 2 Knee, 3 Ankle, 4 V_Metatarsal.
+The hip angle does not use the trochanter marker directly but a virtual trochanter point, placed
+trochanter_offset pixels above the trochanter marker along the knee -> trochanter direction.
+
+Dependencies:
+- numpy: Vectorized computation.
+
+Attributes:
+- TROCHANTER_OFFSET: Default distance in pixels between the trochanter marker and the virtual trochanter.
+
+Functions:
+- virtual_trochanter: Virtual trochanter point of every frame.
+- joint_angles: Angle at the middle joint of three point series.
+- compute_angles: Hip, knee and ankle angles of every frame.
+- zero_ankle: Expresses the ankle angles relative to a reference (the first ankle angle by default).
+
+Usage:
+- angles, trochanter = compute_angles(positions) with positions of shape (frames, 5, 2).
+- angles[:, 0], angles[:, 1] and angles[:, 2] are the hip, knee and ankle angles in degrees (NaN for frames where
+  a marker is missing).
+- Run python -m backend.angle_engine (from main_folder) to compare it with the per-frame computation.
+"""
+
+import numpy as np
+
+TROCHANTER_OFFSET = 160
+
+SHOULDER, TROCHANTER, KNEE, ANKLE, V_METATARSAL = range(5)
+
+
+def virtual_trochanter(positions, trochanter_offset=TROCHANTER_OFFSET):
+    """
+    Compute the virtual trochanter point of every frame.
+
+    Parameters:
+    - positions: Array of shape (frames, 5, 2) with the marker centers.
+    - trochanter_offset (float): Distance in pixels above the trochanter marker (default is 160).
+
+    Returns:
+    - Array of shape (frames, 2), truncated to whole pixels like the drawn point.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    trochanter = positions[:, TROCHANTER]
+    knee = positions[:, KNEE]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.arctan(
+            (trochanter[:, 0] - knee[:, 0]) / (trochanter[:, 1] - knee[:, 1])
+        )
+    point = np.empty_like(trochanter)
+    point[:, 0] = -trochanter_offset * np.sin(alpha) + trochanter[:, 0]
+    point[:, 1] = -trochanter_offset * np.cos(alpha) + trochanter[:, 1]
+    return np.trunc(point)
+
+
+def joint_angles(joint1, joint2, joint3):
+    """
+    Angle in degrees between the segments joint1 -> joint2 and joint2 -> joint3, for every frame.
+
+    The cosine is clipped to [-1, 1] so rounding errors never produce NaN, and a frame where one of the segments
+    has zero length gets an angle of 0.
+    """
+    vec1 = np.asarray(joint2, dtype=np.float64) - np.asarray(joint1, dtype=np.float64)
+    vec2 = np.asarray(joint3, dtype=np.float64) - np.asarray(joint2, dtype=np.float64)
+
+    dot_product = np.einsum("ij,ij->i", vec1, vec2)
+    magnitudes = np.hypot(vec1[:, 0], vec1[:, 1]) * np.hypot(vec2[:, 0], vec2[:, 1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosine = np.clip(dot_product / magnitudes, -1.0, 1.0)
+    angles = np.degrees(np.arccos(cosine))
+    angles[magnitudes == 0] = 0.0
+    return angles
+
+
+def compute_angles(positions, trochanter_offset=TROCHANTER_OFFSET):
+    """
+    Compute the hip, knee and ankle angles of every frame.
+
+    Parameters:
+    - positions: Array of shape (frames, 5, 2) with the marker centers, NaN for missing markers.
+    - trochanter_offset (float): Distance in pixels of the virtual trochanter (default is 160).
+
+    Returns:
+    - angles: Array of shape (frames, 3) with the hip, knee and ankle angles in degrees. The ankle angle is not
+      zeroed yet (see zero_ankle). Frames with a missing marker are NaN.
+    - trochanter: Array of shape (frames, 2) with the virtual trochanter point.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 5, 2)
+    trochanter = virtual_trochanter(positions, trochanter_offset)
+
+    angles = np.column_stack(
+        (
+            joint_angles(positions[:, SHOULDER], trochanter, positions[:, KNEE]),
+            joint_angles(trochanter, positions[:, KNEE], positions[:, ANKLE]),
+            joint_angles(positions[:, KNEE], positions[:, ANKLE], positions[:, V_METATARSAL]),
+        )
+    )
+
+    missing = np.isnan(positions).any(axis=(1, 2))
+    angles[missing] = np.nan
+    return angles, trochanter
+
+
+def zero_ankle(angles, reference=None):
+    """
+    Express the ankle angles relative to a reference angle.
+
+    Parameters:
+    - angles: Array of shape (frames, 3) returned by compute_angles.
+    - reference (float): Ankle angle taken as zero (default is the first valid ankle angle).
+
+    Returns:
+    - angles: Copy of angles with the ankle column shifted.
+    - reference: The reference used, or None when there was no valid ankle angle.
+    """
+    angles = np.array(angles, dtype=np.float64)
+    if reference is None:
+        valid = np.flatnonzero(np.isfinite(angles[:, 2]))
+        if len(valid) == 0:
+            return angles, None
+        reference = float(angles[valid[0], 2])
+    angles[:, 2] -= reference
+    return angles, reference
+
+
+def benchmark_angles(frames=100000):
+    """
+    Print the time needed for the angles of a session, frame by frame and vectorized.
+    """
+    import math
+    from time import perf_counter
+
+    def raw_angle(joint1, joint2, joint3):
+        # Per-frame computation of MotionAnalysis.get_raw_angles
+        vec1 = (joint2[0] - joint1[0], joint2[1] - joint1[1])
+        vec2 = (joint3[0] - joint2[0], joint3[1] - joint2[1])
+        dot_product = vec1[0] * vec2[0] + vec1[1] * vec2[1]
+        magnitude = math.sqrt(vec1[0] ** 2 + vec1[1] ** 2) * math.sqrt(
+            vec2[0] ** 2 + vec2[1] ** 2
+        )
+        if magnitude == 0:
+            return 0.0
+        return math.degrees(math.acos(max(-1.0, min(1.0, dot_product / magnitude))))
+
+    rng = np.random.default_rng(0)
+    base = np.array([[100, 50], [110, 300], [120, 500], [110, 700], [160, 740]], float)
+    positions = np.rint(base + rng.normal(0, 10, (frames, 5, 2)))
+
+    start = perf_counter()
+    angles, trochanter = compute_angles(positions)
+    vectorized = perf_counter() - start
+
+    start = perf_counter()
+    looped = np.empty((frames, 3))
+    for i, (markers, point) in enumerate(zip(positions.tolist(), trochanter.tolist())):
+        looped[i] = (
+            raw_angle(markers[0], point, markers[2]),
+            raw_angle(point, markers[2], markers[3]),
+            raw_angle(markers[2], markers[3], markers[4]),
+        )
+    per_frame = perf_counter() - start
+
+    print(f"{frames} frames: vectorized {vectorized * 1e3:.1f} ms, per frame {per_frame * 1e3:.1f} ms")
+    print(f"Largest difference: {np.max(np.abs(angles - looped)):.2e} degrees")
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_angles()
@@ -0,0 +1,134 @@
+"""
+Angle Filter Module
+
+This module keeps the joint angle series of a session and applies the physiological range filter once, when a
+sample is appended. Samples outside the range are not deleted: they stay in the series with a validity flag set to
+False, so every sample keeps the frame it was measured on.
+
+Dependencies:
+- numpy: Storage of the samples.
+- backend.timeseries: Growable columnar buffers.
+
+Attributes:
+- ANGLE_LIMITS: (lower, upper) accepted range in degrees of every joint.
+
+Classes:
+- RangeFilteredAngles: Angle series of one joint with its frame numbers and validity mask.
+
+Usage:
+- hip_angles = RangeFilteredAngles(*ANGLE_LIMITS["hip"])
+- hip_angles.append(frame_number, angle) returns whether the sample is in range.
+- hip_angles.last_valid() is the latest accepted angle; valid_values() lists the accepted angles.
+- hip_angles.frames, hip_angles.values and hip_angles.valid are zero-copy NumPy views.
+- Run python -m backend.angle_filter (from main_folder) to compare the per-frame cost of the incremental filter with re-filtering the whole history.
+"""
+
+import numpy as np
+from backend.timeseries import TimeSeriesStore
+
+ANGLE_LIMITS = {
+    "hip": (-20, 40),
+    "knee": (-10, 80),
+    "ankle": (-30, 35),
+}
+
+
+class RangeFilteredAngles:
+    def __init__(self, lower, upper):
+        """
+        Initialize the RangeFilteredAngles object.
+
+        Parameters:
+        - lower (float): Smallest accepted angle, in degrees.
+        - upper (float): Largest accepted angle, in degrees.
+        """
+        self.lower = lower
+        self.upper = upper
+        self.samples = TimeSeriesStore({"frame": np.int32, "value": np.float32, "valid": np.bool_})
+        self.valid_count = 0
+        self.last_valid_value = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def frames(self):
+        return self.samples["frame"]
+
+    @property
+    def values(self):
+        return self.samples["value"]
+
+    @property
+    def valid(self):
+        return self.samples["valid"]
+
+    def append(self, frame, value):
+        """
+        Add one sample and flag it against the accepted range.
+
+        Parameters:
+        - frame (int): Frame the angle was measured on.
+        - value (float): Angle in degrees.
+
+        Returns:
+        - bool: True when the sample is in range.
+        """
+        in_range = bool(self.lower <= value <= self.upper)
+        self.samples.append(frame=frame, value=value, valid=in_range)
+        if in_range:
+            self.valid_count += 1
+            self.last_valid_value = value
+        return in_range
+
+    def last_valid(self, default=0):
+        """
+        Latest accepted angle, or default when no sample was accepted yet.
+        """
+        return default if self.last_valid_value is None else self.last_valid_value
+
+    def valid_values(self):
+        return self.values[self.valid]
+
+
+def _refilter_history(history, value, lower, upper):
+    # Previous behaviour: append, then rebuild the whole list against the thresholds
+    history.append(value)
+    return [angle for angle in history if lower <= angle <= upper]
+
+
+def benchmark_append(sizes=(1000, 10000, 100000), appends=200):
+    """
+    Print the cost of one append when the history already holds each of sizes samples.
+    """
+    from time import perf_counter
+
+    lower, upper = ANGLE_LIMITS["knee"]
+    rng = np.random.default_rng(0)
+
+    for size in sizes:
+        samples = rng.uniform(lower - 20, upper + 20, size + appends).tolist()
+
+        series = RangeFilteredAngles(lower, upper)
+        for frame, value in enumerate(samples[:size]):
+            series.append(frame, value)
+        start = perf_counter()
+        for frame, value in enumerate(samples[size:], size):
+            series.append(frame, value)
+        incremental = (perf_counter() - start) / appends
+
+        history = [value for value in samples[:size] if lower <= value <= upper]
+        start = perf_counter()
+        for value in samples[size:]:
+            history = _refilter_history(history, value, lower, upper)
+        refilter = (perf_counter() - start) / appends
+
+        print(
+            f"{size:>7} samples: incremental {incremental * 1e6:8.2f} us/frame, "
+            f"full re-filter {refilter * 1e6:10.2f} us/frame"
+        )
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_append()
@@ -3,18 +3,14 @@
 
     Attributes:
         cameraID (int): The ID of the camera.
-        window_name (str): The name of the window to display video frames.
+        window_name (str): The name of the video window (frames are presented by the GUI, see gui.AnalysisWorker).
         n_markers (int): The number of markers used for motion analysis.
         names (list): List of marker names.
-        first_ankle_angle (list): List to store the first ankle angle.
-        angle_stored (bool): Flag indicating whether ankle angles are stored.
-        hip_angles (list): List to store hip angles.
-        knee_angles (list): List to store knee angles.
-        ankle_angles (list): List to store ankle angles.
+        hip_angles (RangeFilteredAngles): Hip angle of every frame, with its range validity flag.
+        knee_angles (RangeFilteredAngles): Knee angle of every frame, with its range validity flag.
+        ankle_angles (RangeFilteredAngles): Ankle angle of every frame, with its range validity flag.
         counting (int): Counter for frames processed.
-        counting_LTR (int): Counter for frames processed in left-to-right direction.
         init_angle_ang (float): Initial ankle angle.
-        filtered_ankle_angles (list): List to store filtered ankle angles.
         direction (str): Motion direction ("left_to_right" or "right_to_left").
         showLines (bool): Flag to display motion lines on frames.
         showLabels (bool): Flag to display marker labels on frames.
@@ -27,34 +23,51 @@
         end_point_vertical (tuple): End point for vertical calibration line.
         clicked_vertical (bool): Flag indicating if mouse was clicked for vertical line.
         draw_vertical_line (bool): Flag to draw vertical calibration line.
-        new_frame (numpy.ndarray): Copy of the latest video frame.
+        new_frame (numpy.ndarray): Latest video frame (a ring buffer slot of the capture, valid until the next read).
         pixel_to_cm_horizontal (float): Conversion factor from pixels to centimeters (horizontal).
         pixel_to_cm_vertical (float): Conversion factor from pixels to centimeters (vertical).
-        min_y_vm_list (list): List to store minimum Y values for the VM marker.
-        vm_y_value (list): List to store Y values for the VM marker.
-        init_stance_phase (bool): Flag indicating initiation of stance phase.
-        init_swing_phase (bool): Flag indicating initiation of swing phase.
-        stance_frame (float): Frame number when stance phase starts.
-        swing_frame (float): Frame number when swing phase starts.
-        vm_y_value_LTR (list): List to store Y values for the VM marker in left-to-right motion.
-        init_stance_phase_LTR (bool): Flag indicating initiation of stance phase in left-to-right motion.
-        init_swing_phase_LTR (bool): Flag indicating initiation of swing phase in left-to-right motion.
-        stance_frame_LTR (float): Frame number when stance phase starts in left-to-right motion.
-        swing_frame_LTR (float): Frame number when swing phase starts in left-to-right motion.
+        swing_threshold (int): Rise in pixels of the VM marker that starts the swing phase (forwarded to
+            gait_session; a new value applies from the next frame, to the phases and to the heel strikes and toe
+            offs of the current pass).
+        phase_window (int): Number of frames the VM marker extremes are taken over (None for the whole pass;
+            forwarded to gait_session, a new value applies from the next pass).
         fps_rate (int): Frames per second rate.
+        direction_estimator (DirectionEstimator): Walking direction from the trochanter and shoulder velocity.
+        flow_direction (FlowDirection): Reduced-rate optical flow direction, used when the markers cannot tell (None
+            to disable).
+        gait_session (GaitSession): Passes along the walkway and their stance, swing, heel strike and toe off events.
+        trochanter_offset (float): Distance in pixels between the trochanter marker and the virtual trochanter.
+        model (YoloModel): Shared YOLO network, loaded and warmed up once per process (or the model passed in).
+        roi_padding (int): Half size in pixels of the regions searched when markers go missing.
+        scheduler (DetectionScheduler): Decides when YOLO runs and reports the detect/track ratio.
+        iou_threshold (float): Minimum IoU for a detection to replace a tracked box.
+        tracking (bool): Whether the last tracker update succeeded.
+        trackers (MarkerTrackerSet): One tracker per marker, using the backend chosen for the session.
+        tracking_state (TrackingState): Per-marker Kalman filters used to smooth centers and bridge short occlusions.
+        identity_gate (float): Maximum distance in pixels for a detection to be assigned to a followed marker.
+        marker_positions (dict): Center of each marker on the current frame, keyed by marker ID (index in names).
+        headless (bool): Run without overlays (batch analysis); broken videos raise IOError instead of exiting.
+        trajectory (TimeSeriesStore): Frame number, time and x/y center of every marker for every frame.
+        status (tuple): Text, color and thickness of the detection/tracking banner of the current frame, or None.
+        frame_angles (tuple): Hip, knee and ankle angles computed on the current frame, or None.
+        frame_angles_valid (tuple): Whether each angle of the current frame is inside its accepted range.
+        capture (FrameCapture): Background decoder filling a ring buffer of frames (created by open_camera).
+        frame_number (int): Position in the video of the current frame.
+        timestamp (float): Time in seconds of the current frame.
 
     Methods:
-        __init__(self, cameraID, window_name, n_markers=5):
+        __init__(self, cameraID, window_name, n_markers=5, detect_every=30, tracker_backend="KCF", headless=False,
+                 model=None):
             Initializes the MotionAnalysis object.
 
         draw_line_on_frame(self, frame, start_point, end_point, line_length, display=True):
             Draws a line on the frame with a specified length.
 
         handle_mouse_event(self, event, x, y, flags, param):
-            Handles mouse events for setting calibration lines.
+            Handles mouse events for setting calibration lines (clicks in frame coordinates, cv2 event codes).
 
-        open_camera(self):
-            Opens the camera for video capture.
+        open_camera(self, start_frame=0):
+            Opens the video source and starts decoding it in a background thread.
 
         init_time(self):
             Initializes the loop time for frame processing.
@@ -63,46 +76,65 @@
             Retrieves and processes the next video frame.
 
         init_tracker(self):
-            Initializes the multi-tracker for marker detection.
+            Detects the markers and initializes one tracker per marker.
 
-        remove_empty_boxes(self):
-            Removes empty bounding boxes.
+        assign_identities(self, detected_boxes, candidates=None):
+            Places detected boxes in the slots of the markers they belong to (Hungarian matching).
+
+        reset_trackers(self):
+            Recreates the trackers from the current boxes.
 
         check_markers(self):
-            Checks if the correct number of markers is detected.
+            Checks if the correct number of markers is detected and runs either the detector or the trackers,
+            as decided by the detection scheduler.
+
+        recover_lost_markers(self):
+            Re-initialises only the trackers that lost their marker.
+
 
         markers_centers(self):
-            Retrieves centers of detected markers.
+            Retrieves the Kalman-smoothed centers of the markers, predicting those missing for a few frames.
+
+        set_marker_positions(self, positions):
+            Sets the marker centers of the current frame (from the trackers or from stored trajectories).
+
+        tracking_ok(self):
+            Checks whether every marker was tracked or is still bridged by prediction.
 
         gait_direction(self):
-            Determines the motion direction based on optical flow.
+            Determines the motion direction from the marker velocity, with optical flow as fallback.
 
         get_raw_angles(self, joint1, joint2, joint3):
             Calculates raw angles between three points.
 
         get_filtered_angles(self):
-            Calculates filtered angles for hip, knee, and ankle.
+            Calculates the hip, knee and ankle angles of the frame and range-checks them as they are stored.
 
-        gait_phases_RTL(self):
-            Determines stance and swing phases in right-to-left motion.
+        update_gait_events(self):
+            Finds the stance and swing phases, heel strikes and toe offs of the frame, for the current pass.
 
-        gait_phase_LTR(self):
-            Determines stance and swing phases in left-to-right motion.
-
-        lines(self):
+        lines(self, frame):
             Draws motion lines on the frame.
 
-        labels(self):
+        labels(self, frame):
             Draws marker labels on the frame.
 
         end_time(self):
-            Calculates and displays the frame processing time.
+            Calculates the frame processing rate.
+
+        draw_calibration(self, frame):
+            Draws the calibration lines on the frame.
 
-        display_window(self):
-            Displays the video frame in the window.
+        draw_overlays(self, frame):
+            Draws every overlay of the current frame, for the frames that are presented.
 
         close_window(self):
-            Closes the video window and releases resources.
+            Stops the video capture and releases resources.
+
+    Functions:
+        check_roi_recovery(frames=60, hidden=range(30, 33), hidden_marker=2):
+            Checks on a synthetic clip that a short occlusion is recovered by the local search (run
+            python -m backend.backend from main_folder).
     """
 
 import math
@@ -110,30 +142,54 @@ from time import time
 
 import cv2
 import numpy as np
-from backend.markers_detection import MarkerDetection
+from backend.angle_engine import TROCHANTER_OFFSET, compute_angles, joint_angles
+from backend.angle_filter import ANGLE_LIMITS, RangeFilteredAngles
+from backend.direction import DirectionEstimator, FlowDirection
+from backend.frame_capture import FrameCapture
+from backend.gait_events import GaitSession
+from backend.marker_trackers import MarkerTrackerSet
+from backend.markers_detection import ROI_INPUT_SIZE, MarkerDetection
+from backend.model_registry import ModelRegistry
+from backend.timeseries import TimeSeriesStore
+from backend.tracking_scheduler import DetectionScheduler, iou_matrix, reconcile_boxes
+from backend.tracking_state import TrackingState
+
+# Marker names, indexed by marker ID (top of the body to the bottom)
+MARKER_NAMES = ["Shoulder", "Trochanter", "Knee", "Ankle", "V_Metatarsal"]
+
+# Real length in centimeters of the horizontal and vertical calibration lines
+CALIBRATION_LENGTH_HORIZONTAL = 10.32
+CALIBRATION_LENGTH_VERTICAL = 4.21
 
 
 class MotionAnalysis:
-    def __init__(self, cameraID, window_name, n_markers=5):
+    def __init__(
+        self,
+        cameraID,
+        window_name,
+        n_markers=5,
+        detect_every=30,
+        tracker_backend="KCF",
+        headless=False,
+        model=None,
+    ):
         self.cameraID = cameraID
+        self.headless = headless
 
         self.window_name = window_name
-        self.names = ["Shoulder", "Trochanter", "Knee", "Ankle", "V_Metatarsal"]
+        self.names = list(MARKER_NAMES)
         self.n_markers = n_markers
-        self.first_ankle_angle = []
-        self.angle_stored = False
-        self.hip_angles = []
-        self.knee_angles = []
-        self.ankle_angles = []
+        self.hip_angles = RangeFilteredAngles(*ANGLE_LIMITS["hip"])
+        self.knee_angles = RangeFilteredAngles(*ANGLE_LIMITS["knee"])
+        self.ankle_angles = RangeFilteredAngles(*ANGLE_LIMITS["ankle"])
         self.counting = 0
-        self.counting_LTR = 0
 
         self.init_angle_ang = None
-        self.filtered_ankle_angles = []
         self.direction = "left_to_right"
-        self.showLines = True
-        self.showLabels = True
-        self.showbbox = True
+        # Nothing is drawn when nobody looks at the frames
+        self.showLines = not headless
+        self.showLabels = not headless
+        self.showbbox = not headless
 
         # *################################
         self.start_point_horizontal = None
@@ -146,27 +202,81 @@ class MotionAnalysis:
         self.clicked_vertical = False
         self.draw_vertical_line = True
         self.new_frame = None
-
-        cv2.namedWindow(self.window_name)
-        cv2.setMouseCallback(self.window_name, self.handle_mouse_event)
+        # (text, color, thickness) of the detection/tracking banner of the current frame
+        self.status = None
+        self.frame_number = 0
+        self.timestamp = 0.0
 
         self.pixel_to_cm_horizontal = None
         self.pixel_to_cm_vertical = None
 
-        self.min_y_vm_list = []
-        self.vm_y_value = []
-        self.init_stance_phase = False
-        self.init_swing_phase = False
-        self.stance_frame = None
-        self.swing_frame = None
+        self.fps_rate = 120
 
-        self.vm_y_value_LTR = []
-        self.init_stance_phase_LTR = False
-        self.init_swing_phase_LTR = False
-        self.stance_frame_LTR = None
-        self.swing_frame_LTR = None
+        # Gait events of every pass along the walkway; a new pass starts when the walking direction changes
+        self.gait_session = GaitSession(self.fps_rate)
 
-        self.fps_rate = 120
+        # Rise in pixels of the VM marker above its highest point that starts the swing phase
+        self.swing_threshold = 7
+
+        # Number of frames the VM marker extremes are taken over (None for the whole pass)
+        self.phase_window = None
+
+        # Walking direction from the trochanter and shoulder velocity, with optical flow (every 10 frames) only
+        # when those markers are not followed; set flow_direction to None to disable the fallback
+        self.direction_estimator = DirectionEstimator(self.fps_rate)
+        self.flow_direction = FlowDirection(every=10)
+
+        # Distance in pixels from the trochanter marker to the virtual trochanter
+        self.trochanter_offset = TROCHANTER_OFFSET  #! Colocar uma parte na GUI para inserir este valor em centímetros
+
+        # Half size of the regions searched around lost markers
+        self.roi_padding = 80
+
+        # Tracking-by-detection: YOLO every detect_every frames or after a tracking failure
+        self.scheduler = DetectionScheduler(detect_every)
+        self.iou_threshold = 0.3
+        self.tracking = True
+
+        # One tracker per marker ("CSRT", "KCF", "MOSSE" or "LK"), chosen per session
+        self.trackers = MarkerTrackerSet(tracker_backend)
+
+        # Per-marker Kalman filters: smoothing, occlusion bridging and search windows
+        self.tracking_state = TrackingState(n_markers, max_missed=5)
+
+        # Marker IDs are the indexes of self.names; detections farther than this from a prediction are not matched
+        self.identity_gate = 200.0
+        self.marker_positions = {}
+
+        # Smoothed center of every marker on every frame (NaN while a marker is not found)
+        self.trajectory = TimeSeriesStore(
+            {
+                "frame": np.int32,
+                "time": np.float64,
+                "x": (np.float32, n_markers),
+                "y": (np.float32, n_markers),
+            }
+        )
+
+        # Load (or reuse) the YOLO network at startup so no detection has to parse the weights again
+        self.model = model if model is not None else ModelRegistry.get()
+
+    @property
+    def swing_threshold(self):
+        return self.gait_session.pass_params["swing_threshold"]
+
+    @swing_threshold.setter
+    def swing_threshold(self, value):
+        # Used by the passes that start afterwards and, from the next frame, by the current one (phases and events)
+        self.gait_session.set_swing_threshold(value)
+
+    @property
+    def phase_window(self):
+        return self.gait_session.pass_params["phase_window"]
+
+    @phase_window.setter
+    def phase_window(self, value):
+        # The extremes of a pass are kept over one window, so a new window applies from the next pass
+        self.gait_session.set_phase_window(value)
 
     # *######################################
 
@@ -204,9 +314,13 @@ class MotionAnalysis:
 
     # *######################################
 
-    def open_camera(self):
-        self.camera = cv2.VideoCapture(self.cameraID)
-        if not self.camera.isOpened():
+    def open_camera(self, start_frame=0):
+        # Frames are decoded in a background thread into a ring buffer, ahead of the analysis
+        self.capture = FrameCapture(self.cameraID)
+        if not self.capture.start(start_frame):
+            if self.headless:
+                # Batch callers decide what to do with a broken file
+                raise IOError(f"Could not open video: {self.cameraID}")
             print("Error: Could not open video.")
             exit()
 
@@ -214,10 +328,13 @@ class MotionAnalysis:
         self.loop_time = time()
 
     def get_video_frame(self):
-        self.success, self.frame = self.camera.read()
+        self.success, self.frame, frame_number, timestamp = self.capture.read()
 
         if self.success:
-            self.new_frame = self.frame.copy()
+            # The ring buffer slot is ours until the next read, so the overlays are drawn on it directly
+            self.new_frame = self.frame
+            self.frame_number = frame_number
+            self.timestamp = timestamp
         else:
             self.new_frame = None
             print("\nFrame not available\n")
@@ -233,17 +350,9 @@ class MotionAnalysis:
                 + (self.end_point_horizontal[1] - self.start_point_horizontal[1]) ** 2
             )
             # Calculate the conversion factor from pixels to centimeters horizontally
-            real_length_horizontal = 10.32
+            real_length_horizontal = CALIBRATION_LENGTH_HORIZONTAL
             self.pixel_to_cm_horizontal = real_length_horizontal / length_horizontal
 
-            self.draw_line_on_frame(
-                self.new_frame,
-                self.start_point_horizontal,
-                self.end_point_horizontal,
-                real_length_horizontal,
-                display=True,
-            )
-
         # Calibrate vertically
         if (
             self.start_point_vertical is not None
@@ -256,349 +365,317 @@ class MotionAnalysis:
             )
 
             # Calculate the conversion factor from pixels to centimeters vertically
-            real_length_vertical = 4.21
+            real_length_vertical = CALIBRATION_LENGTH_VERTICAL
             self.pixel_to_cm_vertical = real_length_vertical / length_vertical
 
-            self.draw_line_on_frame(
-                self.new_frame,
-                self.start_point_vertical,
-                self.end_point_vertical,
-                real_length_vertical,
-                display=True,
-            )
-
     # *######################################
 
     def init_tracker(self):
-        markerDDetection = MarkerDetection(self.new_frame)
-        self.new_frame, self.boxes, self.indexes = markerDDetection.detect()
-
-        self.multiTracker = cv2.legacy.MultiTracker_create()
+        markerDDetection = MarkerDetection(
+            self.new_frame, model=self.model, n_markers=self.n_markers
+        )
+        self.new_frame, detected_boxes, self.indexes = markerDDetection.detect()
 
-        for box in self.boxes:
-            self.multiTracker.add(cv2.legacy.TrackerCSRT_create(), self.new_frame, box)
+        self.boxes = self.assign_identities(detected_boxes)
+        self.reset_trackers()
+        self.scheduler.record_detection()
 
-    def remove_empty_boxes(self):
-        self.boxes = [box for box in self.boxes if np.any(box != [0, 0, 0, 0])]
+    def assign_identities(self, detected_boxes, candidates=None):
+        """
+        Place detected boxes in the slots of the markers they belong to.
 
-    def check_markers(self):
-        if len(self.boxes) != self.n_markers:
-            if self.n_markers - len(self.boxes) == 1:
-                cv2.putText(
-                    self.new_frame,
-                    "1 marker missing",
-                    (10, 110),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 255),
-                    2,
-                )
-            elif self.n_markers - len(self.boxes) == -1:
-                cv2.putText(
-                    self.new_frame,
-                    "1 marker in excess",
-                    (10, 110),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 255),
-                    2,
-                )
-            elif self.n_markers - len(self.boxes) > 1:
-                cv2.putText(
-                    self.new_frame,
-                    f"{int(self.n_markers - len(self.boxes))} markers missing",
-                    (10, 110),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 255),
-                    2,
-                )
-            elif self.n_markers - len(self.boxes) < -1:
-                cv2.putText(
-                    self.new_frame,
-                    f"{abs(int(self.n_markers - len(self.boxes)))} markers in excess",
-                    (10, 110),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 255),
-                    2,
-                )
+        Returns an (n_markers, 4) int32 array where row i is the box of the marker with ID i (the index in
+        self.names), or an empty box when that marker was not detected.
+        """
+        boxes = np.zeros((self.n_markers, 4), dtype=np.int32)
+        detected_boxes = np.asarray(detected_boxes).reshape(-1, 4)
+        centers = [(box[0] + box[2] / 2, box[1] + box[3] / 2) for box in detected_boxes]
 
-            markerDDetection = MarkerDetection(self.new_frame)
-            self.new_frame, self.boxes, self.indexes = markerDDetection.detect()
+        for detection_index, marker_id in self.tracking_state.assign(
+            centers, candidates, self.identity_gate
+        ):
+            boxes[marker_id] = detected_boxes[detection_index]
+        return boxes
+
+    def reset_trackers(self):
+        self.trackers.init(self.new_frame, self.boxes)
+        self.tracking = all(self.trackers.ok)
+
+    def tracking_ok(self):
+        """
+        True when every tracker followed its marker, or the markers it lost are still bridged by prediction.
+        """
+        return all(
+            ok or self.tracking_state.is_bridged(i)
+            for i, ok in enumerate(self.trackers.ok)
+        )
 
-            self.multiTracker = cv2.legacy.MultiTracker_create()
+    def check_markers(self):
+        # The status banner is only stored here; draw_overlays renders it on the presented frames, so the
+        # detector and the trackers always see the untouched frame
+        visible = int(np.count_nonzero(np.any(np.asarray(self.boxes).reshape(-1, 4), axis=1)))
+
+        # Markers bridged by their Kalman filter do not trigger a re-detection yet
+        if visible + self.tracking_state.bridged_count() != self.n_markers:
+            missing = self.n_markers - visible
+            if missing == 1:
+                self.status = ("1 marker missing", (0, 0, 255), 2)
+            elif missing == -1:
+                self.status = ("1 marker in excess", (0, 0, 255), 2)
+            elif missing > 1:
+                self.status = (f"{int(missing)} markers missing", (0, 0, 255), 2)
+            elif missing < -1:
+                self.status = (f"{abs(int(missing))} markers in excess", (0, 0, 255), 2)
+            else:
+                self.status = None
 
-            for box in self.boxes:
-                self.multiTracker.add(
-                    cv2.legacy.TrackerCSRT_create(), self.new_frame, box
-                )
-        else:
-            cv2.putText(
-                self.new_frame,
-                "Tracking",
-                (10, 110),
-                cv2.FONT_HERSHEY_DUPLEX,
-                1,
-                (0, 255, 0),
-                3,
+            # Markers lost for good or never seen: only a full-frame detection can find them
+            markerDDetection = MarkerDetection(
+                self.new_frame, model=self.model, n_markers=self.n_markers
             )
+            self.new_frame, detected_boxes, self.indexes = markerDDetection.detect()
 
-            self.tracking, self.boxes = self.multiTracker.update(self.new_frame)
-
-    def markers_centers(self):
-        self.sorted_centers = []
-        self.centers = []
-
-        for i, newbox in enumerate(self.boxes):
-            x = int(newbox[0])
-            y = int(newbox[1])
-            w = int(newbox[2])
-            h = int(newbox[3])
-
-            center = (x + w // 2, y + h // 2)
-            self.x_coord, self.y_coord = center[0], center[1]
-            self.sorted_centers.append(((self.x_coord, self.y_coord), i))
-            self.centers.append((center, i))
-            if self.showbbox:
-                cv2.rectangle(self.new_frame, (x, y), (x + w, y + h), (0, 0, 255), 4)
-            cv2.circle(self.new_frame, center, 6, (255, 0, 0), -1)
-
-    def gait_direction(self):
-        if not hasattr(self, "prev_frame"):
-            self.prev_frame = self.new_frame.copy()
-            return
+            self.boxes = self.assign_identities(detected_boxes)
+            self.reset_trackers()
+            self.scheduler.record_detection()
 
-        # Reduce frame size for better performance
-        scale_factor = 0.15
+        elif self.scheduler.should_detect(self.tracking_ok()):
+            # Scheduled detection: propagate the trackers, then correct them with a fresh detection
+            self.status = ("Detecting", (0, 255, 0), 3)
 
-        if self.success:
-            resized_prev_frame = cv2.resize(
-                self.prev_frame, None, fx=scale_factor, fy=scale_factor
-            )
-            resized_new_frame = cv2.resize(
-                self.new_frame, None, fx=scale_factor, fy=scale_factor
+            self.tracking, tracked_boxes = self.trackers.update(
+                self.new_frame, self.tracking_state.predicted_boxes(self.trackers.last_boxes)
             )
 
-            prev_gray = cv2.cvtColor(resized_prev_frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.cvtColor(resized_new_frame, cv2.COLOR_BGR2GRAY)
-
-            # Calculate optical flow using Farneback method
-            flow = cv2.calcOpticalFlowFarneback(
-                prev_gray,
-                gray,
-                None,
-                pyr_scale=0.5,
-                levels=3,
-                winsize=15,
-                iterations=3,
-                poly_n=5,
-                poly_sigma=1.2,
-                flags=0,
+            markerDDetection = MarkerDetection(
+                self.new_frame, model=self.model, n_markers=self.n_markers
             )
+            _, detected_boxes, self.indexes = markerDDetection.detect()
 
-            # Calculate the mean flow in the x-direction
-            mean_flow_x = np.mean(flow[:, :, 0])
-
-            # Set the direction based on the mean flow in the x-direction
-            self.direction = "left_to_right" if mean_flow_x > 0 else "right_to_left"
+            merged, refreshed, unmatched = reconcile_boxes(
+                tracked_boxes, detected_boxes, self.iou_threshold
+            )
 
-            # Update the previous frame
-            self.prev_frame = self.new_frame.copy()
+            # Detections that no tracker explains go to the lost markers, by predicted position
+            open_ids = [i for i in self.trackers.lost_indexes() if i not in refreshed]
+            recovered = self.assign_identities(detected_boxes[unmatched], open_ids)
+            for i in open_ids:
+                if np.any(recovered[i]):
+                    merged[i] = recovered[i]
+                    refreshed.append(i)
 
-    def get_raw_angles(self, joint1, joint2, joint3):
-        # Calculate vectors between the points
-        vec1 = (joint2[0] - joint1[0], joint2[1] - joint1[1])
-        vec2 = (joint3[0] - joint2[0], joint3[1] - joint2[1])
+            for i in refreshed:
+                self.trackers.reinit(i, self.new_frame, merged[i])
 
-        # Calculate the dot product of the two vectors
-        dot_product = vec1[0] * vec2[0] + vec1[1] * vec2[1]
+            self.boxes = merged
+            self.tracking = all(self.trackers.ok)
+            self.scheduler.record_detection()
 
-        # Calculate the magnitude of the vectors
-        magnitude_vec1 = math.sqrt(vec1[0] ** 2 + vec1[1] ** 2)
-        magnitude_vec2 = math.sqrt(vec2[0] ** 2 + vec2[1] ** 2)
+        else:
+            self.status = ("Tracking", (0, 255, 0), 3)
 
-        if magnitude_vec1 == 0 or magnitude_vec2 == 0:
-            return 0.00
+            self.tracking, self.boxes = self.trackers.update(
+                self.new_frame, self.tracking_state.predicted_boxes(self.trackers.last_boxes)
+            )
+            # Markers whose tracker failed are searched for around their prediction while they are still bridged
+            if not self.tracking:
+                self.recover_lost_markers()
+            self.scheduler.record_tracking()
+
+    def recover_lost_markers(self):
+        """
+        Re-initialise only the trackers that lost their marker.
+
+        Each lost marker is searched for in the window predicted by its Kalman filter, at most a few box sizes
+        around the prediction. A box found there is rejected when it overlaps the box of a marker that is still
+        tracked, or when it lies farther than identity_gate from the prediction, so a lost marker never takes the
+        box (and identity) of another one. Called on the tracking frames, right after the trackers were updated,
+        for markers whose filter still predicts them; markers lost for more than max_missed frames are left to the
+        full-frame detection of check_markers.
+
+        Returns True when every lost marker was found again (the other trackers are left untouched), and False
+        when they stay bridged by their filter.
+        """
+        lost = self.trackers.lost_indexes()
+        if not lost or not all(
+            self.tracking_state.filters[i].initialized and not self.tracking_state.is_lost(i) for i in lost
+        ):
+            return False
 
-        # Calculate the angle in radians
-        angle_radians = math.acos(dot_product / (magnitude_vec1 * magnitude_vec2))
+        # The search window grows with the prediction uncertainty, up to a few marker sizes
+        box_size = max(max(self.trackers.last_boxes[i][2:4]) for i in lost)
+        max_padding = max(self.roi_padding, int(3 * box_size))
 
-        # Convert angle from radians to degrees
-        angle_degrees = math.degrees(angle_radians)
+        # Search each lost marker around the position predicted by its Kalman filter
+        windows = [self.tracking_state.search_window(i, self.roi_padding, max_padding) for i in lost]
+        predicted_centers = [center for center, _ in windows]
+        padding = max(padding for _, padding in windows)
 
-        return angle_degrees
+        markerDDetection = MarkerDetection(self.new_frame, model=self.model)
+        recovered, found = markerDDetection.detect_in_rois(
+            predicted_centers, padding=padding
+        )
+        if len(found) != len(lost):
+            return False
 
-    def get_filtered_angles(self):
-        self.gt_center = []
-        self.sorted_centers = sorted(self.sorted_centers, key=lambda x: x[0][1])
+        tracked_boxes = [box for i, box in enumerate(self.trackers.last_boxes) if i not in lost]
+        overlap = iou_matrix(recovered, tracked_boxes)
+        for box, lost_index, box_overlap in zip(recovered, found, overlap):
+            cx, cy = predicted_centers[lost_index]
+            distance = math.hypot(box[0] + box[2] / 2 - cx, box[1] + box[3] / 2 - cy)
+            if np.any(box_overlap > 0) or distance > self.identity_gate:
+                return False
 
-        prev_x = 0
-        prev_y = 0
-        self.time_values = []  # Corresponding time values for each center
+        # Each region belongs to one marker, so the recovered box keeps that marker's ID
+        for box, lost_index in zip(recovered, found):
+            self.trackers.reinit(lost[lost_index], self.new_frame, box)
 
-        for i, (_, _) in enumerate(self.sorted_centers):
-            distance = (
-                160  #! Colocar uma parte na GUI para inserir este valor em centímetros
-            )
-            if prev_x != 0 and prev_y != 0:
-                x_gt = self.centers[1][0][0]
-                y_gt = self.centers[1][0][1]
-                x_le = self.centers[2][0][0]
-                y_le = self.centers[2][0][1]
-                alpha = np.arctan((x_gt - x_le) / (y_gt - y_le))
-                new_x = int(-distance * np.sin(alpha) + x_gt)  #! Atualizar a distancia
-                new_y = int(-distance * np.cos(alpha) + y_gt)  #! Atualizar a distancia
-                if not self.gt_center:
-                    self.gt_center.append((new_x, new_y))
-
-                # * Markers coordinates
-                a_marker = (self.centers[0][0][0], self.centers[0][0][1])
-                gt_marker = (new_x, new_y)
-                le_marker = (self.centers[2][0][0], self.centers[2][0][1])
-                lm_marker = (self.centers[3][0][0], self.centers[3][0][1])
-                v_m_marker = (self.centers[4][0][0], self.centers[4][0][1])
-
-                hip_ang = self.get_raw_angles(a_marker, gt_marker, le_marker)
-                knee_ang = self.get_raw_angles(gt_marker, le_marker, lm_marker)
-                ankle_ang = self.get_raw_angles(le_marker, lm_marker, v_m_marker)
-
-                if self.init_angle_ang == None:
-                    self.init_angle_ang = ankle_ang
-
-                ankle_ang -= self.init_angle_ang
-                self.hip_angles.append(hip_ang)
-                self.knee_angles.append(knee_ang)
-                self.ankle_angles.append(ankle_ang)
-
-                upper_threshold_hip = 40
-                lower_threshold_hip = -20
-
-                upper_threshold_knee = 80
-                lower_threshold_knee = -10
-
-                upper_threshold_ankle = 35
-                lower_threshold_ankle = -30
-
-                # For hip_angles
-                filtered_hip_angles = []
-                for angle in self.hip_angles:
-                    if lower_threshold_hip <= angle <= upper_threshold_hip:
-                        filtered_hip_angles.append(angle)
-                self.hip_angles = filtered_hip_angles
-
-                # For knee_angles
-                filtered_knee_angles = []
-                for angle in self.knee_angles:
-                    if lower_threshold_knee <= angle <= upper_threshold_knee:
-                        filtered_knee_angles.append(angle)
-                self.knee_angles = filtered_knee_angles
-
-                # For ankle_angles
-                filtered_ankle_angles = []
-                for angle in self.ankle_angles:
-                    if lower_threshold_ankle <= angle <= upper_threshold_ankle:
-                        filtered_ankle_angles.append(angle)
-                self.ankle_angles = filtered_ankle_angles
-
-                cv2.circle(self.new_frame, (new_x, new_y), 10, (0, 0, 255), -1)
-
-            prev_x = self.centers[i][0][0]
-            prev_y = self.centers[i][0][1]
+        self.boxes = np.array(self.trackers.last_boxes).astype(np.int32)
+        self.tracking = True
+        return True
 
-        self.counting += 1
+    def markers_centers(self):
+        measurements = []
+        # self.boxes[i] is the box of the marker with ID i
+        for newbox in self.boxes:
+            x = int(newbox[0])
+            y = int(newbox[1])
+            w = int(newbox[2])
+            h = int(newbox[3])
 
-    def gait_phases_RTL(self):
-        for value in self.sorted_centers:
-            marker = value[1]
-            if marker == 4:  # Consider the VM marker
-                current_frame = int(self.camera.get(cv2.CAP_PROP_POS_FRAMES))
-                current_vm_y = value[0][1]
+            if w == 0 and h == 0:
+                # Marker lost by its tracker on this frame
+                measurements.append(None)
+                continue
+
+            measurements.append((x + w // 2, y + h // 2))
+
+        # Smoothed centers; markers missing for a few frames are predicted
+        estimates = self.tracking_state.update(measurements)
+        self.set_marker_positions(
+            {
+                i: (int(round(estimate[0])), int(round(estimate[1])))
+                for i, estimate in enumerate(estimates)
+                if estimate is not None
+            }
+        )
 
-                self.vm_y_value.append(current_vm_y)
+        x = np.full(self.n_markers, np.nan, dtype=np.float32)
+        y = np.full(self.n_markers, np.nan, dtype=np.float32)
+        for i, center in self.marker_positions.items():
+            x[i], y[i] = center
+        self.trajectory.append(frame=self.frame_number, time=self.timestamp, x=x, y=y)
 
-                min_y = min(self.vm_y_value)
-                max_y = max(self.vm_y_value)
+    def set_marker_positions(self, positions):
+        """
+        Set the marker centers of the current frame.
 
-                if not self.init_stance_phase and current_vm_y - min_y == 0:
-                    self.init_stance_phase = True
-                    if self.stance_frame == None:
-                        self.stance_frame = current_frame / self.fps_rate
+        Parameters:
+        - positions (dict): (x, y) center of every marker found on the frame, keyed by marker ID.
+        """
+        self.sorted_centers = []
+        self.centers = []
+        self.marker_positions = {}
 
-                if not self.init_swing_phase and max_y - current_vm_y >= 7:
-                    self.init_swing_phase = True
-                    if self.swing_frame == None:
-                        self.swing_frame = current_frame / self.fps_rate
+        for i in sorted(positions):
+            center = positions[i]
+            self.x_coord, self.y_coord = center[0], center[1]
+            self.sorted_centers.append(((self.x_coord, self.y_coord), i))
+            self.centers.append((center, i))
+            self.marker_positions[i] = center
 
-                # * Colocar uma nova variável para acabar a swing phase
-                # * quando esta acabar então começa a stance phase outra vez
+    def gait_direction(self):
+        direction = self.direction_estimator.update(self.frame_number, self.marker_positions, self.direction)
+        if direction is None and self.flow_direction is not None and self.success:
+            direction = self.flow_direction.update(self.frame_number, self.new_frame)
+        if direction is not None:
+            self.direction = direction
 
-                self.counting += 1
+    def get_raw_angles(self, joint1, joint2, joint3):
+        # Angle between joint1 -> joint2 and joint2 -> joint3, with the cosine clipped to [-1, 1]
+        return float(joint_angles([joint1], [joint2], [joint3])[0])
 
-        return self.stance_frame, self.swing_frame
+    def get_filtered_angles(self):
+        self.gt_center = []
+        self.frame_angles = None
+        self.frame_angles_valid = None
+        if len(self.marker_positions) < self.n_markers:
+            # A marker was lost on this frame; the angles need every marker
+            self.counting += 1
+            return
 
-    def gait_phase_LTR(self):
-        for value in self.sorted_centers:
-            marker = value[1]
-            if marker == 4:  # Consider the VM marker
-                current_frame = int(self.camera.get(cv2.CAP_PROP_POS_FRAMES))
-                current_vm_y = value[0][1]
+        self.sorted_centers = sorted(self.sorted_centers, key=lambda x: x[0][1])
 
-                self.vm_y_value_LTR.append(current_vm_y)
+        # Markers are looked up by ID, so the box order never changes which joint is which
+        positions = np.array(
+            [[self.marker_positions[i] for i in range(self.n_markers)]], dtype=np.float64
+        )
+        angles, trochanter = compute_angles(positions, self.trochanter_offset)
+        # Kept in float, as in the replayed angles; only the drawing rounds it to pixels
+        new_x, new_y = (float(value) for value in trochanter[0])
+        self.gt_center.append((new_x, new_y))
 
-                min_y = min(self.vm_y_value_LTR)
-                max_y = max(self.vm_y_value_LTR)
+        hip_ang, knee_ang, ankle_ang = (float(angle) for angle in angles[0])
 
-                if not self.init_stance_phase_LTR and current_vm_y - min_y == 0:
-                    self.init_stance_phase_LTR = True
-                    if self.stance_frame_LTR == None:
-                        self.stance_frame_LTR = current_frame / self.fps_rate
+        if self.init_angle_ang == None:
+            self.init_angle_ang = ankle_ang
 
-                if not self.init_swing_phase_LTR and max_y - current_vm_y >= 7:
-                    self.init_swing_phase_LTR = True
-                    if self.swing_frame_LTR == None:
-                        self.swing_frame_LTR = current_frame / self.fps_rate
+        ankle_ang -= self.init_angle_ang
+        self.frame_angles = (hip_ang, knee_ang, ankle_ang)
 
-                # * Colocar uma nova variável para acabar a swing phase
-                # * quando esta acabar então começa a stance phase outra vez
+        # One sample per frame, range-checked once; rejected samples stay in the series flagged as invalid
+        self.frame_angles_valid = (
+            self.hip_angles.append(self.frame_number, hip_ang),
+            self.knee_angles.append(self.frame_number, knee_ang),
+            self.ankle_angles.append(self.frame_number, ankle_ang),
+        )
 
-                self.counting_LTR += 1
+        self.counting += 1
 
-        return self.stance_frame_LTR, self.swing_frame_LTR
+    def update_gait_events(self):
+        """
+        Feed the foot markers of the frame to the gait pass of the current direction (stance and swing phases,
+        heel strikes and toe offs). Called exactly once per analyzed frame.
+
+        Returns:
+        - List of (pass, direction, event, time) rows found on this frame.
+        """
+        vm = self.marker_positions.get(4)
+        ankle = self.marker_positions.get(3)
+        return self.gait_session.update(
+            self.frame_number,
+            self.direction,
+            None if vm is None else vm[1],
+            None if ankle is None else ankle[1],
+        )
 
-    def lines(self):
+    def lines(self, frame):
         if self.showLines:
+            # Shoulder -> virtual trochanter -> knee -> ankle -> V_Metatarsal, following the marker IDs
             points = []
-            for i in range(len(self.centers)):
-                if i == 1:
-                    continue
-                x, y = self.centers[i][0][0], self.centers[i][0][1]
-                points.append((x, y))
-
-            for center in self.gt_center:
-                points.append((center[0], center[1]))
-
-            points.sort(key=lambda point: point[1])
-            unique_points = {}
-            for point in points:
-                if point not in unique_points:
-                    unique_points[point] = point
-
-            self.unique_points_list = list(unique_points.values())
+            for marker_id in range(self.n_markers):
+                if marker_id == 1:
+                    points.extend((int(round(x)), int(round(y))) for x, y in self.gt_center)
+                elif marker_id in self.marker_positions:
+                    points.append(self.marker_positions[marker_id])
 
             for i in range(1, len(points)):
-                cv2.line(self.new_frame, points[i], points[i - 1], (0, 255, 0), 3)
+                cv2.line(frame, points[i], points[i - 1], (0, 255, 0), 3)
 
-    def labels(self):
+    def labels(self, frame):
         if self.showLabels:
-            for idx, point in enumerate(self.unique_points_list):
-                if idx < len(self.names):
-                    name = self.names[idx]
-
+            for marker_id, point in self.marker_positions.items():
+                if marker_id == 1:
+                    # The trochanter label goes on the virtual trochanter point
+                    if not self.gt_center:
+                        continue
+                    point = tuple(int(round(value)) for value in self.gt_center[0])
+
+                name = self.names[marker_id]
                 x = point[0]
                 y = point[1]
                 cv2.putText(
-                    self.new_frame,
+                    frame,
                     f"{name}",
                     (x, y - 20),
                     cv2.FONT_HERSHEY_COMPLEX,
@@ -610,8 +687,67 @@ class MotionAnalysis:
     def end_time(self):
         self.fps = 1 / (time() - self.loop_time)
         self.loop_time = time()
+
+    def draw_calibration(self, frame):
+        if (
+            self.start_point_horizontal is not None
+            and self.end_point_horizontal is not None
+            and self.draw_horizontal_line
+        ):
+            self.draw_line_on_frame(
+                frame,
+                self.start_point_horizontal,
+                self.end_point_horizontal,
+                CALIBRATION_LENGTH_HORIZONTAL,
+                display=True,
+            )
+        if (
+            self.start_point_vertical is not None
+            and self.end_point_vertical is not None
+            and self.draw_vertical_line
+        ):
+            self.draw_line_on_frame(
+                frame,
+                self.start_point_vertical,
+                self.end_point_vertical,
+                CALIBRATION_LENGTH_VERTICAL,
+                display=True,
+            )
+
+    def draw_overlays(self, frame):
+        """
+        Draw the overlays of the current frame (calibration lines, boxes, marker centers, virtual trochanter, lines,
+        labels, detection/tracking status and analysis FPS) on frame. Only called for the frames that are actually
+        presented, so the analysis never pays for overlays nobody sees.
+
+        Parameters:
+        - frame (numpy.ndarray): BGR image to draw on, usually new_frame (its ring buffer slot is ours until the
+          next read).
+        """
+        if self.headless:
+            # Batch runs never draw: the frames stay exactly as decoded
+            return
+        self.draw_calibration(frame)
+
+        if self.showbbox:
+            for box in self.boxes:
+                x, y, w, h = (int(value) for value in box[:4])
+                if w or h:
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 4)
+
+        for i, center in self.marker_positions.items():
+            color = (0, 255, 255) if self.tracking_state.is_bridged(i) else (255, 0, 0)
+            cv2.circle(frame, center, 6, color, -1)
+        for x, y in self.gt_center:
+            cv2.circle(frame, (int(round(x)), int(round(y))), 10, (0, 0, 255), -1)
+
+        self.lines(frame)
+        self.labels(frame)
+        if self.status is not None:
+            text, color, thickness = self.status
+            cv2.putText(frame, text, (10, 110), cv2.FONT_HERSHEY_DUPLEX, 1, color, thickness)
         cv2.putText(
-            self.new_frame,
+            frame,
             f"FPS: {str(round(self.fps, 2))}",
             (10, 50),
             cv2.FONT_HERSHEY_DUPLEX,
@@ -620,15 +756,98 @@ class MotionAnalysis:
             3,
         )
 
-    def display_window(self):
-        if self.success:
-            if self.new_frame.shape[0] > 0 and self.new_frame.shape[1] > 0:
-                cv2.imshow(self.window_name, self.new_frame)
-                cv2.waitKey(1)
-        else:
-            cv2.waitKey(0)
-            print("Zero frames available")
-
     def close_window(self):
-        self.camera.release()
-        cv2.destroyAllWindows()
+        self.capture.stop()
+
+        capture_stats = self.capture.stats()
+        print(
+            f"Decoded frames: {capture_stats['decoded']}, "
+            f"dropped frames: {capture_stats['dropped']}, "
+            f"buffer overflows: {capture_stats['overflows']}"
+        )
+
+        report = self.scheduler.report()
+        print(
+            f"Detected frames: {report['detected_frames']}, "
+            f"tracked frames: {report['tracked_frames']}, "
+            f"detect ratio: {report['detect_ratio']:.3f}"
+        )
+
+
+def check_roi_recovery(frames=60, hidden=range(30, 33), hidden_marker=2):
+    """
+    Run MotionAnalysis on a synthetic clip where one marker disappears for a few frames and check that its
+    tracker is re-initialised by the local search of recover_lost_markers (MarkerDetection.detect_in_rois, one
+    batch of crops per frame), with its own marker ID and without any full-frame detection besides the first one.
+
+    The clip shows five white disks walking left to right; a stand-in network finds them as the bright regions
+    of the blob, so the check does not need the YOLO weights.
+    """
+    import os
+    import tempfile
+
+    class BrightMarkerModel:
+        # Same output layout as the YOLO layers: one (rows, 5 + classes) block per image of the blob
+        def __init__(self):
+            self.net = None
+            self.input_sizes = []
+
+        def forward(self, blob):
+            self.input_sizes.append(blob.shape[2:])
+            outs = np.zeros((blob.shape[0], 16, 6), dtype=np.float32)
+            for n, image in enumerate(blob):
+                mask = (image.mean(axis=0) > 0.5).astype(np.uint8)
+                count, _, stats, centroids = cv2.connectedComponentsWithStats(mask)
+                height, width = mask.shape
+                for row, label in enumerate(range(1, min(count, 17))):
+                    cx, cy = centroids[label]
+                    w, h = stats[label, 2:4]
+                    outs[n, row] = (cx / width, cy / height, w / width, h / height, 1.0, 1.0)
+            return [outs]
+
+    anchors = [(100, 50), (110, 160), (120, 260), (110, 360), (150, 420)]
+    path = os.path.join(tempfile.mkdtemp(), "roi_recovery.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (320, 480))
+    for i in range(frames):
+        frame = np.zeros((480, 320, 3), dtype=np.uint8)
+        for marker_id, (x, y) in enumerate(anchors):
+            if marker_id == hidden_marker and i in hidden:
+                continue
+            cv2.circle(frame, (x + i, y), 8, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+    model = BrightMarkerModel()
+    analysis = MotionAnalysis(path, None, detect_every=1000, headless=True, model=model)
+    analysis.open_camera()
+    recovered_frames = []
+    analysis.get_video_frame()
+    analysis.init_tracker()
+    while analysis.success:
+        analysis.markers_centers()
+        lost = analysis.trackers.lost_indexes()
+        analysis.get_video_frame()
+        if analysis.success:
+            analysis.check_markers()
+            if lost and not analysis.trackers.lost_indexes():
+                recovered_frames.append(analysis.frame_number)
+    analysis.close_window()
+    os.remove(path)
+
+    full_frame = sum(size == (416, 416) for size in model.input_sizes)
+    # Batches of crops from MarkerDetection.detect_in_rois, one per frame the hidden marker was searched on
+    local = sum(size == ROI_INPUT_SIZE[::-1] for size in model.input_sizes)
+    x, y = analysis.marker_positions[hidden_marker]
+    expected = (anchors[hidden_marker][0] + frames - 1, anchors[hidden_marker][1])
+    print(
+        f"Full-frame detections: {full_frame}, ROI searches: {local}, recovered on frames {recovered_frames}"
+    )
+    print(f"{analysis.names[hidden_marker]} at ({x}, {y}), expected {expected}")
+    assert full_frame == 1 and recovered_frames
+    assert 0 < local <= len(hidden) + 1 and full_frame + local == len(model.input_sizes)
+    assert math.hypot(x - expected[0], y - expected[1]) < 5
+
+
+# Usage
+if __name__ == "__main__":
+    check_roi_recovery()
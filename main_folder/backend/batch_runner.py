@@ -0,0 +1,186 @@
+"""
+Batch Runner Module
+
+This module analyzes a whole session of recorded videos in parallel. Every video is processed independently by the
+headless pipeline (see backend.headless) in a pool of worker processes; each worker loads and warms up its own
+copy of the YOLO network once, when it starts, and reuses it for every video it receives.
+
+Dependencies:
+- argparse: Command line interface.
+- concurrent.futures: Process pool.
+- cv2: OpenCV library for computer vision (thread count of the workers).
+- backend.headless: Single-video analysis and atomic CSV writer.
+- backend.model_registry: Per-process YOLO network cache.
+
+Functions:
+- find_videos: Lists the videos of a folder, or the paths listed in a manifest file.
+- run_batch: Analyzes a list of videos in a process pool and writes a summary file.
+
+Usage:
+- From main_folder: python -m backend.batch_runner path/to/session_folder -o results/ -j 16
+- A manifest is a text file with one video path per line; empty lines and lines starting with # are ignored.
+
+Note: A video that cannot be read or fails during the analysis is reported in the summary and the batch goes on
+with the next one. Result files are written atomically, so a crashed or interrupted worker never leaves a partial
+file behind.
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import time
+
+import cv2
+from backend.headless import analyze_video, write_csv
+from backend.model_registry import ModelRegistry
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+SUMMARY_COLUMNS = ["video", "status", "frames", "seconds", "fps", "error"]
+
+
+def find_videos(path):
+    """
+    Return the videos to analyze.
+
+    Parameters:
+    - path (str): Folder with the videos, or a manifest file with one video path per line. Relative paths of a
+      manifest are relative to the manifest's folder.
+
+    Returns:
+    - Sorted list of video paths.
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        )
+
+    base = os.path.dirname(os.path.abspath(path))
+    videos = []
+    with open(path) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                videos.append(os.path.join(base, line))
+    return videos
+
+
+def init_worker():
+    """
+    Prepare a worker process: one OpenCV thread per process (the parallelism comes from the pool) and the YOLO
+    network loaded once, before the first video.
+    """
+    cv2.setNumThreads(1)
+    ModelRegistry.get()
+
+
+def analyze_one(video_path, output_dir, options):
+    """
+    Analyze one video in a worker, turning any failure into a result instead of an exception.
+    """
+    try:
+        summary = analyze_video(video_path, output_dir, **options)
+        summary["status"] = "ok"
+        summary["error"] = ""
+    except Exception as error:
+        summary = {
+            "video": video_path,
+            "status": "failed",
+            "frames": 0,
+            "seconds": 0.0,
+            "fps": 0.0,
+            "error": f"{type(error).__name__}: {error}",
+        }
+    return summary
+
+
+def run_batch(videos, output_dir, workers=None, **options):
+    """
+    Analyze a list of videos in a pool of worker processes.
+
+    Parameters:
+    - videos (list): Video paths.
+    - output_dir (str): Folder of the result files and of batch_summary.csv.
+    - workers (int): Number of worker processes (default is the number of CPUs).
+    - options: n_markers, detect_every and tracker_backend, passed to every analysis.
+
+    Returns:
+    - List of per-video summaries (status "ok" or "failed"), in the order of videos.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time()
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(analyze_one, video, output_dir, options): video for video in videos
+        }
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                summary = future.result()
+            except Exception as error:
+                # The worker process itself died (e.g. a crash inside OpenCV)
+                summary = {
+                    "video": video,
+                    "status": "failed",
+                    "frames": 0,
+                    "seconds": 0.0,
+                    "fps": 0.0,
+                    "error": f"{type(error).__name__}: {error}",
+                }
+            results[video] = summary
+
+            if summary["status"] == "ok":
+                print(
+                    f"[{len(results)}/{len(videos)}] {video}: {summary['frames']} frames, "
+                    f"{summary['fps']:.1f} fps"
+                )
+            else:
+                print(f"[{len(results)}/{len(videos)}] {video}: FAILED ({summary['error']})")
+
+    elapsed = time() - start
+    summaries = [results[video] for video in videos]
+    write_csv(
+        os.path.join(output_dir, "batch_summary.csv"),
+        SUMMARY_COLUMNS,
+        [[summary[column] for column in SUMMARY_COLUMNS] for summary in summaries],
+    )
+
+    total_frames = sum(summary["frames"] for summary in summaries)
+    failed = sum(summary["status"] != "ok" for summary in summaries)
+    print(
+        f"{len(videos) - failed}/{len(videos)} videos analyzed in {elapsed:.1f} s with {workers} workers "
+        f"({total_frames / elapsed if elapsed > 0 else 0.0:.1f} frames/s overall)"
+    )
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a folder of gait videos in parallel.")
+    parser.add_argument("input", help="Folder of videos or manifest file")
+    parser.add_argument("-o", "--output", required=True, help="Output folder")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--markers", type=int, default=5, help="Number of markers")
+    parser.add_argument(
+        "--detect-every", type=int, default=30, help="Run YOLO at least every N frames"
+    )
+    parser.add_argument(
+        "--tracker", default="KCF", help="Tracker backend: CSRT, KCF, MOSSE or LK"
+    )
+    args = parser.parse_args(argv)
+
+    run_batch(
+        find_videos(args.input),
+        args.output,
+        args.workers,
+        n_markers=args.markers,
+        detect_every=args.detect_every,
+        tracker_backend=args.tracker,
+    )
+
+
+if __name__ == "__main__":
+    main()
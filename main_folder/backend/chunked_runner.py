@@ -0,0 +1,272 @@
+"""
+Chunked Runner Module
+
+This module analyzes one long recording on several cores. The video is split into time chunks; every chunk is
+tracked in its own worker process, starting with a full YOLO detection, and also tracks a short pre-roll of the
+frames just before it (the overlap). The marker tracks of consecutive chunks are then stitched together:
+
+- the marker IDs of a chunk are matched to the IDs of the previous chunk with the Hungarian algorithm, on the mean
+  distance between their centers over the overlap frames,
+- the overlap frames themselves are taken from the previous chunk, whose trackers and Kalman filters are already
+  settled there.
+
+The angles and gait phases are finally computed over the stitched centers by the replay engine (see
+backend.replay), so the output files have exactly the format of a sequential run.
+
+Dependencies:
+- argparse: Command line interface.
+- concurrent.futures: Process pool.
+- cv2: OpenCV library for computer vision.
+- numpy: Trajectory arrays.
+- scipy: linear_sum_assignment for the identity stitching.
+- backend.backend: MotionAnalysis pipeline.
+- backend.headless: Output file names.
+- backend.replay: Angles and gait phases from the stitched trajectories.
+- backend.timeseries: Trajectory file writer.
+
+Functions:
+- split_chunks: Splits a number of frames into (start, stop) chunks.
+- track_chunk: Tracks the markers of one chunk (run in a worker).
+- stitch_chunks: Joins the chunk trajectories with consistent marker IDs.
+- analyze_video_chunked: Runs the whole chunked analysis of one video and writes its angle and event files.
+
+Usage:
+- From main_folder: python -m backend.chunked_runner path/to/video.mp4 -o results/ -j 8 --overlap 60
+"""
+
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import time
+
+import cv2
+import numpy as np
+from backend.backend import MotionAnalysis
+from backend.batch_runner import init_worker
+from backend.headless import cycles_file, output_paths, trajectory_file
+from backend.replay import ReplayEngine
+from backend.timeseries import save_trajectory
+from scipy.optimize import linear_sum_assignment
+
+# Cost given to a pair of markers never seen together in the overlap
+NO_OVERLAP_COST = 1e6
+
+
+def split_chunks(total_frames, n_chunks, min_chunk=300):
+    """
+    Split the frames of a video in contiguous chunks.
+
+    Parameters:
+    - total_frames (int): Number of frames of the video.
+    - n_chunks (int): Desired number of chunks.
+    - min_chunk (int): Minimum chunk length; short videos use fewer chunks (default is 300 frames).
+
+    Returns:
+    - List of (start, stop) frame indexes, stop excluded.
+    """
+    n_chunks = max(1, min(n_chunks, total_frames // min_chunk))
+    size = math.ceil(total_frames / n_chunks)
+    return [
+        (start, min(start + size, total_frames)) for start in range(0, total_frames, size)
+    ]
+
+
+def track_chunk(video_path, start, stop, overlap, options):
+    """
+    Track the markers from frame start - overlap to frame stop (excluded).
+
+    Returns:
+    - Dictionary with the chunk start, the frame numbers (as reported by the capture, 1 for the first frame of
+      the video), the marker centers (float array (frames, n_markers, 2), NaN when a marker was not found), the
+      walking direction of every frame and the frame rate the analysis converts frame numbers into times with.
+    """
+    first = max(start - overlap, 0)
+    analysis = MotionAnalysis(video_path, None, headless=True, **options)
+    analysis.open_camera(first)
+
+    directions = []
+    try:
+        analysis.get_video_frame()
+        analysis.init_tracker()
+        while analysis.success:
+            analysis.markers_centers()
+            analysis.gait_direction()
+
+            directions.append(analysis.direction)
+
+            if analysis.frame_number >= stop:
+                break
+            analysis.get_video_frame()
+            if analysis.success:
+                analysis.check_markers()
+    finally:
+        analysis.close_window()
+
+    trajectory = analysis.trajectory
+    return {
+        "start": start,
+        "frames": trajectory["frame"].astype(np.int64),
+        "positions": np.stack([trajectory["x"], trajectory["y"]], axis=2).astype(np.float64),
+        "directions": directions,
+        "fps_rate": analysis.fps_rate,
+    }
+
+
+def match_identities(previous, current):
+    """
+    Find which marker of the current chunk is which marker of the previous one.
+
+    Parameters:
+    - previous, current: Center arrays (frames, n_markers, 2) over the same overlap frames.
+
+    Returns:
+    - Array order such that current[:, order] uses the marker IDs of previous.
+    """
+    n_markers = previous.shape[1]
+    if len(previous) == 0:
+        return np.arange(n_markers)
+
+    # distances[f, i, j]: distance on frame f between marker i of previous and marker j of current
+    distances = np.linalg.norm(previous[:, :, None, :] - current[:, None, :, :], axis=3)
+    seen = np.isfinite(distances)
+    counts = seen.sum(axis=0)
+    cost = np.where(seen, distances, 0.0).sum(axis=0) / np.maximum(counts, 1)
+    cost[counts == 0] = NO_OVERLAP_COST
+
+    rows, cols = linear_sum_assignment(cost)
+    order = np.arange(n_markers)
+    order[rows] = cols
+    return order
+
+
+def stitch_chunks(chunks):
+    """
+    Join the chunk trajectories into one, with the marker IDs of the first chunk.
+
+    Returns:
+    - frames, positions, directions of the whole video.
+    """
+    chunks = sorted(chunks, key=lambda chunk: chunk["start"])
+    frames = chunks[0]["frames"]
+    positions = chunks[0]["positions"]
+    directions = list(chunks[0]["directions"])
+
+    for chunk in chunks[1:]:
+        # Frame numbers start at 1, so frame index start is frame number start + 1
+        owned = chunk["frames"] > chunk["start"]
+        pre_roll = ~owned
+
+        _, previous_index, current_index = np.intersect1d(
+            frames, chunk["frames"][pre_roll], return_indices=True
+        )
+        order = match_identities(
+            positions[previous_index], chunk["positions"][pre_roll][current_index]
+        )
+
+        kept = frames <= chunk["start"]
+        frames = np.concatenate([frames[kept], chunk["frames"][owned]])
+        positions = np.concatenate([positions[kept], chunk["positions"][owned][:, order]])
+        directions = [direction for direction, keep in zip(directions, kept) if keep] + [
+            direction for direction, keep in zip(chunk["directions"], owned) if keep
+        ]
+
+    return frames, positions, directions
+
+
+def analyze_video_chunked(video_path, output_dir=None, workers=None, overlap=60, **options):
+    """
+    Analyze one video in parallel chunks and write its angle, event and cycle files.
+
+    Parameters:
+    - video_path (str): Video to analyze.
+    - output_dir (str): Folder of the output files (default is the folder of the video).
+    - workers (int): Number of worker processes and chunks (default is the number of CPUs).
+    - overlap (int): Frames tracked before each chunk to settle the trackers and match the IDs (default is 60).
+    - options: n_markers, detect_every and tracker_backend, passed to MotionAnalysis.
+
+    Returns:
+    - Dictionary with the output paths, the number of frames, the number of chunks, the processing time and the
+      processed frames per second.
+    """
+    camera = cv2.VideoCapture(video_path)
+    if not camera.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    total_frames = int(camera.get(cv2.CAP_PROP_FRAME_COUNT))
+    camera.release()
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split_chunks(total_frames, workers)
+    start = time()
+
+    with ProcessPoolExecutor(max_workers=len(chunks), initializer=init_worker) as pool:
+        futures = [
+            pool.submit(track_chunk, video_path, chunk_start, chunk_stop, overlap, options)
+            for chunk_start, chunk_stop in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    frames, positions, directions = stitch_chunks(results)
+    # Same frame rate as a sequential run of MotionAnalysis on this video
+    fps_rate = results[0]["fps_rate"]
+    engine = ReplayEngine(frames, positions, directions, fps_rate)
+
+    angles_path, events_path = output_paths(video_path, output_dir)
+    trajectory_path = trajectory_file(angles_path)
+    cycles_path = cycles_file(angles_path)
+    engine.write(angles_path, events_path, cycles_path)
+    save_trajectory(
+        trajectory_path, frames, frames / fps_rate, positions, directions, fps_rate
+    )
+    elapsed = time() - start
+
+    return {
+        "video": video_path,
+        "angles": angles_path,
+        "events": events_path,
+        "trajectory": trajectory_path,
+        "cycles": cycles_path,
+        "frames": len(frames),
+        "chunks": len(chunks),
+        "seconds": elapsed,
+        "fps": len(frames) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze one long gait video in parallel chunks.")
+    parser.add_argument("video", help="Video file to analyze")
+    parser.add_argument("-o", "--output", help="Output folder (default: next to the video)")
+    parser.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument(
+        "--overlap", type=int, default=60, help="Frames tracked before each chunk for stitching"
+    )
+    parser.add_argument("--markers", type=int, default=5, help="Number of markers")
+    parser.add_argument(
+        "--detect-every", type=int, default=30, help="Run YOLO at least every N frames"
+    )
+    parser.add_argument(
+        "--tracker", default="KCF", help="Tracker backend: CSRT, KCF, MOSSE or LK"
+    )
+    args = parser.parse_args(argv)
+
+    summary = analyze_video_chunked(
+        args.video,
+        args.output,
+        args.workers,
+        args.overlap,
+        n_markers=args.markers,
+        detect_every=args.detect_every,
+        tracker_backend=args.tracker,
+    )
+    print(
+        f"{summary['video']}: {summary['frames']} frames in {summary['chunks']} chunks, "
+        f"{summary['seconds']:.1f} s ({summary['fps']:.1f} fps)"
+    )
+    print(f"Angles: {summary['angles']}")
+    print(f"Events: {summary['events']}")
+    print(f"Cycles: {summary['cycles']}")
+
+
+if __name__ == "__main__":
+    main()
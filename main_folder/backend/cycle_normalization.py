@@ -0,0 +1,176 @@
+"""
+Cycle Normalization Module
+
+This module expresses the joint angles of every gait cycle over 0-100 % of the cycle, so cycles of different
+durations (and different sessions) can be compared point by point, and builds the mean and standard deviation
+curves of each walking direction, the usual clinical presentation of gait kinematics.
+
+Each cycle runs from one heel strike to the next (see backend.gait_events). Its hip, knee and ankle curves are
+resampled to a fixed number of points (101 by default, one per percent) with a single np.interp call per joint
+over all the cycles at once. A cycle where a joint has too few valid samples gets a NaN curve for that joint and is
+left out of the envelope.
+
+Dependencies:
+- numpy: Vectorized resampling and statistics.
+
+Attributes:
+- CYCLE_POINTS: Default number of points of a normalized cycle.
+- MIN_COVERAGE: Default fraction of the frames of a cycle that need a valid angle.
+
+Functions:
+- normalize_cycles: Resamples the angles of every cycle to a fixed number of points.
+- cycle_envelopes: Mean and standard deviation curves of normalized cycles.
+- direction_envelopes: Normalized cycles and envelopes of each walking direction.
+- benchmark_normalization: Compares the vectorized normalization with a loop over the cycles.
+
+Usage:
+- curves = normalize_cycles(frames, angles, starts, ends) with angles of shape (frames, 3); curves has shape
+  (cycles, 101, 3).
+- mean, sd, count = cycle_envelopes(curves)
+- Run python -m backend.cycle_normalization (from main_folder) to time the normalization of a long session.
+"""
+
+import numpy as np
+
+CYCLE_POINTS = 101
+MIN_COVERAGE = 0.8
+DIRECTION_ORDER = ("right_to_left", "left_to_right")
+
+
+def normalize_cycles(frames, values, starts, ends, points=CYCLE_POINTS, min_coverage=MIN_COVERAGE):
+    """
+    Resample the values of every cycle to a fixed number of points.
+
+    Parameters:
+    - frames: Increasing frame number of every sample.
+    - values: Array of shape (samples, channels) (or (samples,)), NaN for missing or rejected samples.
+    - starts, ends: First and last frame of every cycle.
+    - points (int): Number of points of a normalized cycle, from 0 % to 100 % (default is 101).
+    - min_coverage (float): Fraction of the frames of a cycle that need a value, otherwise the cycle gets NaN for
+      that channel (default is 0.8).
+
+    Returns:
+    - Array of shape (cycles, points, channels) (or (cycles, points) for one-dimensional values).
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+
+    # Frame of every point of every cycle, shape (cycles, points)
+    targets = starts[:, None] + (ends - starts)[:, None] * np.linspace(0.0, 1.0, points)
+    curves = np.full((len(starts), points, values.shape[1]), np.nan)
+
+    for channel in range(values.shape[1]):
+        valid = np.isfinite(values[:, channel])
+        valid_frames = frames[valid]
+        if len(valid_frames) == 0:
+            continue
+        curves[:, :, channel] = np.interp(targets, valid_frames, values[valid, channel])
+
+        # Valid samples inside each cycle, counted with two binary searches
+        covered = np.searchsorted(valid_frames, ends, side="right") - np.searchsorted(
+            valid_frames, starts, side="left"
+        )
+        curves[covered < min_coverage * (ends - starts + 1), :, channel] = np.nan
+
+    return curves[:, :, 0] if squeeze else curves
+
+
+def cycle_envelopes(curves):
+    """
+    Mean and standard deviation curves of normalized cycles.
+
+    Parameters:
+    - curves: Array of shape (cycles, points, ...) returned by normalize_cycles.
+
+    Returns:
+    - mean: Mean of the cycles at every point (NaN without any cycle).
+    - sd: Sample standard deviation at every point (NaN with fewer than two cycles).
+    - count: Number of cycles used at every point.
+    """
+    curves = np.asarray(curves, dtype=np.float64)
+    finite = np.isfinite(curves)
+    count = finite.sum(axis=0)
+    filled = np.where(finite, curves, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = filled.sum(axis=0) / count
+        squares = np.where(finite, (curves - mean) ** 2, 0.0).sum(axis=0)
+        sd = np.sqrt(squares / (count - 1))
+    mean[count == 0] = np.nan
+    sd[count < 2] = np.nan
+    return mean, sd, count
+
+
+def direction_envelopes(frames, angles, cycles, points=CYCLE_POINTS, min_coverage=MIN_COVERAGE):
+    """
+    Normalize the cycles of each walking direction and build their envelopes.
+
+    Parameters:
+    - frames: Frame number of every sample.
+    - angles: Array of shape (samples, 3) with the hip, knee and ankle angles, NaN when rejected.
+    - cycles: Iterable of (direction, starts, ends), e.g. one entry per pass along the walkway.
+    - points, min_coverage: See normalize_cycles.
+
+    Returns:
+    - Dictionary keyed by direction with curves (cycles, points, 3), mean, sd and count (points, 3).
+    """
+    starts = {direction: [] for direction in DIRECTION_ORDER}
+    ends = {direction: [] for direction in DIRECTION_ORDER}
+    for direction, cycle_starts, cycle_ends in cycles:
+        starts[direction].extend(np.asarray(cycle_starts).tolist())
+        ends[direction].extend(np.asarray(cycle_ends).tolist())
+
+    envelopes = {}
+    for direction in DIRECTION_ORDER:
+        curves = normalize_cycles(frames, angles, starts[direction], ends[direction], points, min_coverage)
+        mean, sd, count = cycle_envelopes(curves)
+        envelopes[direction] = {"curves": curves, "mean": mean, "sd": sd, "count": count}
+    return envelopes
+
+
+def benchmark_normalization(cycles=1000, cycle_frames=130):
+    """
+    Print the time needed to normalize the angles of a long session, vectorized and cycle by cycle.
+    """
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+    frames = np.arange(cycles * cycle_frames + 1)
+    phase = 2 * np.pi * frames / cycle_frames
+    angles = np.column_stack((20 * np.sin(phase), 30 + 30 * np.sin(phase), 10 * np.cos(phase)))
+    angles += rng.normal(0, 1, angles.shape)
+    angles[rng.random(len(frames)) < 0.02] = np.nan
+    starts = frames[:-1:cycle_frames]
+    ends = starts + cycle_frames
+
+    start = perf_counter()
+    curves = normalize_cycles(frames, angles, starts, ends)
+    mean, sd, _ = cycle_envelopes(curves)
+    vectorized = perf_counter() - start
+
+    start = perf_counter()
+    grid = np.linspace(0.0, 1.0, CYCLE_POINTS)
+    looped = np.empty_like(curves)
+    for i, (cycle_start, cycle_end) in enumerate(zip(starts, ends)):
+        inside = (frames >= cycle_start) & (frames <= cycle_end)
+        for channel in range(3):
+            valid = inside & np.isfinite(angles[:, channel])
+            looped[i, :, channel] = np.interp(
+                cycle_start + grid * (cycle_end - cycle_start),
+                frames[valid],
+                angles[valid, channel],
+            )
+    per_cycle = perf_counter() - start
+
+    print(f"{cycles} cycles: vectorized {vectorized * 1e3:.1f} ms, cycle by cycle {per_cycle * 1e3:.1f} ms")
+    print(f"Knee at 0 %: {mean[0, 1]:.1f} +/- {sd[0, 1]:.1f} degrees")
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_normalization()
@@ -0,0 +1,134 @@
+"""
+Extrema Module
+
+This module follows the minimum and maximum of a stream of values in constant time per sample, so the gait phase
+detection and the GUI statistics do not scan the whole history on every frame.
+
+Without a window the extremes are simply the running minimum and maximum of every value seen. With a window of N
+samples, two monotonic deques keep the candidates for the minimum and the maximum of the last N values; every value
+enters and leaves each deque once, so an update costs O(1) amortized.
+
+Dependencies:
+- collections.deque: Monotonic queues of the sliding window.
+
+Classes:
+- RunningExtrema: Streaming minimum and maximum, over the whole stream or a sliding window.
+
+Usage:
+- extrema = RunningExtrema() (or RunningExtrema(window=240) for the last 240 samples)
+- min_y, max_y = extrema.update(y) every frame, or extrema.advance() on a frame without a value.
+- Run python -m backend.extrema (from main_folder) to compare it with min()/max() over the full history.
+"""
+
+from collections import deque
+
+
+class RunningExtrema:
+    def __init__(self, window=None):
+        """
+        Initialize the RunningExtrema object.
+
+        Parameters:
+        - window (int): Number of latest samples the extremes are taken over, or None for the whole stream
+          (default is None).
+        """
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        # (index, value) pairs; values increase in min_queue and decrease in max_queue
+        self.min_queue = deque()
+        self.max_queue = deque()
+
+    def update(self, value):
+        """
+        Add one value.
+
+        Returns:
+        - (min, max) of the stream (or of the window) including value.
+        """
+        if self.window is None:
+            if self.count == 0 or value < self.min:
+                self.min = value
+            if self.count == 0 or value > self.max:
+                self.max = value
+            self.count += 1
+            return self.min, self.max
+
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append((self.count, value))
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append((self.count, value))
+
+        oldest = self.count - self.window + 1
+        if self.min_queue[0][0] < oldest:
+            self.min_queue.popleft()
+        if self.max_queue[0][0] < oldest:
+            self.max_queue.popleft()
+
+        self.count += 1
+        self.min = self.min_queue[0][1]
+        self.max = self.max_queue[0][1]
+        return self.min, self.max
+
+    def advance(self):
+        """
+        Count a sample without a value (e.g. a frame where the marker was not found), so the window keeps
+        following the frames.
+
+        Returns:
+        - (min, max) of the values left in the window, or (None, None) when there is none.
+        """
+        self.count += 1
+        if self.window is not None:
+            oldest = self.count - self.window
+            if self.min_queue and self.min_queue[0][0] < oldest:
+                self.min_queue.popleft()
+            if self.max_queue and self.max_queue[0][0] < oldest:
+                self.max_queue.popleft()
+            self.min = self.min_queue[0][1] if self.min_queue else None
+            self.max = self.max_queue[0][1] if self.max_queue else None
+        return self.min, self.max
+
+
+def benchmark_extrema(sizes=(1000, 10000, 100000), updates=200):
+    """
+    Print the cost of one update when the stream already holds each of sizes values.
+    """
+    import random
+    from time import perf_counter
+
+    random.seed(0)
+    for size in sizes:
+        values = [random.randint(300, 700) for _ in range(size + updates)]
+
+        timings = []
+        for extrema in (RunningExtrema(), RunningExtrema(window=240)):
+            for value in values[:size]:
+                extrema.update(value)
+            start = perf_counter()
+            for value in values[size:]:
+                extrema.update(value)
+            timings.append((perf_counter() - start) / updates)
+
+        history = values[:size]
+        start = perf_counter()
+        for value in values[size:]:
+            history.append(value)
+            min(history), max(history)
+        timings.append((perf_counter() - start) / updates)
+
+        print(
+            f"{size:>7} values: running {timings[0] * 1e6:6.2f} us, window {timings[1] * 1e6:6.2f} us, "
+            f"full min()/max() {timings[2] * 1e6:9.2f} us per frame"
+        )
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_extrema()
@@ -0,0 +1,210 @@
+"""
+FrameCapture Class
+
+This class decodes a video (file or camera) in a background producer thread into a fixed-size ring buffer of
+preallocated frames, so the analysis never waits on cv2.VideoCapture.read().
+
+Dependencies:
+- cv2: OpenCV library for computer vision.
+- numpy: Used to preallocate the ring buffer.
+- threading: Producer thread and its condition variable.
+
+Attributes:
+- source: Video file path or camera index.
+- buffer_size: Number of frames in the ring buffer.
+- live: True for cameras. A live source never blocks: when the buffer is full the new frame is grabbed and
+  dropped. A file source blocks the producer until the analysis frees a slot, so no frame is ever lost.
+- decoded, consumed, dropped: Frame counters reported by stats().
+- overflows: Number of times the buffer filled up on a live source (each one may drop several frames).
+
+Methods:
+- start: Opens the source, preallocates the buffer from the first frame and starts the producer thread.
+- read: Returns the next frame with its frame number and timestamp.
+- stats: Returns the decode/consume/drop counters.
+- stop: Stops the producer thread and releases the source.
+
+Usage:
+- capture = FrameCapture(path); capture.start()
+- success, frame, frame_number, timestamp = capture.read()
+- The returned frame is a view into the ring buffer. It stays valid (and may be drawn on) until the next call to
+  read(); copy it to keep it longer.
+"""
+
+import threading
+from time import time
+
+import cv2
+import numpy as np
+
+
+class FrameCapture:
+    def __init__(self, source, buffer_size=32, live=None):
+        """
+        Initialize the FrameCapture object.
+
+        Parameters:
+        - source: Video file path or camera index.
+        - buffer_size (int): Number of preallocated frames (default is 32).
+        - live (bool): Drop frames instead of blocking when the buffer is full. Default is True for camera
+          indexes and False for files.
+        """
+        self.source = source
+        self.buffer_size = buffer_size
+        self.live = isinstance(source, int) if live is None else live
+
+        self.camera = None
+        self.frames = None
+        self.frame_numbers = np.zeros(buffer_size, dtype=np.int64)
+        self.timestamps = np.zeros(buffer_size, dtype=np.float64)
+
+        self.head = 0  # next slot written by the producer
+        self.tail = 0  # next slot read by the consumer
+        self.count = 0  # slots written and not read yet
+        self.held = False  # the consumer still uses the slot before tail
+        self.finished = False
+        self.running = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+        self.decoded = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.overflowing = False
+
+    def isOpened(self):
+        return self.camera is not None and self.camera.isOpened()
+
+    def start(self, start_frame=0):
+        """
+        Open the source and start decoding. Returns False when the source cannot be opened or read.
+
+        Parameters:
+        - start_frame (int): Index of the first frame to decode, for video files (default is 0).
+        """
+        self.camera = cv2.VideoCapture(self.source)
+        if not self.camera.isOpened():
+            return False
+        if start_frame:
+            self.camera.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        success, first_frame = self.camera.read()
+        if not success:
+            return False
+
+        self.frames = np.empty((self.buffer_size,) + first_frame.shape, dtype=first_frame.dtype)
+        self.frames[0] = first_frame
+        self._store_metadata(0)
+        self.head = 1 % self.buffer_size
+        self.count = 1
+        self.decoded = 1
+
+        self.running = True
+        self.thread = threading.Thread(target=self._produce, daemon=True)
+        self.thread.start()
+        return True
+
+    def _store_metadata(self, slot):
+        self.frame_numbers[slot] = int(self.camera.get(cv2.CAP_PROP_POS_FRAMES))
+        if self.live:
+            self.timestamps[slot] = time()
+        else:
+            self.timestamps[slot] = self.camera.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+    def _produce(self):
+        while True:
+            with self.condition:
+                while self.running and self.count + self.held >= self.buffer_size:
+                    if self.live:
+                        break
+                    self.condition.wait()
+                if not self.running:
+                    break
+                full = self.count + self.held >= self.buffer_size
+                slot = self.head
+
+            if full:
+                # Live source with no free slot: keep the device queue moving and drop the frame
+                if not self.camera.grab():
+                    break
+                with self.condition:
+                    self.dropped += 1
+                    if not self.overflowing:
+                        self.overflows += 1
+                        self.overflowing = True
+                continue
+
+            # Decode straight into the preallocated slot; it is not readable until count is increased
+            success, frame = self.camera.read(self.frames[slot])
+            if not success:
+                break
+            if not np.shares_memory(frame, self.frames[slot]):
+                # OpenCV allocated a new image (the stream changed size); bring it back into the slot
+                height, width = self.frames.shape[1:3]
+                cv2.resize(frame, (width, height), dst=self.frames[slot])
+
+            with self.condition:
+                self.overflowing = False
+                self._store_metadata(slot)
+                self.head = (slot + 1) % self.buffer_size
+                self.count += 1
+                self.decoded += 1
+                self.condition.notify_all()
+
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Return the next decoded frame.
+
+        Parameters:
+        - timeout (float): Seconds to wait for a frame (default is None, wait until one is available).
+
+        Returns:
+        - success (bool): False at the end of the video, after stop(), or on timeout.
+        - frame: View into the ring buffer (valid until the next call to read()), or None.
+        - frame_number (int): Position of the frame in the video, as cv2.CAP_PROP_POS_FRAMES reports it after
+          reading it (1 for the first frame).
+        - timestamp (float): Seconds from the start of the video (wall clock time for live sources).
+        """
+        with self.condition:
+            # The slot handed out by the previous call can now be reused by the producer
+            self.held = False
+            self.condition.notify_all()
+
+            while self.count == 0 and not self.finished:
+                if not self.condition.wait(timeout):
+                    return False, None, None, None
+            if self.count == 0:
+                return False, None, None, None
+
+            slot = self.tail
+            self.tail = (slot + 1) % self.buffer_size
+            self.count -= 1
+            self.held = True
+            self.consumed += 1
+            return True, self.frames[slot], int(self.frame_numbers[slot]), float(self.timestamps[slot])
+
+    def stats(self):
+        """
+        Return the capture counters as a dictionary.
+        """
+        with self.condition:
+            return {
+                "decoded": self.decoded,
+                "consumed": self.consumed,
+                "buffered": self.count,
+                "dropped": self.dropped,
+                "overflows": self.overflows,
+            }
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        if self.camera is not None:
+            self.camera.release()
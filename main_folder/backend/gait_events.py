@@ -0,0 +1,527 @@
+"""
+Gait Events Module
+
+This module finds every heel strike and toe off of a recording from the vertical trajectories of the foot markers,
+instead of only the first stance and swing of the session.
+
+Image y grows downwards, so the foot is on the ground when its markers are at their largest y. For every marker the
+ground level is the largest y over the last baseline_window frames, and the height of the marker is how far it is
+above that level. A two-threshold (hysteresis) state machine turns the height into contact and swing states:
+
+- the marker is in contact when its height is at most contact_threshold pixels,
+- it is in swing when its height is at least swing_threshold pixels,
+- in between it keeps its previous state, so noise around one threshold does not create extra events.
+
+A toe off is the first swing frame of the V_Metatarsal marker after a contact. A heel strike is the first contact
+frame of the ankle marker after a swing (the V_Metatarsal marker is used when the ankle is not given). A gait cycle
+runs from one heel strike to the next.
+
+The same events are found offline over a whole trajectory (vectorized NumPy) and online, one frame at a time
+(GaitEventDetector), which gives identical results.
+
+Dependencies:
+- numpy: Vectorized detection and per-cycle arrays.
+- backend.extrema: Streaming ground level of the online detector.
+
+Attributes:
+- CONTACT_THRESHOLD, SWING_THRESHOLD, BASELINE_WINDOW: Default detection parameters.
+
+Classes:
+- GaitEventDetector: Online detector, updated once per frame.
+- GaitPass: Stance/swing phases and heel strikes/toe offs of one pass along the walkway, in either direction.
+- GaitSession: Starts a new GaitPass whenever the walking direction changes.
+
+Functions:
+- contact_states: Contact/swing state of every frame of one marker trajectory.
+- detect_events: Heel strike and toe off frames of a whole trajectory.
+- gait_cycles: Per-cycle arrays (start, toe off, end, stance and swing times) from the events.
+- benchmark_events: Compares the offline and online detection on a synthetic walk.
+- check_live_params: Checks when a swing threshold or phase window changed during a session is used.
+
+The stance and swing phases of the analysis (first lowest point of the V_Metatarsal marker, then its first rise of
+swing_threshold pixels) are found for every pass by GaitPass, the same code for both walking directions.
+
+Usage:
+- Session: session = GaitSession(); rows = session.update(frame, direction, vm_y, ankle_y) every frame gives the
+  (pass, direction, event, time) rows of the events found on that frame.
+- Offline: heel_strikes, toe_offs = detect_events(vm_y, ankle_y); cycles = gait_cycles(frames, heel_strikes,
+  toe_offs, fps_rate).
+- Online: detector = GaitEventDetector(); events = detector.update(frame, vm_y, ankle_y) every frame (None for a
+  marker that was not found);
+  detector.cycles() for the per-cycle arrays so far.
+- Run python -m backend.gait_events (from main_folder) to compare the offline and online detection.
+"""
+
+import numpy as np
+from backend.extrema import RunningExtrema
+
+CONTACT_THRESHOLD = 2
+SWING_THRESHOLD = 7
+BASELINE_WINDOW = 240
+
+SWING, CONTACT, UNKNOWN = 0, 1, -1
+
+
+def ground_level(y, baseline_window=BASELINE_WINDOW):
+    """
+    Largest y over the last baseline_window frames of every frame (NaN samples are ignored).
+    """
+    y = np.asarray(y, dtype=np.float64)
+    padded = np.concatenate([np.full(baseline_window - 1, -np.inf), np.where(np.isnan(y), -np.inf, y)])
+    level = np.lib.stride_tricks.sliding_window_view(padded, baseline_window).max(axis=1)
+    level[np.isneginf(level)] = np.nan
+    return level
+
+
+def contact_states(
+    y,
+    contact_threshold=CONTACT_THRESHOLD,
+    swing_threshold=SWING_THRESHOLD,
+    baseline_window=BASELINE_WINDOW,
+):
+    """
+    Contact/swing state of every frame of one marker trajectory.
+
+    Parameters:
+    - y: Vertical position of the marker on every frame, NaN when it was not found.
+    - contact_threshold (float): Largest height in pixels of a marker on the ground (default is 2).
+    - swing_threshold (float): Smallest height in pixels of a marker in swing (default is 7).
+    - baseline_window (int): Frames the ground level is taken over (default is 240).
+
+    Returns:
+    - int8 array with CONTACT (1), SWING (0) or UNKNOWN (-1, before the first decision) for every frame.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    height = ground_level(y, baseline_window) - y
+
+    decided = np.full(len(y), UNKNOWN, dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        decided[height <= contact_threshold] = CONTACT
+        decided[height >= swing_threshold] = SWING
+
+    # Frames between the thresholds (or without a sample) keep the last decided state
+    last_decided = np.maximum.accumulate(np.where(decided != UNKNOWN, np.arange(len(y)), -1))
+    states = np.where(last_decided >= 0, decided[np.maximum(last_decided, 0)], UNKNOWN)
+    return states.astype(np.int8)
+
+
+def _transitions(states, from_state, to_state):
+    previous = states[:-1]
+    current = states[1:]
+    return np.flatnonzero((previous == from_state) & (current == to_state)) + 1
+
+
+def detect_events(
+    vm_y,
+    ankle_y=None,
+    contact_threshold=CONTACT_THRESHOLD,
+    swing_threshold=SWING_THRESHOLD,
+    baseline_window=BASELINE_WINDOW,
+):
+    """
+    Find every heel strike and toe off of a trajectory.
+
+    Parameters:
+    - vm_y: Vertical position of the V_Metatarsal marker on every frame (NaN when missing).
+    - ankle_y: Vertical position of the ankle marker, used for the heel strikes (default is vm_y).
+    - contact_threshold, swing_threshold, baseline_window: See contact_states.
+
+    Returns:
+    - heel_strikes: Sample indexes of the heel strikes.
+    - toe_offs: Sample indexes of the toe offs.
+    """
+    params = (contact_threshold, swing_threshold, baseline_window)
+    vm_states = contact_states(vm_y, *params)
+    heel_states = vm_states if ankle_y is None else contact_states(ankle_y, *params)
+
+    heel_strikes = _transitions(heel_states, SWING, CONTACT)
+    toe_offs = _transitions(vm_states, CONTACT, SWING)
+    return heel_strikes, toe_offs
+
+
+def gait_cycles(frames, heel_strikes, toe_offs, fps_rate=120):
+    """
+    Build the per-cycle arrays from the events.
+
+    Parameters:
+    - frames: Frame number of every sample.
+    - heel_strikes, toe_offs: Sample indexes returned by detect_events.
+    - fps_rate (int): Frame rate used to convert frames into seconds (default is 120).
+
+    Returns:
+    - Dictionary of arrays with one entry per cycle (heel strike to next heel strike):
+      start, toe_off and end frames (toe_off is -1 when no toe off was found in the cycle), and cycle_time,
+      stance_time, swing_time (seconds) and stance_percent (NaN without a toe off).
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    heel_frames = frames[np.asarray(heel_strikes, dtype=np.int64)]
+    toe_frames = frames[np.asarray(toe_offs, dtype=np.int64)]
+
+    start = heel_frames[:-1]
+    end = heel_frames[1:]
+
+    # First toe off after each heel strike, kept only if it comes before the next heel strike
+    next_toe = np.searchsorted(toe_frames, start, side="right")
+    has_toe = next_toe < len(toe_frames)
+    toe_off = np.full(len(start), -1, dtype=np.int64)
+    toe_off[has_toe] = toe_frames[next_toe[has_toe]]
+    has_toe &= toe_off < end
+    toe_off[~has_toe] = -1
+
+    cycle_time = (end - start) / fps_rate
+    stance_time = np.where(has_toe, (toe_off - start) / fps_rate, np.nan)
+    swing_time = np.where(has_toe, (end - toe_off) / fps_rate, np.nan)
+    return {
+        "start": start,
+        "toe_off": toe_off,
+        "end": end,
+        "cycle_time": cycle_time,
+        "stance_time": stance_time,
+        "swing_time": swing_time,
+        "stance_percent": np.where(cycle_time > 0, stance_time / cycle_time * 100, np.nan),
+    }
+
+
+class _MarkerState:
+    # Online version of contact_states for one marker
+    def __init__(self, contact_threshold, swing_threshold, baseline_window):
+        self.contact_threshold = contact_threshold
+        self.swing_threshold = swing_threshold
+        self.ground = RunningExtrema(baseline_window)
+        self.state = UNKNOWN
+
+    def update(self, y):
+        """
+        Returns the (previous, new) state of the marker.
+        """
+        previous = self.state
+        if y is None or np.isnan(y):
+            self.ground.advance()
+            return previous, self.state
+
+        _, level = self.ground.update(float(y))
+        height = level - y
+        if height >= self.swing_threshold:
+            self.state = SWING
+        elif height <= self.contact_threshold:
+            self.state = CONTACT
+        return previous, self.state
+
+
+class GaitEventDetector:
+    def __init__(
+        self,
+        fps_rate=120,
+        contact_threshold=CONTACT_THRESHOLD,
+        swing_threshold=SWING_THRESHOLD,
+        baseline_window=BASELINE_WINDOW,
+        use_ankle=True,
+    ):
+        """
+        Initialize the GaitEventDetector object.
+
+        Parameters:
+        - fps_rate (int): Frame rate used to convert frames into seconds (default is 120).
+        - contact_threshold, swing_threshold, baseline_window: See contact_states.
+        - use_ankle (bool): Find the heel strikes on the ankle marker instead of the V_Metatarsal marker
+          (default is True).
+        """
+        self.fps_rate = fps_rate
+        self.use_ankle = use_ankle
+        self.params = (contact_threshold, swing_threshold, baseline_window)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the states and events (e.g. when the patient turns around).
+        """
+        self.vm = _MarkerState(*self.params)
+        self.ankle = _MarkerState(*self.params)
+        self.heel_strike_frames = []
+        self.toe_off_frames = []
+
+    def set_swing_threshold(self, swing_threshold):
+        """
+        Use a new swing threshold from the next frame on, keeping the states and events found so far.
+        """
+        contact_threshold, _, baseline_window = self.params
+        self.params = (contact_threshold, swing_threshold, baseline_window)
+        self.vm.swing_threshold = swing_threshold
+        self.ankle.swing_threshold = swing_threshold
+
+    def update(self, frame, vm_y, ankle_y=None):
+        """
+        Add the marker heights of one frame.
+
+        Parameters:
+        - frame (int): Frame number.
+        - vm_y (float): Vertical position of the V_Metatarsal marker, or None when it was not found.
+        - ankle_y (float): Vertical position of the ankle marker, or None when it was not found (ignored
+          without use_ankle).
+
+        Returns:
+        - List of ("heel_strike" or "toe_off", frame) events found on this frame.
+        """
+        events = []
+        vm_previous, vm_state = self.vm.update(vm_y)
+        if vm_previous == CONTACT and vm_state == SWING:
+            self.toe_off_frames.append(frame)
+            events.append(("toe_off", frame))
+
+        if self.use_ankle:
+            heel_previous, heel_state = self.ankle.update(ankle_y)
+        else:
+            heel_previous, heel_state = vm_previous, vm_state
+        if heel_previous == SWING and heel_state == CONTACT:
+            self.heel_strike_frames.append(frame)
+            events.append(("heel_strike", frame))
+        return events
+
+    def cycles(self):
+        """
+        Per-cycle arrays (see gait_cycles) of the events found so far.
+        """
+        heel_frames = np.array(self.heel_strike_frames, dtype=np.int64)
+        toe_frames = np.array(self.toe_off_frames, dtype=np.int64)
+        frames = np.concatenate([heel_frames, toe_frames])
+        return gait_cycles(
+            frames,
+            np.arange(len(heel_frames)),
+            np.arange(len(heel_frames), len(frames)),
+            self.fps_rate,
+        )
+
+
+class GaitPass:
+    def __init__(
+        self,
+        index,
+        direction,
+        start_frame,
+        fps_rate=120,
+        swing_threshold=SWING_THRESHOLD,
+        phase_window=None,
+        **event_params,
+    ):
+        """
+        Initialize the GaitPass object: the gait events of one pass along the walkway, in one direction.
+
+        Parameters:
+        - index (int): Position of the pass in the session (0 for the first one).
+        - direction (str): "left_to_right" or "right_to_left".
+        - start_frame (int): First frame of the pass.
+        - fps_rate (int): Frame rate used to convert frames into seconds (default is 120).
+        - swing_threshold (float): Rise in pixels of the V_Metatarsal marker that starts the swing phase (default
+          is 7).
+        - phase_window (int): Number of frames the V_Metatarsal extremes are taken over (default is None, the
+          whole pass).
+        - event_params: contact_threshold, baseline_window or use_ankle of the GaitEventDetector.
+        """
+        self.index = index
+        self.direction = direction
+        self.start_frame = start_frame
+        self.end_frame = start_frame
+        self.fps_rate = fps_rate
+        self.swing_threshold = swing_threshold
+
+        # Stance and swing phases: first frame at the lowest VM height of the pass, and first frame where the VM
+        # marker has risen swing_threshold pixels above its highest point
+        self.vm_extrema = RunningExtrema(phase_window)
+        self.stance_time = None
+        self.swing_time = None
+
+        self.detector = GaitEventDetector(fps_rate, swing_threshold=swing_threshold, **event_params)
+
+    def set_swing_threshold(self, swing_threshold):
+        """
+        Use a new swing threshold from the next frame on, for the swing phase and for the toe offs and heel strikes.
+        """
+        self.swing_threshold = swing_threshold
+        self.detector.set_swing_threshold(swing_threshold)
+
+    @property
+    def stance_duration(self):
+        """
+        Time between the stance and the swing phase, or None until both were found.
+        """
+        if self.stance_time is None or self.swing_time is None:
+            return None
+        return self.swing_time - self.stance_time
+
+    def update(self, frame, vm_y, ankle_y=None):
+        """
+        Add the foot markers of one frame of the pass.
+
+        Returns:
+        - List of (event, time) found on this frame, among "stance", "swing", "toe_off" and "heel_strike".
+        """
+        self.end_frame = frame
+        events = []
+        if vm_y is not None:
+            min_y, max_y = self.vm_extrema.update(vm_y)
+            if self.stance_time is None and vm_y - min_y == 0:
+                self.stance_time = frame / self.fps_rate
+                events.append(("stance", self.stance_time))
+            if self.swing_time is None and max_y - vm_y >= self.swing_threshold:
+                self.swing_time = frame / self.fps_rate
+                events.append(("swing", self.swing_time))
+
+        for event, event_frame in self.detector.update(frame, vm_y, ankle_y):
+            events.append((event, event_frame / self.fps_rate))
+        return events
+
+    def cycles(self):
+        return self.detector.cycles()
+
+
+class GaitSession:
+    def __init__(self, fps_rate=120, **pass_params):
+        """
+        Initialize the GaitSession object, which splits a session into passes along the walkway.
+
+        A new GaitPass starts every time the walking direction changes, so every pass gets its own stance,
+        swing, heel strike and toe off events, whatever the direction.
+
+        Parameters:
+        - fps_rate (int): Frame rate used to convert frames into seconds (default is 120).
+        - pass_params: swing_threshold, phase_window and detector parameters given to every GaitPass.
+        """
+        self.fps_rate = fps_rate
+        self.pass_params = pass_params
+        self.passes = []
+        self.events = []
+
+    @property
+    def current(self):
+        return self.passes[-1] if self.passes else None
+
+    def set_swing_threshold(self, swing_threshold):
+        """
+        Use a new swing threshold for the next passes and, from the next frame on, for the current one.
+        """
+        self.pass_params["swing_threshold"] = swing_threshold
+        if self.current is not None:
+            self.current.set_swing_threshold(swing_threshold)
+
+    def set_phase_window(self, phase_window):
+        """
+        Use a new phase window from the next pass on. The extremes of the current pass were taken over its own
+        window and cannot be recomputed over another one without its history, so that pass keeps its window.
+        """
+        self.pass_params["phase_window"] = phase_window
+
+    def update(self, frame, direction, vm_y, ankle_y=None):
+        """
+        Add the foot markers of one frame (once per frame, in frame order).
+
+        Parameters:
+        - frame (int): Frame number.
+        - direction (str): Walking direction of the frame.
+        - vm_y, ankle_y (float): Vertical position of the V_Metatarsal and ankle markers, or None when missing.
+
+        Returns:
+        - List of (pass, direction, event, time) rows found on this frame, also added to events.
+        """
+        if self.current is None or self.current.direction != direction:
+            self.passes.append(
+                GaitPass(len(self.passes), direction, frame, self.fps_rate, **self.pass_params)
+            )
+
+        gait_pass = self.current
+        rows = [
+            (gait_pass.index, direction, event, time)
+            for event, time in gait_pass.update(frame, vm_y, ankle_y)
+        ]
+        self.events.extend(rows)
+        return rows
+
+    def last_pass(self, direction):
+        """
+        Latest pass walked in direction, or None.
+        """
+        for gait_pass in reversed(self.passes):
+            if gait_pass.direction == direction:
+                return gait_pass
+        return None
+
+    def mean_stance_duration(self, direction):
+        """
+        Mean stance duration of the passes walked in direction, or None when no pass has one yet.
+        """
+        durations = [
+            gait_pass.stance_duration
+            for gait_pass in self.passes
+            if gait_pass.direction == direction and gait_pass.stance_duration is not None
+        ]
+        return sum(durations) / len(durations) if durations else None
+
+
+def benchmark_events(frames=120 * 600):
+    """
+    Print the time needed to find the events of a synthetic walk offline and frame by frame, and check that both
+    find the same events.
+    """
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+    t = np.arange(frames)
+    # About one stride per second; the foot rises up to 30 pixels in swing
+    vm_y = 600 - np.clip(30 * np.sin(2 * np.pi * t / 130), 0, None) + rng.normal(0, 0.5, frames)
+    ankle_y = 590 - np.clip(25 * np.sin(2 * np.pi * (t - 20) / 130), 0, None) + rng.normal(0, 0.5, frames)
+    vm_y[rng.random(frames) < 0.02] = np.nan
+    frame_numbers = t + 1
+
+    start = perf_counter()
+    heel_strikes, toe_offs = detect_events(vm_y, ankle_y)
+    cycles = gait_cycles(frame_numbers, heel_strikes, toe_offs)
+    offline = perf_counter() - start
+
+    detector = GaitEventDetector()
+    start = perf_counter()
+    for frame, vm, ankle in zip(frame_numbers.tolist(), vm_y.tolist(), ankle_y.tolist()):
+        detector.update(frame, None if np.isnan(vm) else vm, ankle)
+    online = perf_counter() - start
+
+    same = np.array_equal(frame_numbers[heel_strikes], detector.heel_strike_frames) and np.array_equal(
+        frame_numbers[toe_offs], detector.toe_off_frames
+    )
+    print(f"{frames} frames: {len(cycles['start'])} cycles, mean stance {np.nanmean(cycles['stance_percent']):.1f} %")
+    print(f"Offline {offline * 1e3:.1f} ms, online {online / frames * 1e6:.2f} us per frame, same events: {same}")
+
+
+def check_live_params(frames=120 * 20):
+    """
+    Check that a swing threshold changed during a pass is used from the next frame on by that pass, and that a
+    phase window changed during a pass only applies to the next pass.
+    """
+    t = np.arange(frames)
+    vm_y = 600 - np.clip(30 * np.sin(2 * np.pi * t / 130), 0, None)
+    ankle_y = 590 - np.clip(25 * np.sin(2 * np.pi * (t - 20) / 130), 0, None)
+    change = frames // 2
+
+    session = GaitSession(swing_threshold=SWING_THRESHOLD, phase_window=None)
+    for frame in range(1, frames + 1):
+        if frame == change:
+            # Above the highest rise of the foot: no toe off can be found afterwards
+            session.set_swing_threshold(40)
+            session.set_phase_window(120)
+        session.update(frame, "left_to_right", vm_y[frame - 1], ankle_y[frame - 1])
+
+    gait_pass = session.current
+    toe_offs = gait_pass.detector.toe_off_frames
+    print(
+        f"Toe offs before the change: {sum(frame < change for frame in toe_offs)}, "
+        f"after: {sum(frame >= change for frame in toe_offs)}"
+    )
+    assert toe_offs and max(toe_offs) < change
+    assert gait_pass.detector.vm.swing_threshold == gait_pass.detector.ankle.swing_threshold == 40
+    assert gait_pass.vm_extrema.window is None
+
+    session.update(frames + 1, "right_to_left", vm_y[0], ankle_y[0])
+    assert session.current.vm_extrema.window == 120 and session.current.swing_threshold == 40
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_events()
+    check_live_params()
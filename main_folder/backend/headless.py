@@ -0,0 +1,293 @@
+"""
+Headless Analysis Module
+
+This module runs the MotionAnalysis pipeline (detection, tracking, marker centers, joint angles and gait phases) on
+a recorded video without Qt, timers or cv2 windows, as fast as the CPU allows, and writes the results to disk.
+
+Dependencies:
+- argparse: Command line interface.
+- csv: Output files.
+- numpy: Trajectory arrays.
+- backend.backend: MotionAnalysis pipeline.
+- backend.cycle_normalization: Normalized gait cycles.
+- backend.timeseries: Trajectory file writer.
+
+Output files:
+- <video>_angles.csv: One row per frame with the frame number, time, walking direction, the center of every marker
+  and the hip, knee and ankle angles (empty when the markers needed for the angles were not available).
+- <video>_events.csv: Stance, swing, heel strike and toe off times of every pass along the walkway (a pass ends
+  when the walking direction changes).
+- <video>_cycles.csv: Mean and standard deviation of the hip, knee and ankle angles over 0-100 % of the gait cycle,
+  for each walking direction (every cycle resampled to 101 points).
+- <video>_trajectory.npz: Marker centers and walking direction of every frame, to recompute the results without
+  the video (see backend.replay).
+
+Functions:
+- analyze_video: Processes one video and writes its angle and event files.
+- process_frame: Computes the angles and gait events of one frame and returns its output row.
+- write_csv: Writes a CSV file atomically (temporary file + rename).
+- write_time_series: Writes the per-frame rows to a CSV file.
+- write_events: Writes the gait events to a CSV file.
+- write_envelopes: Writes the mean and SD curves of the normalized gait cycles to a CSV file.
+
+Usage:
+- From main_folder: python -m backend.headless path/to/video.mp4 -o results/
+- From code: summary = analyze_video("video.mp4", "results/")
+"""
+
+import argparse
+import csv
+import os
+from time import time
+
+import numpy as np
+from backend.backend import MARKER_NAMES, MotionAnalysis
+from backend.cycle_normalization import direction_envelopes
+from backend.timeseries import save_trajectory
+
+ANGLE_COLUMNS = ["hip", "knee", "ankle"]
+
+
+def time_series_header(names=MARKER_NAMES):
+    header = ["frame", "time", "direction"]
+    for name in names:
+        header += [f"{name}_x", f"{name}_y"]
+    return header + ANGLE_COLUMNS
+
+
+def frame_row(analysis):
+    """
+    Build the output row of the frame MotionAnalysis just processed.
+    """
+    row = [
+        analysis.frame_number,
+        round(analysis.frame_number / analysis.fps_rate, 6),
+        analysis.direction,
+    ]
+    for marker_id in range(len(analysis.names)):
+        position = analysis.marker_positions.get(marker_id)
+        row += list(position) if position is not None else ["", ""]
+
+    if analysis.frame_angles is None:
+        row += [""] * len(ANGLE_COLUMNS)
+    else:
+        row += [round(angle, 4) for angle in analysis.frame_angles]
+    return row
+
+
+def write_csv(path, header, rows):
+    """
+    Write a CSV file atomically: the rows go to a temporary file in the same folder, which then replaces the
+    destination, so an interrupted run never leaves a truncated result behind.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_time_series(path, rows, names=MARKER_NAMES):
+    write_csv(path, time_series_header(names), rows)
+
+
+def write_events(path, events):
+    write_csv(path, ["pass", "direction", "event", "time"], events)
+
+
+def write_envelopes(path, envelopes):
+    """
+    Write the mean and standard deviation of the normalized cycles of each direction, one row per percent of the
+    cycle (see backend.cycle_normalization.direction_envelopes).
+    """
+    header = ["direction", "percent"]
+    for joint in ANGLE_COLUMNS:
+        header += [f"{joint}_mean", f"{joint}_sd", f"{joint}_cycles"]
+
+    rows = []
+    for direction, envelope in envelopes.items():
+        points = len(envelope["mean"])
+        for point in range(points):
+            row = [direction, round(point * 100 / (points - 1), 2)]
+            for joint in range(len(ANGLE_COLUMNS)):
+                for value in (envelope["mean"][point, joint], envelope["sd"][point, joint]):
+                    row.append(round(float(value), 4) if np.isfinite(value) else "")
+                row.append(int(envelope["count"][point, joint]))
+            rows.append(row)
+    write_csv(path, header, rows)
+
+
+def session_cycles(analysis):
+    """
+    Return the (direction, starts, ends) gait cycles of every pass found by MotionAnalysis.
+    """
+    cycles = []
+    for gait_pass in analysis.gait_session.passes:
+        pass_cycles = gait_pass.cycles()
+        cycles.append((gait_pass.direction, pass_cycles["start"], pass_cycles["end"]))
+    return cycles
+
+
+def gait_events(analysis):
+    """
+    Return the (pass, direction, event, time) rows of every gait event found by MotionAnalysis, in the order they
+    happened.
+    """
+    return list(analysis.gait_session.events)
+
+
+def process_frame(analysis):
+    """
+    Compute the angles and gait events of the frame whose marker centers are set, and return its output row.
+    """
+    analysis.get_filtered_angles()
+    analysis.update_gait_events()
+    return frame_row(analysis)
+
+
+def output_paths(video_path, output_dir=None):
+    """
+    Return the angle and event file paths of a video, creating the output folder.
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(video_path))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    return (
+        os.path.join(output_dir, f"{stem}_angles.csv"),
+        os.path.join(output_dir, f"{stem}_events.csv"),
+    )
+
+
+def trajectory_file(angles_path):
+    return angles_path.replace("_angles.csv", "_trajectory.npz")
+
+
+def cycles_file(angles_path):
+    return angles_path.replace("_angles.csv", "_cycles.csv")
+
+
+def analyze_video(
+    video_path, output_dir=None, n_markers=5, detect_every=30, tracker_backend="KCF"
+):
+    """
+    Run the full analysis on one video file and write its results.
+
+    Parameters:
+    - video_path (str): Video to analyze.
+    - output_dir (str): Folder of the output files (default is the folder of the video).
+    - n_markers, detect_every, tracker_backend: Passed to MotionAnalysis.
+
+    Returns:
+    - Dictionary with the output paths, the number of frames, the processing time and the processed frames per
+      second.
+
+    Raises:
+    - IOError: When the video cannot be opened.
+    """
+    analysis = MotionAnalysis(
+        video_path,
+        None,
+        n_markers=n_markers,
+        detect_every=detect_every,
+        tracker_backend=tracker_backend,
+        headless=True,
+    )
+
+    start = time()
+    analysis.open_camera()
+    rows = []
+    directions = []
+    # Accepted angles of every frame (NaN when missing or out of range), for the cycle normalization
+    angles = []
+    try:
+        analysis.get_video_frame()
+        analysis.init_tracker()
+        while analysis.success:
+            analysis.markers_centers()
+            analysis.gait_direction()
+            rows.append(process_frame(analysis))
+            directions.append(analysis.direction)
+            if analysis.frame_angles is None:
+                angles.append((np.nan,) * len(ANGLE_COLUMNS))
+            else:
+                angles.append(
+                    tuple(
+                        angle if valid else np.nan
+                        for angle, valid in zip(analysis.frame_angles, analysis.frame_angles_valid)
+                    )
+                )
+
+            analysis.get_video_frame()
+            if analysis.success:
+                analysis.check_markers()
+    finally:
+        analysis.close_window()
+    elapsed = time() - start
+
+    angles_path, events_path = output_paths(video_path, output_dir)
+    trajectory_path = trajectory_file(angles_path)
+    cycles_path = cycles_file(angles_path)
+
+    write_time_series(angles_path, rows, analysis.names)
+    write_events(events_path, gait_events(analysis))
+    trajectory = analysis.trajectory
+    write_envelopes(
+        cycles_path,
+        direction_envelopes(
+            trajectory["frame"], np.array(angles, dtype=np.float64).reshape(-1, 3), session_cycles(analysis)
+        ),
+    )
+    save_trajectory(
+        trajectory_path,
+        trajectory["frame"],
+        trajectory["time"],
+        np.stack([trajectory["x"], trajectory["y"]], axis=2),
+        directions,
+        analysis.fps_rate,
+    )
+
+    return {
+        "video": video_path,
+        "angles": angles_path,
+        "events": events_path,
+        "trajectory": trajectory_path,
+        "cycles": cycles_path,
+        "frames": len(rows),
+        "seconds": elapsed,
+        "fps": len(rows) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a gait video without the GUI.")
+    parser.add_argument("video", help="Video file to analyze")
+    parser.add_argument("-o", "--output", help="Output folder (default: next to the video)")
+    parser.add_argument("--markers", type=int, default=5, help="Number of markers")
+    parser.add_argument(
+        "--detect-every", type=int, default=30, help="Run YOLO at least every N frames"
+    )
+    parser.add_argument(
+        "--tracker", default="KCF", help="Tracker backend: CSRT, KCF, MOSSE or LK"
+    )
+    args = parser.parse_args(argv)
+
+    summary = analyze_video(
+        args.video, args.output, args.markers, args.detect_every, args.tracker
+    )
+    print(
+        f"{summary['video']}: {summary['frames']} frames in {summary['seconds']:.1f} s "
+        f"({summary['fps']:.1f} fps)"
+    )
+    print(f"Angles: {summary['angles']}")
+    print(f"Events: {summary['events']}")
+    print(f"Cycles: {summary['cycles']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Marker Trackers Module
+
+This module wraps the trackers that propagate the marker boxes between two detections. Every marker owns its own
+tracker, so a single lost marker can be re-initialised without rebuilding the trackers of the others.
+
+Dependencies:
+- cv2: OpenCV library for computer vision (the CSRT, KCF and MOSSE trackers need opencv-contrib).
+- numpy: Used for the point and box arithmetic.
+
+Available backends:
+- "CSRT": cv2.legacy.TrackerCSRT. Most accurate, slowest.
+- "KCF": cv2.legacy.TrackerKCF. Good balance for the small, high-contrast markers.
+- "MOSSE": cv2.legacy.TrackerMOSSE. Fastest correlation filter.
+- "LK": Sparse pyramidal Lucas-Kanade optical flow on corner points inside the marker box.
+
+Classes:
+- OpenCVMarkerTracker: One OpenCV legacy tracker (CSRT, KCF or MOSSE) following one marker.
+- LucasKanadeMarkerTracker: Sparse optical flow tracker following one marker.
+- MarkerTrackerSet: One tracker per marker, with per-marker update status and re-initialisation.
+
+Functions:
+- create_marker_tracker: Builds a single-marker tracker for the chosen backend.
+
+Usage:
+- Create a MarkerTrackerSet with the backend chosen for the session and call init() with the detected boxes.
+- Call update() every tracked frame; lost_indexes() tells which markers need to be found again.
+- Call reinit() for each recovered marker.
+
+Note: Tracker i always follows the marker with ID i (see TrackingState), so the set keeps one slot per marker
+even when a marker has no tracker.
+"""
+
+import cv2
+import numpy as np
+
+TRACKER_BACKENDS = ("CSRT", "KCF", "MOSSE", "LK")
+EMPTY_BOX = (0, 0, 0, 0)
+
+
+class OpenCVMarkerTracker:
+    _creators = {
+        "CSRT": lambda: cv2.legacy.TrackerCSRT_create(),
+        "KCF": lambda: cv2.legacy.TrackerKCF_create(),
+        "MOSSE": lambda: cv2.legacy.TrackerMOSSE_create(),
+    }
+
+    def __init__(self, backend="CSRT"):
+        """
+        Parameters:
+        - backend (str): "CSRT", "KCF" or "MOSSE".
+        """
+        self.backend = backend
+        self.tracker = None
+
+    def init(self, frame, box):
+        self.tracker = self._creators[self.backend]()
+        self.tracker.init(frame, tuple(int(v) for v in box))
+
+    def update(self, frame):
+        ok, box = self.tracker.update(frame)
+        return ok, tuple(box)
+
+
+class LucasKanadeMarkerTracker:
+    def __init__(self, padding=40, max_corners=10, win_size=(15, 15), max_level=2):
+        """
+        Parameters:
+        - padding (int): Margin in pixels around the box where the flow is computed (default is 40).
+        - max_corners (int): Maximum number of corner points followed inside the box (default is 10).
+        - win_size (tuple): Lucas-Kanade search window (default is 15x15).
+        - max_level (int): Number of pyramid levels above the base image (default is 2).
+        """
+        self.padding = padding
+        self.max_corners = max_corners
+        self.lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self.box = None
+        self.prev_roi = None
+        self.roi_origin = None
+        self.points = None
+        self.predicted_shift = None
+
+    def _search_region(self, frame):
+        height, width = frame.shape[:2]
+        x, y, w, h = self.box
+        x1 = int(max(x - self.padding, 0))
+        y1 = int(max(y - self.padding, 0))
+        x2 = int(min(x + w + self.padding, width))
+        y2 = int(min(y + h + self.padding, height))
+        return x1, y1, x2, y2
+
+    def _gray_roi(self, frame, region):
+        x1, y1, x2, y2 = region
+        roi = frame[y1:y2, x1:x2]
+        return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+
+    def _seed_points(self, frame):
+        """
+        Store the grey search region around the current box and the points to follow inside it.
+        """
+        region = self._search_region(frame)
+        self.roi_origin = region[:2]
+        self.prev_roi = self._gray_roi(frame, region)
+
+        x, y, w, h = self.box
+        box_x = int(x - self.roi_origin[0])
+        box_y = int(y - self.roi_origin[1])
+        mask = np.zeros_like(self.prev_roi)
+        mask[max(box_y, 0) : box_y + int(h), max(box_x, 0) : box_x + int(w)] = 255
+
+        points = cv2.goodFeaturesToTrack(
+            self.prev_roi, self.max_corners, 0.01, 3, mask=mask
+        )
+        if points is None:
+            # Fall back on the box center when the marker has no corners
+            points = np.array(
+                [[[box_x + w / 2, box_y + h / 2]]], dtype=np.float32
+            )
+        self.points = points.astype(np.float32)
+
+    def init(self, frame, box):
+        self.box = tuple(float(v) for v in box)
+        self._seed_points(frame)
+
+    def set_prediction(self, box):
+        """
+        Use a predicted box for the next frame as the initial guess of the optical flow.
+        """
+        x, y, _, _ = self.box
+        self.predicted_shift = np.array([box[0] - x, box[1] - y], dtype=np.float32)
+
+    def update(self, frame):
+        region = (
+            self.roi_origin[0],
+            self.roi_origin[1],
+            self.roi_origin[0] + self.prev_roi.shape[1],
+            self.roi_origin[1] + self.prev_roi.shape[0],
+        )
+        roi = self._gray_roi(frame, region)
+        if roi.shape != self.prev_roi.shape:
+            return False, EMPTY_BOX
+
+        if self.predicted_shift is not None:
+            guess = self.points + self.predicted_shift
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_roi,
+                roi,
+                self.points,
+                guess,
+                flags=cv2.OPTFLOW_USE_INITIAL_FLOW,
+                **self.lk_params,
+            )
+            self.predicted_shift = None
+        else:
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_roi, roi, self.points, None, **self.lk_params
+            )
+        if new_points is None or not status.any():
+            return False, EMPTY_BOX
+
+        good = status.flatten() == 1
+        dx, dy = np.median(new_points[good] - self.points[good], axis=0).flatten()
+
+        x, y, w, h = self.box
+        self.box = (x + float(dx), y + float(dy), w, h)
+        self._seed_points(frame)
+        return True, self.box
+
+
+def create_marker_tracker(backend="CSRT"):
+    """
+    Build a single-marker tracker for the given backend ("CSRT", "KCF", "MOSSE" or "LK").
+    """
+    if backend == "LK":
+        return LucasKanadeMarkerTracker()
+    if backend in OpenCVMarkerTracker._creators:
+        return OpenCVMarkerTracker(backend)
+    raise ValueError(f"Invalid tracker backend: {backend}")
+
+
+class MarkerTrackerSet:
+    def __init__(self, backend="CSRT"):
+        """
+        Parameters:
+        - backend (str): Tracker used for every marker of the session (see TRACKER_BACKENDS).
+        """
+        if backend not in TRACKER_BACKENDS:
+            raise ValueError(f"Invalid tracker backend: {backend}")
+        self.backend = backend
+        self.trackers = []
+        self.ok = []
+        self.last_boxes = []
+
+    def __len__(self):
+        return len(self.trackers)
+
+    def init(self, frame, boxes):
+        """
+        Create one tracker per box, box i following marker i. Empty boxes leave their marker lost.
+        """
+        self.trackers = []
+        self.ok = []
+        self.last_boxes = []
+        for box in boxes:
+            self.add(frame, box)
+
+    def add(self, frame, box):
+        self.trackers.append(None)
+        self.ok.append(False)
+        self.last_boxes.append(EMPTY_BOX)
+        self.reinit(len(self.trackers) - 1, frame, box)
+
+    def reinit(self, index, frame, box):
+        """
+        Re-initialise the tracker of a single marker. An empty box leaves the marker without a tracker (lost).
+        """
+        if not np.any(box):
+            self.trackers[index] = None
+            self.ok[index] = False
+            self.last_boxes[index] = EMPTY_BOX
+            return
+
+        tracker = create_marker_tracker(self.backend)
+        tracker.init(frame, box)
+        self.trackers[index] = tracker
+        self.ok[index] = True
+        self.last_boxes[index] = tuple(float(v) for v in box)
+
+    def update(self, frame, predicted_boxes=None):
+        """
+        Update every tracker on the new frame.
+
+        Parameters:
+        - frame: New video frame.
+        - predicted_boxes: Optional boxes predicted for this frame (one per marker). Trackers that can use a
+          search window (the Lucas-Kanade tracker) start their search from them.
+
+        Returns:
+        - ok (bool): True when every marker was tracked.
+        - boxes: float64 array of shape (N, 4). Lost markers get an empty [0, 0, 0, 0] box.
+        """
+        boxes = np.zeros((len(self.trackers), 4), dtype=np.float64)
+        for i, tracker in enumerate(self.trackers):
+            if tracker is None:
+                self.ok[i] = False
+                continue
+            if predicted_boxes is not None and hasattr(tracker, "set_prediction"):
+                tracker.set_prediction(predicted_boxes[i])
+            ok, box = tracker.update(frame)
+            self.ok[i] = bool(ok)
+            if ok:
+                boxes[i] = box
+                self.last_boxes[i] = tuple(box)
+        return all(self.ok), boxes
+
+    def lost_indexes(self):
+        return [i for i, ok in enumerate(self.ok) if not ok]
@@ -11,22 +11,42 @@ Attributes:
 - confidenceValue: Confidence threshold for considering detected markers (default is 0.6).
 - weightsFile: Path to the YOLO weights file.
 - cfgFile: Path to the YOLO configuration file.
+- model: Shared YoloModel taken from the ModelRegistry (the network is never reloaded per instance).
 - net: YOLO neural network model.
 - blob: Blob representation of the input frame.
+- n_markers: Number of markers expected in the frame. When set, only that many NMS survivors are returned.
 
 Methods:
 - __init__: Initializes the MarkerDetection object with input parameters.
 - detect: Performs marker detection on the provided frame using YOLO.
+- detect_in_rois: Re-detects markers only inside padded regions around their last known centers.
+
+Functions:
+- decode_outputs: Vectorized decoding of the raw YOLO outputs into typed box/confidence/class arrays.
+- nms_indexes: Non-maximum suppression returning a flat index array.
+- select_markers: Keeps the NMS survivors and picks the expected markers in anatomical (top to bottom) order.
+- benchmark_decode: Micro-benchmark of the decoder on a recorded frame (run this module as a script).
 
 Usage:
 - Create an instance of the MarkerDetection class with the input frame and optional parameters.
 - Call the detect() method to perform marker detection and obtain the results.
+- MotionAnalysis.recover_lost_markers calls detect_in_rois when a tracker fails on a marker its Kalman filter still
+  predicts; python -m backend.backend runs it on a synthetic occlusion.
 
 Note: Ensure that the YOLO weights file and configuration file paths are correctly specified.
 """
 
+import sys
+from time import perf_counter
+
 import cv2
 import numpy as np
+from backend.model_registry import DEFAULT_CFG_FILE, DEFAULT_WEIGHTS_FILE, ModelRegistry
+
+SCORE_THRESHOLD = 0.5
+NMS_THRESHOLD = 0.4
+ROI_PADDING = 80
+ROI_INPUT_SIZE = (160, 160)
 
 
 class MarkerDetection:
@@ -34,8 +54,10 @@ class MarkerDetection:
         self,
         detectFrame,
         confidenceValue=0.6,
-        weightsFile="/Users/tiagocoutinho/Desktop/Gait_Software/main_folder/yolov3_training_last.weights",
-        cfgFile="/Users/tiagocoutinho/Desktop/Gait_Software/main_folder/yolov3_testing.cfg",
+        weightsFile=DEFAULT_WEIGHTS_FILE,
+        cfgFile=DEFAULT_CFG_FILE,
+        model=None,
+        n_markers=None,
     ):
         """
         Initialize the MarkerDetection object.
@@ -45,11 +67,15 @@ class MarkerDetection:
         - confidenceValue: Confidence threshold for marker detection (default is 0.6).
         - weightsFile: Path to the YOLO weights file.
         - cfgFile: Path to the YOLO configuration file.
+        - model: Already loaded YoloModel. When None, the shared model for weightsFile/cfgFile is taken from the ModelRegistry.
+        - n_markers: Number of markers expected in the frame (default is None, which keeps every NMS survivor).
         """
         self.detectFrame = detectFrame
         self.confidenceValue = confidenceValue
-        self.net = cv2.dnn.readNet(weightsFile, cfgFile)
+        self.model = model if model is not None else ModelRegistry.get(weightsFile, cfgFile)
+        self.net = self.model.net
         self.blob = None
+        self.n_markers = n_markers
 
     def detect(self):
         """
@@ -57,12 +83,10 @@ class MarkerDetection:
 
         Returns:
         - detectFrame: Processed frame with detected markers.
-        - boxes: List of bounding boxes for detected markers.
-        - indexes: Indexes of selected bounding boxes after non-maximum suppression.
+        - boxes: int32 array of shape (N, 4) with the [x, y, w, h] boxes that survived non-maximum suppression,
+          ordered from the top of the frame (Shoulder) to the bottom (V_Metatarsal).
+        - indexes: int32 array indexing the returned boxes (0..N-1).
         """
-        layer_names = self.net.getLayerNames()
-        output_layers = [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
-
         if self.detectFrame is not None:
             height, width, channels = self.detectFrame.shape
 
@@ -70,34 +94,236 @@ class MarkerDetection:
                 self.detectFrame, 0.00392, (416, 416), (0, 0, 0), True, crop=False
             )
 
-        self.net.setInput(self.blob)
-        outs = self.net.forward(output_layers)
-
-        class_ids = []
-        confidences = []
-        self.boxes = []
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                self.confidenceValue = scores[class_id]
-
-                if self.confidenceValue > 0.5:
-                    x, y, w, h = detection[0:4] * np.array(
-                        [width, height, width, height]
-                    )
-                    x1 = int(x - w / 2)
-                    y1 = int(y - h / 2)
-                    x2 = int(x + w / 2)
-                    y2 = int(y + h / 2)
-                    w = x2 - x1
-                    h = y2 - y1
-
-                    self.boxes.append([x1, y1, w, h])
-                    confidences.append(float(self.confidenceValue))
-                    class_ids.append(class_id)
-
-        # indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-        self.indexes = cv2.dnn.NMSBoxes(self.boxes, confidences, 0.5, 0.4)
+        outs = self.model.forward(self.blob)
+
+        self.boxes, self.confidences, self.class_ids = decode_outputs(
+            outs, width, height, SCORE_THRESHOLD
+        )
+        self.indexes = nms_indexes(self.boxes, self.confidences)
+
+        self.boxes, self.confidences = select_markers(
+            self.boxes, self.confidences, self.indexes, self.n_markers
+        )
+        self.indexes = np.arange(len(self.boxes), dtype=np.int32)
 
         return self.detectFrame, self.boxes, self.indexes
+
+    def detect_in_rois(self, centers, padding=ROI_PADDING, inputSize=ROI_INPUT_SIZE):
+        """
+        Re-detect markers only inside padded regions around their last known centers.
+
+        Every region is cropped from the input frame, all crops go through the network as a single batch at a
+        small input size, and the best box of each crop is mapped back to frame coordinates. This is much cheaper
+        than a full-frame pass when only one or two markers were lost.
+
+        Parameters:
+        - centers: List of (x, y) last known centers of the missing markers.
+        - padding: Half size in pixels of the square region cropped around each center (default is 80).
+        - inputSize: (width, height) of the network input used for the crops (default is 160x160).
+
+        Returns:
+        - boxes: int32 array of shape (M, 4) with the [x, y, w, h] frame-coordinate box found in each region
+          (regions with no detection are skipped).
+        - found: List with the index in centers of each returned box.
+        """
+        if self.detectFrame is None or len(centers) == 0:
+            return np.empty((0, 4), dtype=np.int32), []
+
+        height, width = self.detectFrame.shape[:2]
+        crops = []
+        origins = []
+        for cx, cy in centers:
+            x1 = int(max(cx - padding, 0))
+            y1 = int(max(cy - padding, 0))
+            x2 = int(min(cx + padding, width))
+            y2 = int(min(cy + padding, height))
+            if x2 <= x1 or y2 <= y1:
+                crops.append(None)
+                origins.append(None)
+                continue
+            crops.append(self.detectFrame[y1:y2, x1:x2])
+            origins.append((x1, y1))
+
+        valid = [i for i, crop in enumerate(crops) if crop is not None]
+        if not valid:
+            return np.empty((0, 4), dtype=np.int32), []
+
+        self.blob = cv2.dnn.blobFromImages(
+            [crops[i] for i in valid], 0.00392, inputSize, (0, 0, 0), True, crop=False
+        )
+        outs = self.model.forward(self.blob)
+
+        # Split every output layer per crop: (batch, rows, attrs) or (batch * rows, attrs)
+        per_crop_outs = [
+            np.asarray(out).reshape(len(valid), -1, out.shape[-1]) for out in outs
+        ]
+
+        boxes = []
+        found = []
+        for batch_index, center_index in enumerate(valid):
+            crop_height, crop_width = crops[center_index].shape[:2]
+            crop_boxes, crop_confidences, _ = decode_outputs(
+                [out[batch_index] for out in per_crop_outs], crop_width, crop_height
+            )
+            if len(crop_boxes) == 0:
+                continue
+
+            best_box = crop_boxes[np.argmax(crop_confidences)].copy()
+            best_box[0] += origins[center_index][0]
+            best_box[1] += origins[center_index][1]
+            boxes.append(best_box)
+            found.append(center_index)
+
+        return np.array(boxes, dtype=np.int32).reshape(-1, 4), found
+
+
+def decode_outputs(outs, width, height, scoreThreshold=SCORE_THRESHOLD):
+    """
+    Decode the raw YOLO output layers in a single NumPy pass.
+
+    Parameters:
+    - outs: Raw outputs returned by the network, one (rows, 5 + classes) array per output layer.
+    - width, height: Size in pixels of the frame the blob was built from.
+    - scoreThreshold: Minimum class score for a row to be kept.
+
+    Returns:
+    - boxes: int32 array of shape (N, 4) with [x, y, w, h] boxes in pixels.
+    - confidences: float32 array of shape (N,) with the class score of each box.
+    - class_ids: int32 array of shape (N,) with the class of each box.
+    """
+    detections = np.concatenate([np.asarray(out).reshape(-1, out.shape[-1]) for out in outs])
+
+    scores = detections[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    mask = confidences > scoreThreshold
+    centers_sizes = detections[mask, 0:4] * np.array(
+        [width, height, width, height], dtype=np.float32
+    )
+
+    x, y, w, h = centers_sizes.T
+    x1 = np.trunc(x - w / 2)
+    y1 = np.trunc(y - h / 2)
+    x2 = np.trunc(x + w / 2)
+    y2 = np.trunc(y + h / 2)
+    boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1).astype(np.int32)
+
+    return (
+        boxes.reshape(-1, 4),
+        confidences[mask].astype(np.float32),
+        class_ids[mask].astype(np.int32),
+    )
+
+
+def nms_indexes(boxes, confidences, scoreThreshold=SCORE_THRESHOLD, nmsThreshold=NMS_THRESHOLD):
+    """
+    Run non-maximum suppression and return the surviving box indexes as a flat int32 array.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    indexes = cv2.dnn.NMSBoxes(
+        boxes.tolist(), confidences.tolist(), scoreThreshold, nmsThreshold
+    )
+    return np.array(indexes, dtype=np.int32).flatten()
+
+
+def select_markers(boxes, confidences, indexes, n_markers=None):
+    """
+    Keep only the NMS survivors and pick the expected markers in anatomical order.
+
+    The markers are placed on the Shoulder, Trochanter, Knee, Ankle and V_Metatarsal, which appear from the top to
+    the bottom of a sagittal view. The n_markers most confident survivors are kept and returned sorted by the
+    vertical position of their centers, so box i corresponds to marker name i.
+
+    Parameters:
+    - boxes: int32 array of shape (N, 4) with [x, y, w, h] boxes.
+    - confidences: float32 array of shape (N,) with the score of each box.
+    - indexes: Indexes of the boxes that survived non-maximum suppression.
+    - n_markers: Number of markers to keep (default is None, which keeps every survivor).
+
+    Returns:
+    - boxes: int32 array of shape (M, 4), M <= n_markers, ordered top to bottom.
+    - confidences: float32 array of shape (M,) matching the returned boxes.
+    """
+    boxes = boxes[indexes]
+    confidences = confidences[indexes]
+
+    if n_markers is not None and len(boxes) > n_markers:
+        best = np.argsort(-confidences, kind="stable")[:n_markers]
+        boxes = boxes[best]
+        confidences = confidences[best]
+
+    vertical_order = np.argsort(boxes[:, 1] + boxes[:, 3] / 2, kind="stable")
+    return boxes[vertical_order], confidences[vertical_order]
+
+
+def _decode_outputs_loop(outs, width, height, scoreThreshold=SCORE_THRESHOLD):
+    """
+    Row-by-row decoder used before decode_outputs, kept only as the baseline for the benchmark below.
+    """
+    class_ids = []
+    confidences = []
+    boxes = []
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+
+            if confidence > scoreThreshold:
+                x, y, w, h = detection[0:4] * np.array([width, height, width, height])
+                x1 = int(x - w / 2)
+                y1 = int(y - h / 2)
+                x2 = int(x + w / 2)
+                y2 = int(y + h / 2)
+
+                boxes.append([x1, y1, x2 - x1, y2 - y1])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+
+    return boxes, confidences, class_ids
+
+
+def benchmark_decode(video_path, repeats=200):
+    """
+    Compare the loop decoder with decode_outputs on the first frame of a recorded video.
+
+    Parameters:
+    - video_path: Path to a recorded gait video (or a still image).
+    - repeats: Number of times each decoder is run.
+    """
+    capture = cv2.VideoCapture(video_path)
+    success, frame = capture.read()
+    capture.release()
+    if not success:
+        print(f"Error: Could not read a frame from {video_path}.")
+        return
+
+    model = ModelRegistry.get()
+    height, width = frame.shape[:2]
+    blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+    outs = model.forward(blob)
+
+    start = perf_counter()
+    for _ in range(repeats):
+        loop_boxes, _, _ = _decode_outputs_loop(outs, width, height)
+    loop_time = (perf_counter() - start) / repeats
+
+    start = perf_counter()
+    for _ in range(repeats):
+        vector_boxes, _, _ = decode_outputs(outs, width, height)
+    vector_time = (perf_counter() - start) / repeats
+
+    rows = sum(len(out) for out in outs)
+    print(f"Rows decoded per frame: {rows} ({len(vector_boxes)} candidate boxes)")
+    print(f"Loop decoder:       {loop_time * 1000:.3f} ms/frame")
+    print(f"Vectorized decoder: {vector_time * 1000:.3f} ms/frame")
+    print(f"Speedup:            {loop_time / vector_time:.1f}x")
+    print(f"Same boxes:         {np.array_equal(np.array(loop_boxes).reshape(-1, 4), vector_boxes)}")
+
+
+# Usage: python -m backend.markers_detection <recorded_video>
+if __name__ == "__main__":
+    benchmark_decode(sys.argv[1])
@@ -0,0 +1,104 @@
+"""
+ModelRegistry Module
+
+This module keeps a single, process-wide copy of the YOLO v3 marker detection network.
+
+Parsing the weights and configuration files with cv2.dnn.readNet is expensive, so the network is loaded once
+per (weightsFile, cfgFile) pair, its output layer names are resolved once, and a dummy blob is pushed through
+it at load time so the first real detection does not pay the backend initialisation cost.
+
+Dependencies:
+- cv2: OpenCV library for computer vision.
+- numpy: Used to build the warm-up blob.
+
+Classes:
+- YoloModel: A loaded YOLO network together with its resolved output layer names.
+- ModelRegistry: Process-wide cache of YoloModel objects.
+
+Usage:
+- Call ModelRegistry.get() (optionally with the weights and configuration paths) to obtain the shared model.
+- Pass the returned model to MarkerDetection so that no detection call reloads the network.
+
+Note: A cv2.dnn network is not safe to run from several threads at once. Each process gets its own copy, and
+inside a process the model is meant to be used by one analysis pipeline at a time.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+DEFAULT_WEIGHTS_FILE = (
+    "/Users/tiagocoutinho/Desktop/Gait_Software/main_folder/yolov3_training_last.weights"
+)
+DEFAULT_CFG_FILE = "/Users/tiagocoutinho/Desktop/Gait_Software/main_folder/yolov3_testing.cfg"
+INPUT_SIZE = (416, 416)
+
+
+class YoloModel:
+    def __init__(self, weightsFile, cfgFile, inputSize=INPUT_SIZE):
+        """
+        Load the YOLO network and resolve its output layers.
+
+        Parameters:
+        - weightsFile: Path to the YOLO weights file.
+        - cfgFile: Path to the YOLO configuration file.
+        - inputSize: (width, height) of the network input (default is 416x416).
+        """
+        self.weightsFile = weightsFile
+        self.cfgFile = cfgFile
+        self.inputSize = inputSize
+        self.net = cv2.dnn.readNet(weightsFile, cfgFile)
+
+        layer_names = self.net.getLayerNames()
+        self.output_layers = [
+            layer_names[i - 1]
+            for i in np.array(self.net.getUnconnectedOutLayers()).flatten()
+        ]
+
+        self.warm_up()
+
+    def warm_up(self):
+        """
+        Run one forward pass on a black blob so the first real frame is not slowed down by lazy initialisation.
+        """
+        width, height = self.inputSize
+        dummy_blob = np.zeros((1, 3, height, width), dtype=np.float32)
+        self.forward(dummy_blob)
+
+    def forward(self, blob):
+        """
+        Run the network on a blob and return the raw outputs of every output layer.
+        """
+        self.net.setInput(blob)
+        return self.net.forward(self.output_layers)
+
+
+class ModelRegistry:
+    _models = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, weightsFile=DEFAULT_WEIGHTS_FILE, cfgFile=DEFAULT_CFG_FILE):
+        """
+        Return the shared YoloModel for the given files, loading it on first use.
+
+        Parameters:
+        - weightsFile: Path to the YOLO weights file.
+        - cfgFile: Path to the YOLO configuration file.
+        """
+        key = (weightsFile, cfgFile)
+        with cls._lock:
+            model = cls._models.get(key)
+            if model is None:
+                model = YoloModel(weightsFile, cfgFile)
+                cls._models[key] = model
+        return model
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop every cached model (e.g. after the weights file has been retrained).
+        """
+        with cls._lock:
+            cls._models.clear()
@@ -0,0 +1,377 @@
+"""
+Replay Module
+
+This module recomputes the results of a session from its stored marker trajectories, without decoding the video
+or running YOLO and the trackers again. The headless analysis saves the marker centers of every frame once
+(<video>_trajectory.npz); the replay engine then derives everything else from them in memory.
+
+The derived results form a small stage graph. Every stage is memoized and only recomputed when one of its
+parameters, or a stage it depends on, changes:
+
+- angles: hip, knee and ankle angles and the virtual trochanter (parameter trochanter_offset).
+- zeroed_angles: ankle angle relative to its reference (parameter ankle_reference, None for the first angle).
+- valid: range validity of every angle (parameter angle_limits).
+- passes: sample ranges of the passes along the walkway (a pass ends when the walking direction changes).
+- phases: stance and swing times of every pass (parameters swing_threshold, phase_window).
+- deviation: mean stance duration difference between the two directions (from passes and phases).
+- gait_events: every heel strike and toe off of every pass (parameters contact_threshold, swing_threshold,
+  baseline_window).
+- cycles: per-cycle start, toe off, end, stance and swing times of every pass (from gait_events).
+- envelopes: angles of every cycle resampled to cycle_points points and their mean and SD curves for each
+  direction (parameters cycle_points, min_coverage; from valid, passes and cycles).
+
+Dependencies:
+- argparse: Command line interface.
+- numpy: Vectorized stages.
+- backend.angle_engine: Vectorized joint angles.
+- backend.angle_filter: Default angle ranges.
+- backend.cycle_normalization: Normalized gait cycles.
+- backend.gait_events: Vectorized heel strike and toe off detection.
+- backend.headless: Output rows and CSV writers.
+- backend.timeseries: Trajectory files.
+
+Classes:
+- ReplayEngine: Memoized stage graph over one session's trajectories.
+
+Functions:
+- trailing_extrema: Running (or windowed) minimum and maximum of every sample, as RunningExtrema computes them.
+
+Usage:
+- engine = ReplayEngine.from_file("video_trajectory.npz")
+- engine.get("deviation"); engine.set_params(swing_threshold=5); engine.get("deviation") only recomputes phases
+  and deviation (the passes and angles are reused).
+- From main_folder: python -m backend.replay video_trajectory.npz -o results/ --swing-threshold 5
+"""
+
+import argparse
+import os
+
+import numpy as np
+from backend.angle_engine import TROCHANTER_OFFSET, compute_angles, zero_ankle
+from backend.angle_filter import ANGLE_LIMITS
+from backend.cycle_normalization import CYCLE_POINTS, MIN_COVERAGE, direction_envelopes
+from backend.gait_events import (
+    BASELINE_WINDOW,
+    CONTACT_THRESHOLD,
+    detect_events,
+    gait_cycles,
+)
+from backend.headless import (
+    ANGLE_COLUMNS,
+    MARKER_NAMES,
+    cycles_file,
+    output_paths,
+    write_envelopes,
+    write_events,
+    write_time_series,
+)
+from backend.timeseries import load_trajectory
+
+ANKLE = 3
+V_METATARSAL = 4
+# Order in which GaitPass reports the events found on the same frame
+EVENT_ORDER = ("stance", "swing", "toe_off", "heel_strike")
+
+DEFAULT_PARAMS = {
+    "trochanter_offset": TROCHANTER_OFFSET,
+    "ankle_reference": None,
+    "angle_limits": ANGLE_LIMITS,
+    "swing_threshold": 7,
+    "phase_window": None,
+    "contact_threshold": CONTACT_THRESHOLD,
+    "baseline_window": BASELINE_WINDOW,
+    "cycle_points": CYCLE_POINTS,
+    "min_coverage": MIN_COVERAGE,
+}
+
+# stage: (parameters it reads, stages it reads)
+STAGES = {
+    "angles": (("trochanter_offset",), ()),
+    "zeroed_angles": (("ankle_reference",), ("angles",)),
+    "valid": (("angle_limits",), ("zeroed_angles",)),
+    "passes": ((), ()),
+    "phases": (("swing_threshold", "phase_window"), ("passes",)),
+    "deviation": ((), ("passes", "phases")),
+    "gait_events": (("contact_threshold", "swing_threshold", "baseline_window"), ("passes",)),
+    "cycles": ((), ("gait_events",)),
+    "envelopes": (("cycle_points", "min_coverage"), ("zeroed_angles", "valid", "passes", "cycles")),
+}
+
+
+def trailing_extrema(y, window=None):
+    """
+    Minimum and maximum of every sample and the samples before it (the last window samples when window is set),
+    as RunningExtrema returns them sample by sample.
+    """
+    if window is None:
+        return np.minimum.accumulate(y), np.maximum.accumulate(y)
+    view = np.lib.stride_tricks.sliding_window_view
+    lows = view(np.concatenate([np.full(window - 1, np.inf), y]), window).min(axis=1)
+    highs = view(np.concatenate([np.full(window - 1, -np.inf), y]), window).max(axis=1)
+    return lows, highs
+
+
+class ReplayEngine:
+    def __init__(self, frames, positions, directions, fps_rate=120, **params):
+        """
+        Initialize the ReplayEngine object.
+
+        Parameters:
+        - frames: Frame number of every sample.
+        - positions: Array of shape (samples, 5, 2) with the marker centers, NaN for missing markers.
+        - directions: Walking direction of every sample.
+        - fps_rate (int): Frame rate used to convert frame numbers into times (default is 120).
+        - params: Stage parameters overriding DEFAULT_PARAMS.
+        """
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.directions = np.asarray(directions)
+        self.fps_rate = fps_rate
+
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update(params)
+        self.cache = {}
+        self.compute_counts = {stage: 0 for stage in STAGES}
+
+    @classmethod
+    def from_file(cls, path, **params):
+        trajectory = load_trajectory(path)
+        return cls(
+            trajectory["frames"],
+            trajectory["positions"],
+            trajectory["directions"],
+            trajectory["fps_rate"],
+            **params,
+        )
+
+    def _dependents(self, stage):
+        for other, (_, inputs) in STAGES.items():
+            if stage in inputs:
+                yield other
+                yield from self._dependents(other)
+
+    def set_params(self, **changes):
+        """
+        Change stage parameters and invalidate the stages that depend on them.
+        """
+        for name, value in changes.items():
+            if name not in self.params:
+                raise ValueError(f"Invalid replay parameter: {name}")
+            if self.params[name] is value or self.params[name] == value:
+                continue
+            self.params[name] = value
+            for stage, (stage_params, _) in STAGES.items():
+                if name in stage_params:
+                    self.cache.pop(stage, None)
+                    for dependent in self._dependents(stage):
+                        self.cache.pop(dependent, None)
+
+    def get(self, stage):
+        """
+        Return the result of a stage, computing it (and the stages it reads) only if needed.
+        """
+        if stage not in self.cache:
+            _, inputs = STAGES[stage]
+            values = [self.get(name) for name in inputs]
+            self.cache[stage] = getattr(self, f"_compute_{stage}")(*values)
+            self.compute_counts[stage] += 1
+        return self.cache[stage]
+
+    def _compute_angles(self):
+        return compute_angles(self.positions, self.params["trochanter_offset"])
+
+    def _compute_zeroed_angles(self, angles):
+        zeroed, _ = zero_ankle(angles[0], self.params["ankle_reference"])
+        return zeroed
+
+    def _compute_valid(self, zeroed_angles):
+        limits = self.params["angle_limits"]
+        bounds = np.array([limits[joint] for joint in ANGLE_COLUMNS], dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            return (zeroed_angles >= bounds[:, 0]) & (zeroed_angles <= bounds[:, 1])
+
+    def _compute_passes(self):
+        """
+        (direction, start, stop) sample range of every pass, as GaitSession splits the session.
+        """
+        if len(self.directions) == 0:
+            return []
+        starts = np.concatenate([[0], np.flatnonzero(self.directions[1:] != self.directions[:-1]) + 1])
+        stops = np.append(starts[1:], len(self.directions))
+        return [
+            (str(self.directions[start]), int(start), int(stop)) for start, stop in zip(starts, stops)
+        ]
+
+    def _compute_phases(self, passes):
+        """
+        Stance and swing times of every pass, as GaitPass finds them: stance starts when the VM marker is at its
+        lowest y so far, swing when it has risen swing_threshold pixels above its highest y so far (so far meaning
+        the last phase_window samples when it is set).
+        """
+        vm_y = self.positions[:, V_METATARSAL, 1]
+        phases = []
+        for _, start, stop in passes:
+            found = np.isfinite(vm_y[start:stop])
+            y = vm_y[start:stop][found]
+            frames = self.frames[start:stop][found]
+
+            stance = swing = None
+            if len(y):
+                min_y, max_y = trailing_extrema(y, self.params["phase_window"])
+                stance_index = np.flatnonzero(y == min_y)
+                swing_index = np.flatnonzero(max_y - y >= self.params["swing_threshold"])
+                if len(stance_index):
+                    stance = int(frames[stance_index[0]]) / self.fps_rate
+                if len(swing_index):
+                    swing = int(frames[swing_index[0]]) / self.fps_rate
+            phases.append((stance, swing))
+        return phases
+
+    def _compute_deviation(self, passes, phases):
+        """
+        Mean stance duration (swing time - stance time) of each direction and their percentage difference, as the
+        deviation panel of the GUI computes it.
+        """
+        durations = {"right_to_left": [], "left_to_right": []}
+        for (direction, _, _), (stance, swing) in zip(passes, phases):
+            if stance is not None and swing is not None:
+                durations[direction].append(swing - stance)
+        rtl, ltr = (
+            sum(values) / len(values) if values else None
+            for values in (durations["right_to_left"], durations["left_to_right"])
+        )
+
+        percent_diff = None
+        if rtl is not None and ltr is not None and max(rtl, ltr) != 0:
+            percent_diff = abs(rtl - ltr) / max(rtl, ltr) * 100
+        return {
+            "time_difference_RTL": rtl,
+            "time_difference_LTR": ltr,
+            "percent_diff": percent_diff,
+        }
+
+    def _compute_gait_events(self, passes):
+        """
+        Heel strike and toe off frames of every pass, as the GaitEventDetector of each GaitPass finds them.
+        """
+        events = []
+        for _, start, stop in passes:
+            heel_strikes, toe_offs = detect_events(
+                self.positions[start:stop, V_METATARSAL, 1],
+                self.positions[start:stop, ANKLE, 1],
+                self.params["contact_threshold"],
+                self.params["swing_threshold"],
+                self.params["baseline_window"],
+            )
+            frames = self.frames[start:stop]
+            events.append((frames[heel_strikes], frames[toe_offs]))
+        return events
+
+    def _compute_cycles(self, gait_events):
+        cycles = []
+        for heel_frames, toe_frames in gait_events:
+            frames = np.concatenate([heel_frames, toe_frames])
+            cycles.append(
+                gait_cycles(
+                    frames,
+                    np.arange(len(heel_frames)),
+                    np.arange(len(heel_frames), len(frames)),
+                    self.fps_rate,
+                )
+            )
+        return cycles
+
+    def _compute_envelopes(self, zeroed_angles, valid, passes, cycles):
+        return direction_envelopes(
+            self.frames,
+            np.where(valid, zeroed_angles, np.nan),
+            [
+                (direction, pass_cycles["start"], pass_cycles["end"])
+                for (direction, _, _), pass_cycles in zip(passes, cycles)
+            ],
+            self.params["cycle_points"],
+            self.params["min_coverage"],
+        )
+
+    def events(self):
+        """
+        Gait event rows in the format of the headless events file: (pass, direction, event, time) in the order the
+        events happened.
+        """
+        events = []
+        passes = self.get("passes")
+        for index, ((direction, _, _), (stance, swing), (heel_frames, toe_frames)) in enumerate(
+            zip(passes, self.get("phases"), self.get("gait_events"))
+        ):
+            # Stance and swing are stored as times; their frame is recovered for the ordering
+            found = [
+                (round(time * self.fps_rate), EVENT_ORDER.index(event), time)
+                for event, time in (("stance", stance), ("swing", swing))
+                if time is not None
+            ]
+            for event, frames in (("toe_off", toe_frames), ("heel_strike", heel_frames)):
+                found += [
+                    (frame, EVENT_ORDER.index(event), frame / self.fps_rate) for frame in frames.tolist()
+                ]
+            for _, order, time in sorted(found):
+                events.append((index, direction, EVENT_ORDER[order], time))
+        return events
+
+    def rows(self):
+        """
+        Per-frame rows in the format of the headless angles file.
+        """
+        angles = self.get("zeroed_angles")
+        rows = []
+        for frame, centers, direction, frame_angles in zip(
+            self.frames.tolist(), self.positions, self.directions.tolist(), angles
+        ):
+            row = [frame, round(frame / self.fps_rate, 6), direction]
+            for x, y in centers:
+                row += [int(x), int(y)] if np.isfinite(x) and np.isfinite(y) else ["", ""]
+            if np.isnan(frame_angles).any():
+                row += [""] * len(ANGLE_COLUMNS)
+            else:
+                row += [round(float(angle), 4) for angle in frame_angles]
+            rows.append(row)
+        return rows
+
+    def write(self, angles_path, events_path, cycles_path=None, names=MARKER_NAMES):
+        write_time_series(angles_path, self.rows(), names)
+        write_events(events_path, self.events())
+        if cycles_path is not None:
+            write_envelopes(cycles_path, self.get("envelopes"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute a session from its stored trajectories.")
+    parser.add_argument("trajectory", help="Trajectory file (<video>_trajectory.npz)")
+    parser.add_argument("-o", "--output", help="Output folder (default: next to the trajectory)")
+    parser.add_argument("--trochanter-offset", type=float, default=TROCHANTER_OFFSET)
+    parser.add_argument("--swing-threshold", type=float, default=7)
+    parser.add_argument(
+        "--phase-window", type=int, default=None, help="Frames the VM extremes are taken over (default: whole pass)"
+    )
+    args = parser.parse_args(argv)
+
+    engine = ReplayEngine.from_file(
+        args.trajectory,
+        trochanter_offset=args.trochanter_offset,
+        swing_threshold=args.swing_threshold,
+        phase_window=args.phase_window,
+    )
+    stem = os.path.basename(args.trajectory).replace("_trajectory.npz", "")
+    output_dir = args.output or os.path.dirname(os.path.abspath(args.trajectory))
+    angles_path, events_path = output_paths(os.path.join(output_dir, stem), output_dir)
+    cycles_path = cycles_file(angles_path)
+    engine.write(angles_path, events_path, cycles_path)
+
+    print(f"Angles: {angles_path}")
+    print(f"Events: {events_path}")
+    print(f"Cycles: {cycles_path}")
+    for name, value in engine.get("deviation").items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Time Series Module
+
+This module stores the per-frame data of a session (frame numbers, timestamps, marker coordinates, joint angles)
+in compact NumPy buffers instead of Python lists of boxed floats.
+
+Every channel is a preallocated array that doubles its capacity when it is full, so appending is amortized O(1)
+and a one-hour session at 120 fps takes a few MB. The stored samples are exposed as zero-copy views, which can be
+given directly to matplotlib or to the CSV/NumPy writers.
+
+Dependencies:
+- numpy: Storage of the samples.
+
+Classes:
+- GrowableArray: One growable channel (scalar or fixed-width samples).
+- TimeSeriesStore: Several channels appended together, one row per sample (a columnar table).
+
+Functions:
+- save_trajectory: Writes the marker centers of a session to a .npz file (atomically).
+- load_trajectory: Reads a file written by save_trajectory.
+
+Usage:
+- angles = GrowableArray(np.float32); angles.append(12.5); angles.view() is the data without a copy.
+- store = TimeSeriesStore({"frame": np.int32, "x": (np.float32, 5)}); store.append(frame=1, x=[...]);
+  store["x"] is a (samples, 5) view.
+- Run this file to compare the memory of a one-hour session kept in lists and in the store.
+
+Note: A view stays valid until the next append that grows the buffer; take a new view after appending.
+"""
+
+import os
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+DIRECTIONS = ("left_to_right", "right_to_left")
+
+
+class GrowableArray:
+    def __init__(self, dtype=np.float32, width=None, capacity=INITIAL_CAPACITY):
+        """
+        Initialize the GrowableArray object.
+
+        Parameters:
+        - dtype: NumPy type of the samples (default is float32).
+        - width (int): Number of values per sample, or None for scalar samples (default is None).
+        - capacity (int): Number of samples preallocated (default is 1024).
+        """
+        self.width = width
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.empty(shape, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view if dtype is None else view.astype(dtype, copy=False)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def _grow(self, needed):
+        capacity = len(self.data)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+        grown[: self.size] = self.data[: self.size]
+        self.data = grown
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self._grow(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        end = self.size + len(values)
+        if end > len(self.data):
+            self._grow(end)
+        self.data[self.size : end] = values
+        self.size = end
+
+    def view(self):
+        """
+        Stored samples, without a copy.
+        """
+        return self.data[: self.size]
+
+    def last(self, default=None):
+        return self.data[self.size - 1] if self.size else default
+
+    def clear(self):
+        self.size = 0
+
+
+class TimeSeriesStore:
+    def __init__(self, columns, capacity=INITIAL_CAPACITY):
+        """
+        Initialize the TimeSeriesStore object.
+
+        Parameters:
+        - columns (dict): Column name -> dtype, or -> (dtype, width) for fixed-width samples (e.g. the x
+          coordinate of every marker).
+        - capacity (int): Number of rows preallocated (default is 1024).
+        """
+        self.columns = {}
+        self.fill_values = {}
+        for name, spec in columns.items():
+            dtype, width = spec if isinstance(spec, tuple) else (spec, None)
+            self.columns[name] = GrowableArray(dtype, width, capacity)
+            # Value of a column left out of append(): NaN for floats, zero otherwise
+            self.fill_values[name] = (
+                np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+            )
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name].view()
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def append(self, **values):
+        """
+        Add one row. Columns that are not given get NaN (float columns) or 0.
+        """
+        for name, column in self.columns.items():
+            column.append(values.get(name, self.fill_values[name]))
+
+    def column(self, name):
+        return self.columns[name].view()
+
+    def views(self):
+        """
+        Dictionary of zero-copy views of every column (e.g. for np.savez).
+        """
+        return {name: column.view() for name, column in self.columns.items()}
+
+    def clear(self):
+        for column in self.columns.values():
+            column.clear()
+
+
+def save_trajectory(path, frames, times, positions, directions, fps_rate):
+    """
+    Write the marker centers of a session to a .npz file.
+
+    Parameters:
+    - path (str): Destination file.
+    - frames: Frame number of every sample.
+    - times: Time in seconds of every sample.
+    - positions: Array of shape (samples, markers, 2), NaN for missing markers.
+    - directions: Walking direction ("left_to_right" or "right_to_left") of every sample.
+    - fps_rate (int): Frame rate used to convert frame numbers into times.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as file:
+            np.savez(
+                file,
+                frames=np.asarray(frames, dtype=np.int32),
+                times=np.asarray(times, dtype=np.float64),
+                positions=np.asarray(positions, dtype=np.float32),
+                directions=np.array(
+                    [DIRECTIONS.index(direction) for direction in directions], dtype=np.uint8
+                ),
+                fps_rate=fps_rate,
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_trajectory(path):
+    """
+    Read a trajectory file.
+
+    Returns:
+    - Dictionary with frames, times, positions (float64), directions (list of str) and fps_rate.
+    """
+    with np.load(path) as data:
+        return {
+            "frames": data["frames"].astype(np.int64),
+            "times": data["times"],
+            "positions": data["positions"].astype(np.float64),
+            "directions": [DIRECTIONS[index] for index in data["directions"]],
+            "fps_rate": int(data["fps_rate"]),
+        }
+
+
+def benchmark_memory(fps=120, seconds=3600, n_markers=5):
+    """
+    Print the memory used by one hour of frame, time, marker and angle samples in lists and in the store.
+    """
+    import sys
+
+    samples = fps * seconds
+    channels = 2 + 2 * n_markers + 3
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-30, 80, samples).tolist()
+
+    # Every list slot is an 8-byte pointer to its own float object
+    one_list = sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+    list_total = one_list * channels
+
+    store = TimeSeriesStore(
+        {
+            "frame": np.int32,
+            "time": np.float32,
+            "x": (np.float32, n_markers),
+            "y": (np.float32, n_markers),
+            "hip": np.float32,
+            "knee": np.float32,
+            "ankle": np.float32,
+        }
+    )
+    x = np.zeros(n_markers, dtype=np.float32)
+    for frame in range(samples):
+        store.append(
+            frame=frame, time=frame / fps, x=x, y=x, hip=0.0, knee=0.0, ankle=0.0
+        )
+    used = sum(column.view().nbytes for column in store.columns.values())
+
+    print(f"{samples} frames x {channels} channels")
+    print(f"Python lists: {list_total / 1e6:8.1f} MB")
+    print(f"Store: {used / 1e6:8.1f} MB used, {store.nbytes / 1e6:8.1f} MB allocated")
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_memory()
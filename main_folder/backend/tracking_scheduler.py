@@ -0,0 +1,164 @@
+"""
+DetectionScheduler Module
+
+This module decides, frame by frame, whether the markers are located by running the YOLO detector or by
+propagating the existing trackers, and reconciles both sources when a detection runs while trackers are active.
+
+Dependencies:
+- numpy: Used for the vectorized IoU computation.
+
+Classes:
+- DetectionScheduler: Tracking-by-detection scheduler that runs the detector every N frames or after a tracking
+  failure, and counts detected and tracked frames.
+
+Functions:
+- iou_matrix: Pairwise intersection over union between two sets of [x, y, w, h] boxes.
+- match_boxes: Greedy one-to-one matching of two box sets by IoU.
+- reconcile_boxes: Merges tracked and detected boxes, refreshing tracked boxes with their matching detection
+  and returning the detections left unmatched.
+
+Usage:
+- Create a DetectionScheduler with the desired detection interval.
+- Call should_detect() every frame; record_detection() or record_tracking() after the chosen step.
+- Read report() to tune the interval against throughput.
+"""
+
+import numpy as np
+
+
+class DetectionScheduler:
+    def __init__(self, detect_every=30):
+        """
+        Initialize the DetectionScheduler.
+
+        Parameters:
+        - detect_every (int): Run the detector at least once every this many frames (default is 30).
+        """
+        self.detect_every = detect_every
+        self.frames_since_detection = 0
+        self.detect_count = 0
+        self.track_count = 0
+
+    def should_detect(self, tracking_ok=True):
+        """
+        Return True when the current frame should go through the detector.
+
+        Parameters:
+        - tracking_ok (bool): False when the trackers lost a marker or reported a failure on the previous frame.
+        """
+        return not tracking_ok or self.frames_since_detection >= self.detect_every
+
+    def record_detection(self):
+        self.frames_since_detection = 0
+        self.detect_count += 1
+
+    def record_tracking(self):
+        self.frames_since_detection += 1
+        self.track_count += 1
+
+    def detect_ratio(self):
+        """
+        Fraction of the processed frames that went through the detector.
+        """
+        total = self.detect_count + self.track_count
+        return self.detect_count / total if total else 0.0
+
+    def report(self):
+        """
+        Return the detection/tracking counters as a dictionary.
+        """
+        return {
+            "detect_every": self.detect_every,
+            "detected_frames": self.detect_count,
+            "tracked_frames": self.track_count,
+            "detect_ratio": self.detect_ratio(),
+        }
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Compute the pairwise intersection over union of two sets of boxes.
+
+    Parameters:
+    - boxes_a: Array-like of shape (N, 4) with [x, y, w, h] boxes.
+    - boxes_b: Array-like of shape (M, 4) with [x, y, w, h] boxes.
+
+    Returns:
+    - float64 array of shape (N, M).
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    a_x2 = a[:, 0] + a[:, 2]
+    a_y2 = a[:, 1] + a[:, 3]
+    b_x2 = b[:, 0] + b[:, 2]
+    b_y2 = b[:, 1] + b[:, 3]
+
+    inter_w = np.clip(
+        np.minimum(a_x2[:, None], b_x2[None, :]) - np.maximum(a[:, None, 0], b[None, :, 0]),
+        0,
+        None,
+    )
+    inter_h = np.clip(
+        np.minimum(a_y2[:, None], b_y2[None, :]) - np.maximum(a[:, None, 1], b[None, :, 1]),
+        0,
+        None,
+    )
+    intersection = inter_w * inter_h
+    union = (a[:, 2] * a[:, 3])[:, None] + (b[:, 2] * b[:, 3])[None, :] - intersection
+
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def match_boxes(boxes_a, boxes_b, iou_threshold=0.3):
+    """
+    Greedily match two box sets one-to-one, best IoU first.
+
+    Returns:
+    - List of (index_a, index_b) pairs whose IoU is at least iou_threshold.
+    """
+    ious = iou_matrix(boxes_a, boxes_b)
+    matches = []
+    if ious.size == 0:
+        return matches
+
+    used_a = set()
+    used_b = set()
+    for flat_index in np.argsort(-ious, axis=None, kind="stable"):
+        i, j = np.unravel_index(flat_index, ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        if i in used_a or j in used_b:
+            continue
+        used_a.add(i)
+        used_b.add(j)
+        matches.append((int(i), int(j)))
+    return matches
+
+
+def reconcile_boxes(tracked_boxes, detected_boxes, iou_threshold=0.3):
+    """
+    Merge the boxes propagated by the trackers with a fresh detection.
+
+    Tracked boxes that overlap a detection are replaced by it (removing tracker drift) and tracked boxes with no
+    matching detection are kept (the detector missed them on this frame). Tracked boxes keep their position so
+    every tracker still refers to the same marker.
+
+    Returns:
+    - merged: int32 array with the same shape as tracked_boxes.
+    - refreshed: Indexes of the tracked boxes that were replaced by a detection.
+    - unmatched: Indexes of the detections that did not match any tracked box.
+    """
+    tracked = np.asarray(tracked_boxes, dtype=np.float64).reshape(-1, 4)
+    detected = np.asarray(detected_boxes, dtype=np.float64).reshape(-1, 4)
+
+    merged = tracked.copy()
+    refreshed = []
+    matched_detections = set()
+    for i, j in match_boxes(tracked, detected, iou_threshold):
+        merged[i] = detected[j]
+        refreshed.append(i)
+        matched_detections.add(j)
+
+    unmatched = [j for j in range(len(detected)) if j not in matched_detections]
+    return merged.astype(np.int32), sorted(refreshed), unmatched
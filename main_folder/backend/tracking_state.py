@@ -0,0 +1,316 @@
+"""
+Tracking State Module
+
+This module keeps the per-marker motion state used by MotionAnalysis between frames. Every marker has its own
+Kalman filter with a constant-velocity (or constant-acceleration) model in pixel coordinates, which is used to:
+
+- smooth the jitter of the tracker/detector centers before the joint angles are computed,
+- predict the position of a marker during a short occlusion (a few frames) without calling YOLO,
+- give the detector and the trackers a predicted search window for each marker,
+- assign new detections to the existing markers, so every marker keeps a persistent ID across re-detections.
+
+The marker ID is the index of its filter and matches MotionAnalysis.names: 0 Shoulder, 1 Trochanter, 2 Knee,
+3 Ankle, 4 V_Metatarsal.
+
+Dependencies:
+- numpy: Used for the filter algebra.
+- scipy: linear_sum_assignment (Hungarian algorithm) for the identity assignment.
+
+Classes:
+- MarkerKalman: Kalman filter following the center of one marker.
+- TrackingState: One MarkerKalman per marker, with occlusion counters and search windows.
+
+Functions:
+- check_reacquisition: Checks that a marker lost for a long time is assigned again by a new detection.
+
+Usage:
+- Create a TrackingState with the number of markers.
+- Call update() once per frame with the measured centers (None for a marker that was not found).
+- Use predicted_boxes() and search_window() to guide the trackers and the re-detection.
+- Call assign() with the centers of a new detection to know which marker each detection belongs to.
+- Run python -m backend.tracking_state (from main_folder) to check the re-acquisition of a lost marker.
+"""
+
+import math
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+class MarkerKalman:
+    def __init__(self, order=1, process_noise=1.0, measurement_noise=4.0):
+        """
+        Initialize the MarkerKalman object.
+
+        Parameters:
+        - order (int): 1 for a constant-velocity model, 2 for a constant-acceleration model (default is 1).
+        - process_noise (float): Variance of the unmodelled motion, in pixels per frame (default is 1.0).
+        - measurement_noise (float): Variance of the measured centers, in pixels squared (default is 4.0).
+        """
+        self.order = order
+        size = order + 1
+
+        # One-dimensional model over one frame, applied to x and y independently
+        transition = np.eye(size)
+        for i in range(size):
+            for j in range(i + 1, size):
+                transition[i, j] = 1.0 / math.factorial(j - i)
+        noise_gain = np.array([1.0 / math.factorial(size - i) for i in range(size)])
+
+        self.F = np.kron(transition, np.eye(2))
+        self.Q = process_noise * np.kron(np.outer(noise_gain, noise_gain), np.eye(2))
+        self.H = np.zeros((2, 2 * size))
+        self.H[0, 0] = 1.0
+        self.H[1, 1] = 1.0
+        self.R = measurement_noise * np.eye(2)
+
+        self.x = np.zeros(2 * size)
+        self.P = np.eye(2 * size)
+        self.initialized = False
+
+    def init(self, center):
+        """
+        Start the filter at a measured center with zero velocity (and acceleration).
+        """
+        self.x[:] = 0.0
+        self.x[:2] = center
+        self.P = np.diag([self.R[0, 0]] * 2 + [100.0] * (len(self.x) - 2))
+        self.initialized = True
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def correct(self, center):
+        innovation = np.asarray(center, dtype=np.float64) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ innovation
+        self.P = (np.eye(len(self.x)) - K @ self.H) @ self.P
+
+    def position(self):
+        return float(self.x[0]), float(self.x[1])
+
+    def next_position(self):
+        """
+        Position expected on the next frame, without changing the filter.
+        """
+        next_x = self.F @ self.x
+        return float(next_x[0]), float(next_x[1])
+
+    def position_std(self):
+        """
+        Standard deviation of the position estimate (largest of x and y), in pixels.
+        """
+        return math.sqrt(max(self.P[0, 0], self.P[1, 1]))
+
+
+class TrackingState:
+    def __init__(self, n_markers=5, max_missed=5, order=1, process_noise=1.0, measurement_noise=4.0):
+        """
+        Initialize the TrackingState object.
+
+        Parameters:
+        - n_markers (int): Number of markers followed (default is 5).
+        - max_missed (int): Number of consecutive frames a marker can be bridged by prediction (default is 5).
+        - order, process_noise, measurement_noise: Passed to every MarkerKalman.
+        """
+        self.n_markers = n_markers
+        self.max_missed = max_missed
+        self.filters = [
+            MarkerKalman(order, process_noise, measurement_noise) for _ in range(n_markers)
+        ]
+        self.missed = [0] * n_markers
+
+    def update(self, measurements):
+        """
+        Advance every filter by one frame.
+
+        Parameters:
+        - measurements: List of (x, y) centers indexed by marker, None for a marker not found on this frame.
+          Missing trailing entries are treated as None.
+
+        Returns:
+        - List of n_markers estimated (x, y) centers. A marker that was never seen, or that has been missing for
+          more than max_missed frames, is None.
+
+        A marker missing for more than max_missed frames is lost: its filter stops predicting (so it does not drift
+        away with its last velocity) and is restarted at the next measured center.
+        """
+        measurements = list(measurements)[: self.n_markers]
+        measurements += [None] * (self.n_markers - len(measurements))
+
+        estimates = []
+        for i, (kalman, center) in enumerate(zip(self.filters, measurements)):
+            if not kalman.initialized:
+                if center is not None:
+                    kalman.init(center)
+                    self.missed[i] = 0
+                    estimates.append(kalman.position())
+                else:
+                    estimates.append(None)
+                continue
+
+            if self.is_lost(i):
+                if center is None:
+                    self.missed[i] += 1
+                    estimates.append(None)
+                else:
+                    self.reset(i, center)
+                    estimates.append(kalman.position())
+                continue
+
+            kalman.predict()
+            if center is None:
+                self.missed[i] += 1
+            else:
+                kalman.correct(center)
+                self.missed[i] = 0
+
+            estimates.append(kalman.position() if self.missed[i] <= self.max_missed else None)
+        return estimates
+
+    def reset(self, index, center):
+        """
+        Restart the filter of one marker at a new measured center (after a re-detection).
+        """
+        self.filters[index].init(center)
+        self.missed[index] = 0
+
+    def is_bridged(self, index):
+        """
+        True when the marker is currently missing but still predicted.
+        """
+        return 0 < self.missed[index] <= self.max_missed
+
+    def is_lost(self, index):
+        """
+        True when the marker has been missing for more than max_missed frames; its filter is no longer predicted.
+        """
+        return self.missed[index] > self.max_missed
+
+    def bridged_count(self):
+        return sum(self.is_bridged(i) for i in range(self.n_markers))
+
+    def predicted_boxes(self, boxes):
+        """
+        Move each [x, y, w, h] box so it is centered on the position predicted for the next frame.
+
+        Markers without an initialized filter keep their box.
+        """
+        predicted = []
+        for kalman, box in zip(self.filters, boxes):
+            x, y, w, h = box
+            if kalman.initialized:
+                cx, cy = kalman.next_position()
+                predicted.append((cx - w / 2, cy - h / 2, w, h))
+            else:
+                predicted.append(tuple(box))
+        return predicted
+
+    def search_window(self, index, min_padding=40, max_padding=160):
+        """
+        Predicted center of a marker and the half size of the region to search it in.
+
+        The region grows with the uncertainty of the prediction, so a marker bridged for several frames is
+        searched in a larger area, up to max_padding so the search stays local.
+
+        Returns:
+        - center: (x, y) predicted center for the next frame.
+        - padding: Half size in pixels of the search region.
+        """
+        kalman = self.filters[index]
+        padding = int(min(min_padding + 3 * kalman.position_std(), max_padding))
+        return kalman.next_position(), padding
+
+    def assign(self, centers, candidates=None, gate=200.0):
+        """
+        Match detected centers to marker IDs.
+
+        Markers that are already followed are matched with the Hungarian algorithm on a cost matrix of the
+        distances between each detection and the position predicted for the marker; pairs farther apart than
+        gate are rejected. Lost markers (missing for more than max_missed frames, see update) are then matched to
+        the remaining detections on the distance to their last known position, without gate, since the marker may
+        be anywhere by now. Markers that were never seen (start of the session) take the remaining detections in
+        anatomical order, from the top of the frame to the bottom.
+
+        Parameters:
+        - centers: List of (x, y) detected centers.
+        - candidates: Marker IDs the detections may be assigned to (default is every marker).
+        - gate (float): Maximum distance in pixels between a detection and a predicted position (default is 200).
+
+        Returns:
+        - List of (detection_index, marker_id) pairs.
+        """
+        if candidates is None:
+            candidates = range(self.n_markers)
+        followed = [i for i in candidates if self.filters[i].initialized and not self.is_lost(i)]
+        lost = [i for i in candidates if self.filters[i].initialized and self.is_lost(i)]
+        unseen = [i for i in candidates if not self.filters[i].initialized]
+
+        pairs = []
+        remaining = list(range(len(centers)))
+        points = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+
+        if followed and remaining:
+            predicted = np.array([self.filters[i].next_position() for i in followed])
+            cost = np.linalg.norm(points[:, None, :] - predicted[None, :, :], axis=2)
+
+            rows, cols = linear_sum_assignment(cost)
+            for row, col in zip(rows, cols):
+                if cost[row, col] <= gate:
+                    pairs.append((int(row), followed[col]))
+                    remaining.remove(row)
+
+        if lost and remaining:
+            last_known = np.array([self.filters[i].position() for i in lost])
+            cost = np.linalg.norm(points[remaining][:, None, :] - last_known[None, :, :], axis=2)
+
+            rows, cols = linear_sum_assignment(cost)
+            matched = [remaining[row] for row in rows]
+            pairs.extend((int(index), lost[col]) for index, col in zip(matched, cols))
+            remaining = [index for index in remaining if index not in matched]
+
+        if unseen and remaining:
+            remaining.sort(key=lambda index: centers[index][1])
+            pairs.extend(zip(remaining, sorted(unseen)))
+
+        return pairs
+
+
+def check_reacquisition(lost_frames=120, speed=3.0):
+    """
+    Regression check: a V_Metatarsal marker moving at speed pixels per frame is lost for lost_frames frames and
+    must be assigned again to its ID by a full-frame detection, and its filter restarted at the new center.
+    """
+    state = TrackingState(n_markers=5)
+    fixed = [(100.0, 50.0), (110.0, 160.0), (120.0, 260.0), (110.0, 360.0)]
+
+    def vm_center(frame):
+        return (100.0 + speed * frame, 430.0)
+
+    frame = 0
+    for frame in range(30):
+        state.update(fixed + [vm_center(frame)])
+    for frame in range(30, 30 + lost_frames):
+        estimates = state.update(fixed + [None])
+    assert estimates[4] is None and state.is_lost(4)
+
+    # The filter stopped at its last position instead of drifting with its last velocity
+    drift = abs(state.filters[4].position()[0] - vm_center(30)[0])
+    print(f"Prediction drift after {lost_frames} lost frames: {drift:.1f} px")
+
+    frame += 1
+    true_center = vm_center(frame)
+    pairs = state.assign(fixed + [true_center])
+    assert (4, 4) in pairs, f"Lost marker not re-acquired: {pairs}"
+    assert state.assign([true_center], [4]) == [(0, 4)]
+
+    estimates = state.update(fixed + [true_center])
+    assert estimates[4] == true_center and not state.is_lost(4)
+    print(f"Re-acquired at {true_center} after {lost_frames} frames")
+
+
+# Usage
+if __name__ == "__main__":
+    check_reacquisition()
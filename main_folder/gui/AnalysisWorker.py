@@ -0,0 +1,216 @@
+"""
+AnalysisWorker Module
+
+This module runs the MotionAnalysis pipeline (decoding, detection and tracking, direction, angles and gait events)
+in a QThread, so a slow frame never blocks the GUI thread and the analysis rate does not depend on how fast the
+window repaints.
+
+For every processed frame the worker builds a compact result record (a dictionary with the frame number, marker
+centers, angles and gait events) and hands it to the GUI thread through a queued signal:
+
+- Records are batched: the worker only emits results_ready when the GUI has taken the previous batch, and the GUI
+  takes every pending record at once, so a lagging GUI receives a few large batches instead of a signal per frame.
+- Frames are rendered at the display rate only: overlays are drawn, and the frame is scaled and converted to RGB,
+  for at most display_rate frames per second (the screen refresh); the other frames are analyzed but never drawn.
+- Rendered frames go through a triple buffer of QImages wrapping reused numpy arrays (no allocation per frame): the
+  BGR frame is resized into a scratch buffer and converted straight into the memory of the back QImage, and the GUI
+  only gets the latest one.
+- When the GUI falls max_pending records behind, the worker waits for it instead of growing the queue.
+
+Dependencies:
+- threading: Lock and condition shared by the two threads.
+- time.perf_counter: Display rate cap.
+- cv2: Scaling and color conversion of the presented frames.
+- numpy: Frame buffers.
+- PyQt5.QtCore: QThread and signals.
+- PyQt5.QtGui: QImage views of the frame buffers.
+
+Attributes:
+- DISPLAY_RATE: Default number of frames presented per second.
+
+Classes:
+- AnalysisWorker: QThread owning a MotionAnalysis and publishing its per-frame records.
+
+Usage:
+- worker = AnalysisWorker(analysis, (width, height)); worker.results_ready.connect(slot); worker.start()
+- In slot (GUI thread): records, image = worker.take_results(); image is the latest rendered QImage or None.
+- worker.stop() before closing the window.
+"""
+
+import threading
+from time import perf_counter
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+
+DIRECTIONS = ("right_to_left", "left_to_right")
+DISPLAY_RATE = 60
+
+
+class AnalysisWorker(QThread):
+    """
+    QThread running the analysis loop of a MotionAnalysis.
+
+    Signals:
+        - results_ready: Emitted (queued to the GUI thread) when records are waiting and the previous batch was taken.
+        - analysis_finished: Emitted when the video has no more frames.
+    """
+
+    results_ready = pyqtSignal()
+    analysis_finished = pyqtSignal()
+
+    def __init__(self, analysis, display_size, display_rate=DISPLAY_RATE, max_pending=1200):
+        """
+        Initialize the AnalysisWorker object.
+
+        Parameters:
+        - analysis (MotionAnalysis): Analysis with its video opened; it is only used by the worker thread from now on.
+        - display_size (tuple): (width, height) of the presented frames.
+        - display_rate (float): Largest number of frames rendered per second (default is 60).
+        - max_pending (int): Records the GUI may fall behind before the worker waits for it (default is 1200,
+          10 seconds at 120 fps).
+        """
+        super(AnalysisWorker, self).__init__()
+        self.analysis = analysis
+        self.display_size = display_size
+        self.display_interval = 1 / display_rate
+        self.max_pending = max_pending
+        self.last_render = None
+        self.rendered_frames = 0
+        # (width, height) of the analyzed frames, to map clicks on the presented frames
+        self.frame_size = None
+
+        self.condition = threading.Condition()
+        self.pending = []
+        self.notified = False
+
+        # Triple buffer of (RGB array, QImage over it): the worker writes the back buffer, the GUI reads the front
+        # one, ready holds the latest rendered frame
+        width, height = display_size
+        self.scaled = np.empty((height, width, 3), dtype=np.uint8)
+        self.back, self.ready, self.front = (self.image_buffer() for _ in range(3))
+        self.new_frame_ready = False
+
+    def image_buffer(self):
+        width, height = self.display_size
+        array = np.empty((height, width, 3), dtype=np.uint8)
+        return array, QImage(array.data, width, height, 3 * width, QImage.Format_RGB888)
+
+    def stop(self):
+        self.requestInterruption()
+        with self.condition:
+            self.condition.notify_all()
+        self.wait()
+
+    def make_record(self, events):
+        """
+        Build the result record of the frame the analysis just processed.
+        """
+        analysis = self.analysis
+        session = analysis.gait_session
+        phases = {}
+        for direction in DIRECTIONS:
+            gait_pass = session.last_pass(direction)
+            phases[direction] = (
+                (gait_pass.stance_time, gait_pass.swing_time) if gait_pass is not None else (None, None)
+            )
+
+        return {
+            "frame": analysis.frame_number,
+            "time": analysis.frame_number / analysis.fps_rate,
+            "direction": analysis.direction,
+            "centers": dict(analysis.marker_positions),
+            # Last accepted angle of each joint, as shown by the GUI
+            "angles": (
+                float(analysis.hip_angles.last_valid()),
+                float(analysis.knee_angles.last_valid()),
+                float(analysis.ankle_angles.last_valid()),
+            ),
+            "events": events,
+            "phases": phases,
+            "stance_durations": {
+                direction: session.mean_stance_duration(direction) for direction in DIRECTIONS
+            },
+        }
+
+    def render(self, frame):
+        """
+        Draw the overlays on frame and convert it into the back buffer (worker thread).
+        """
+        self.analysis.draw_overlays(frame)
+        # Scale first so the color conversion only touches the presented pixels
+        cv2.resize(frame, self.display_size, dst=self.scaled, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.scaled, cv2.COLOR_BGR2RGB, dst=self.back[0])
+        self.rendered_frames += 1
+
+    def publish(self, record, frame):
+        """
+        Queue a record for the GUI, with the frame rendered when the display is due for a new one (worker thread).
+        """
+        now = perf_counter()
+        rendered = self.last_render is None or now - self.last_render >= self.display_interval
+        if rendered:
+            self.last_render = now
+            self.render(frame)
+
+        with self.condition:
+            while len(self.pending) >= self.max_pending and not self.isInterruptionRequested():
+                self.condition.wait(0.1)
+
+            self.pending.append(record)
+            if rendered:
+                self.back, self.ready = self.ready, self.back
+                self.new_frame_ready = True
+
+            notify = not self.notified
+            self.notified = True
+        if notify:
+            self.results_ready.emit()
+
+    def take_results(self):
+        """
+        Take every pending record and the latest rendered frame (GUI thread).
+
+        Returns:
+        - records (list): Records of every frame processed since the previous call, in order.
+        - image (QImage): Latest rendered RGB frame, or None when there is no new one. It stays valid until the next
+          call that returns a new image.
+        """
+        with self.condition:
+            records = self.pending
+            self.pending = []
+            self.notified = False
+
+            image = None
+            if self.new_frame_ready:
+                self.front, self.ready = self.ready, self.front
+                self.new_frame_ready = False
+                image = self.front[1]
+            self.condition.notify_all()
+        return records, image
+
+    def run(self):
+        analysis = self.analysis
+        try:
+            analysis.init_time()
+            analysis.get_video_frame()
+            analysis.init_tracker()
+            if analysis.success:
+                self.frame_size = (analysis.new_frame.shape[1], analysis.new_frame.shape[0])
+            while analysis.success and not self.isInterruptionRequested():
+                analysis.markers_centers()
+                analysis.gait_direction()
+                analysis.get_filtered_angles()
+                events = analysis.update_gait_events()
+
+                analysis.end_time()
+                self.publish(self.make_record(events), analysis.new_frame)
+
+                analysis.get_video_frame()
+                if analysis.success:
+                    analysis.check_markers()
+        finally:
+            analysis.close_window()
+            self.analysis_finished.emit()
@@ -0,0 +1,408 @@
+"""
+BlitPlotter Module
+
+This module redraws the live angle plots of the analysis window with matplotlib blitting. A full figure draw
+(axes, ticks, titles, every artist) only happens when the plots change size or their x axis has to grow; on every
+other tick the cached background of the figure is restored and only the artists that changed (the angle lines) are
+drawn on top of it.
+
+All the joints of a tick are drawn together, so the window can refresh its plots from one display-rate timer
+(e.g. 30 Hz) instead of one full draw per joint and per video frame.
+
+Dependencies:
+- collections.deque: Timestamps of the latest redraws.
+- time.perf_counter: Redraw timing.
+- matplotlib: Figures, canvases and Line2D artists (any backend; FigureCanvasQTAgg in the GUI).
+
+Classes:
+- BlitPlotter: Updates registered Line2D artists on one or more canvases with blitting.
+- PhaseMarkerPool: Fixed set of vertical marker lines of one axis (gait phases), moved in place.
+
+Functions:
+- plot_points: Samples of a history decimated to a bounded number of points, keeping the minimum and maximum of
+  every bucket of samples.
+
+Usage:
+- plotter = BlitPlotter(); plotter.add_line(line) for every live line (its figure canvas is registered with it).
+- plotter.set_data(line, x, y) whenever the samples of a line change, then plotter.draw() once per display tick.
+- plotter.redraw_rate is the number of redraws per second achieved over the latest ticks.
+- markers = PhaseMarkerPool(ax, plotter, size=2); markers.set_positions([stance, swing], limits=(0, x_max)) at
+  every tick.
+- x, y = plot_points(x_history, y_history, lower, upper) before plotter.set_data, so the whole session is plotted
+  but the points drawn per tick do not grow with it.
+- Run python -m gui.BlitPlotter (from main_folder) to compare full draws and blitting with the Agg backend, and to
+  check that the points and artists drawn per tick stay bounded over a 10-minute session.
+"""
+
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+# Fraction of the plotted time span added to the x axis when a line reaches its end
+X_HEADROOM = 0.5
+
+# Largest number of points drawn per live line (about two per pixel of the plots)
+MAX_PLOT_POINTS = 2000
+
+
+class BlitPlotter:
+    def __init__(self, rate_window=60):
+        """
+        Initialize the BlitPlotter object.
+
+        Parameters:
+        - rate_window (int): Number of latest redraws the redraw rate is measured over (default is 60).
+        """
+        self.canvases = {}
+        self.redraw_times = deque(maxlen=rate_window)
+        self.full_draws = 0
+        self.blits = 0
+        self.last_draw_seconds = 0.0
+
+    def _canvas_state(self, canvas):
+        if canvas not in self.canvases:
+            state = {"background": None, "artists": [], "dirty": True, "stale_background": True}
+            self.canvases[canvas] = state
+            # The background is captured again after every full draw (including resizes done by Qt)
+            canvas.mpl_connect("draw_event", lambda event, canvas=canvas: self._on_draw(canvas))
+        return self.canvases[canvas]
+
+    def _on_draw(self, canvas):
+        state = self.canvases[canvas]
+        state["background"] = canvas.copy_from_bbox(canvas.figure.bbox)
+        state["stale_background"] = False
+        for artist in state["artists"]:
+            artist.axes.draw_artist(artist)
+
+    def add_line(self, line):
+        """
+        Register a Line2D (or any artist) drawn at every tick; it is left out of the cached background.
+        """
+        line.set_animated(True)
+        state = self._canvas_state(line.figure.canvas)
+        state["artists"].append(line)
+        state["dirty"] = True
+
+    def remove_artist(self, artist):
+        state = self._canvas_state(artist.figure.canvas)
+        if artist in state["artists"]:
+            state["artists"].remove(artist)
+            state["dirty"] = True
+
+    def mark_dirty(self, artist):
+        """
+        Draw the canvas of artist again on the next tick (e.g. after set_xdata on a marker line).
+        """
+        self._canvas_state(artist.figure.canvas)["dirty"] = True
+
+    def invalidate(self, canvas):
+        """
+        Force a full draw of canvas on the next tick (after changing titles, limits, static artists, ...).
+        """
+        state = self._canvas_state(canvas)
+        state["stale_background"] = True
+        state["dirty"] = True
+
+    def set_data(self, line, x, y):
+        """
+        Set the samples of a registered line. When they go past the end of the x axis, the axis grows with some
+        headroom so the full draw needed for the new ticks happens only once in a while.
+        """
+        line.set_data(x, y)
+        state = self._canvas_state(line.figure.canvas)
+        state["dirty"] = True
+
+        if len(x) == 0:
+            return
+        ax = line.axes
+        x_min, x_max = float(x[0]), float(x[-1])
+        left, right = ax.get_xlim()
+        if x_max > right or x_min < left:
+            ax.set_xlim(x_min, x_max + max(x_max - x_min, 1.0) * X_HEADROOM)
+            state["stale_background"] = True
+
+    def draw(self):
+        """
+        Redraw every canvas that changed since the last tick: a full draw when its background is stale, otherwise
+        the cached background plus its animated artists.
+        """
+        start = perf_counter()
+        drawn = False
+        for canvas, state in self.canvases.items():
+            if not state["dirty"]:
+                continue
+            state["dirty"] = False
+            drawn = True
+
+            if state["stale_background"] or state["background"] is None:
+                # draw_event captures the new background and draws the artists on it
+                canvas.draw()
+                self.full_draws += 1
+            else:
+                canvas.restore_region(state["background"])
+                for artist in state["artists"]:
+                    artist.axes.draw_artist(artist)
+                self.blits += 1
+            canvas.blit(canvas.figure.bbox)
+
+        if drawn:
+            now = perf_counter()
+            self.last_draw_seconds = now - start
+            self.redraw_times.append(now)
+
+    @property
+    def redraw_rate(self):
+        """
+        Redraws per second over the latest redraws (0 until there are two).
+        """
+        if len(self.redraw_times) < 2:
+            return 0.0
+        elapsed = self.redraw_times[-1] - self.redraw_times[0]
+        return (len(self.redraw_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class PhaseMarkerPool:
+    def __init__(self, ax, plotter, size=2, **style):
+        """
+        Initialize the PhaseMarkerPool object: size vertical lines created once, hidden until used.
+
+        Parameters:
+        - ax (Axes): Axes of the markers.
+        - plotter (BlitPlotter): Plotter that draws the markers with the other animated artists.
+        - size (int): Largest number of markers shown at once (default is 2, stance and swing).
+        - style: Line2D properties of the markers (e.g. linestyle="--", linewidth=2).
+        """
+        self.plotter = plotter
+        self.positions = ()
+        self.lines = []
+        for _ in range(size):
+            line = ax.axvline(0, visible=False, **style)
+            plotter.add_line(line)
+            self.lines.append(line)
+
+    def set_positions(self, positions, limits=None):
+        """
+        Show one marker at every x in positions (extra positions beyond the pool size are ignored) and hide the
+        others. Nothing is redrawn when the positions did not change.
+
+        Parameters:
+        - positions: x of the markers.
+        - limits: (left, right) x range of the plotted data; markers outside of it are hidden (default is None,
+          every marker is shown).
+        """
+        if limits is not None:
+            positions = [x for x in positions if limits[0] <= x <= limits[1]]
+        positions = tuple(float(x) for x in positions[: len(self.lines)])
+        if positions == self.positions:
+            return
+        self.positions = positions
+
+        for index, line in enumerate(self.lines):
+            if index < len(positions):
+                line.set_xdata([positions[index], positions[index]])
+                line.set_visible(True)
+            else:
+                line.set_visible(False)
+        self.plotter.mark_dirty(self.lines[0])
+
+
+def plot_points(x, y, lower, upper, max_points=MAX_PLOT_POINTS):
+    """
+    Samples lower:upper of two histories, decimated to at most max_points points.
+
+    The samples are split in buckets of consecutive samples and only the minimum and the maximum of y in every
+    bucket are kept (in their order), so the peaks of the curve stay visible however long the session is. Histories
+    that already fit are returned as zero-copy views.
+
+    Parameters:
+    - x, y: Histories (numpy arrays or GrowableArray) of the same length.
+    - lower, upper: Slice of the histories considered (e.g. 5 and -5 to leave out the edges).
+    - max_points (int): Largest number of points returned (default is 2000).
+    """
+    x = np.asarray(x)[lower:upper]
+    y = np.asarray(y)[lower:upper]
+    if len(y) <= max_points:
+        return x, y
+
+    bucket = -(-len(y) // (max_points // 2))
+    starts = np.arange(0, len(y), bucket)
+    full = len(y) // bucket * bucket
+    buckets = y[:full].reshape(-1, bucket)
+    lowest = buckets.argmin(axis=1)
+    highest = buckets.argmax(axis=1)
+    if full < len(y):
+        lowest = np.append(lowest, y[full:].argmin())
+        highest = np.append(highest, y[full:].argmax())
+
+    indexes = np.unique(np.concatenate([starts + lowest, starts + highest]))
+    return x[indexes], y[indexes]
+
+
+def benchmark_plotter(ticks=300, samples_per_tick=4):
+    """
+    Print the time of one plot update with a full canvas.draw() and with the BlitPlotter (Agg backend, the three
+    joint plots of one leg).
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    def make_figure():
+        figure = Figure(figsize=(4, 8))
+        FigureCanvasAgg(figure)
+        lines = []
+        for index in range(3):
+            ax = figure.add_subplot(311 + index)
+            (line,) = ax.plot([], [])
+            ax.set_ylim(-20, 70)
+            lines.append(line)
+        return figure, lines
+
+    t = np.arange(ticks * samples_per_tick) / 120
+    values = 30 * np.sin(2 * np.pi * t)
+
+    figure, lines = make_figure()
+    start = perf_counter()
+    for tick in range(1, ticks + 1):
+        end = tick * samples_per_tick
+        for line in lines:
+            line.set_data(t[:end], values[:end])
+            line.axes.relim()
+            line.axes.autoscale_view()
+        figure.canvas.draw()
+    full = (perf_counter() - start) / ticks
+
+    figure, lines = make_figure()
+    plotter = BlitPlotter()
+    for line in lines:
+        plotter.add_line(line)
+    start = perf_counter()
+    for tick in range(1, ticks + 1):
+        end = tick * samples_per_tick
+        for line in lines:
+            plotter.set_data(line, t[:end], values[:end])
+        plotter.draw()
+    blit = (perf_counter() - start) / ticks
+
+    print(f"{ticks} ticks: full draw {full * 1e3:.2f} ms, blit {blit * 1e3:.2f} ms per tick")
+    print(f"Full draws: {plotter.full_draws}, blits: {plotter.blits}")
+
+
+def benchmark_phase_markers(minutes=10, plot_rate=30, fps_rate=120):
+    """
+    Regression benchmark of the live plot path of the GUI: simulate a session of minutes at plot_rate ticks per
+    second, where every tick appends the new samples to a growing history, takes its plot_points, normalizes its
+    times and moves the stance and swing markers, as MainWindow.normalize_gait_phases does. Check that the points
+    and the artists drawn per tick stay bounded, and that the decimated curve keeps the extremes of the history.
+    For comparison, also time ticks that plot the whole history undecimated at the end of the session, and the
+    first 20 seconds of the previous marker approach, which added two axvline artists per tick.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from backend.timeseries import GrowableArray
+
+    def make_axes():
+        figure = Figure(figsize=(4, 3))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot(111)
+        (line,) = ax.plot([], [])
+        ax.set_ylim(-20, 70)
+        return ax, line
+
+    samples_per_tick = fps_rate // plot_rate
+    ticks_per_minute = 60 * plot_rate
+    x_history = GrowableArray(np.float32)
+    y_history = GrowableArray(np.float32)
+
+    def tick_times(ticks, update, group):
+        # Mean tick time of every group of ticks
+        times = []
+        for tick in range(ticks):
+            start = perf_counter()
+            update(tick)
+            times.append(perf_counter() - start)
+        return np.array(times).reshape(-1, group).mean(axis=1)
+
+    drawn_points = []
+
+    def plot_tick(tick, plotter, line, markers, max_points):
+        for sample in range(tick * samples_per_tick, (tick + 1) * samples_per_tick):
+            x_history.append(sample / fps_rate)
+            y_history.append(30 * np.sin(2 * np.pi * sample / fps_rate))
+        x, y = plot_points(x_history, y_history, 5, -5, max_points)
+        if len(x) == 0:
+            return
+        min_value_x = float(x[0])
+        normalized = x - min_value_x
+        # The first marker falls before the plotted range at the start of the session, and is hidden then
+        markers.set_positions(
+            [(tick % 90) / 120 - 0.1, (tick % 90 + 40) / 120], limits=(0, float(normalized[-1]))
+        )
+        plotter.set_data(line, normalized, y)
+        plotter.draw()
+        drawn_points.append(len(x))
+
+    # Decimated history and a pool of two marker lines for the whole session
+    ax, line = make_axes()
+    plotter = BlitPlotter()
+    plotter.add_line(line)
+    markers = PhaseMarkerPool(ax, plotter, size=2, linestyle="--", linewidth=2)
+    total_ticks = minutes * ticks_per_minute
+    decimated = tick_times(
+        total_ticks, lambda tick: plot_tick(tick, plotter, line, markers, MAX_PLOT_POINTS), ticks_per_minute
+    )
+    artists = len(ax.lines)
+    most_points = max(drawn_points)
+    plotted_y = line.get_ydata()
+    history_y = np.asarray(y_history)[5:-5]
+
+    # Whole history: the same ticks, undecimated and timed at the end of the session
+    ax, line = make_axes()
+    plotter = BlitPlotter()
+    plotter.add_line(line)
+    markers = PhaseMarkerPool(ax, plotter, size=2, linestyle="--", linewidth=2)
+    whole = tick_times(
+        plot_rate,
+        lambda tick: plot_tick(total_ticks + tick, plotter, line, markers, len(x_history)),
+        plot_rate,
+    )
+
+    # Previous marker approach: new axvline artists at every tick
+    ax, line = make_axes()
+    plotter = BlitPlotter()
+    plotter.add_line(line)
+    x = np.arange(MAX_PLOT_POINTS) / fps_rate
+    y = 30 * np.sin(2 * np.pi * x)
+
+    def axvline_tick(tick):
+        plotter.set_data(line, x, y)
+        for position in ((tick % 90) / 120, (tick % 90 + 40) / 120):
+            plotter.add_line(ax.axvline(position, linestyle="--", linewidth=2))
+        plotter.draw()
+
+    accumulating = tick_times(20 * plot_rate, axvline_tick, plot_rate)
+
+    print(
+        f"Decimated plot ({MAX_PLOT_POINTS} points): {decimated[0] * 1e3:.2f} ms per tick in minute 1, "
+        f"{decimated[-1] * 1e3:.2f} ms in minute {minutes}, at most {most_points} points"
+    )
+    print(f"Whole history after {minutes} minutes: {whole[-1] * 1e3:.2f} ms per tick ({drawn_points[-1]} points)")
+    print(
+        f"axvline per tick: {accumulating[0] * 1e3:.2f} ms per tick in second 1, "
+        f"{accumulating[-1] * 1e3:.2f} ms in second 20 ({len(ax.lines) - 1} lines on the axes)"
+    )
+    assert most_points <= MAX_PLOT_POINTS, "Points drawn per tick grow with the session"
+    assert artists == 3, "Artists accumulate on the axes over the session"
+    assert plotted_y.min() == history_y.min() and plotted_y.max() == history_y.max()
+
+
+# Usage
+if __name__ == "__main__":
+    benchmark_plotter()
+    benchmark_phase_markers()